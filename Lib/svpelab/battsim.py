@@ -32,8 +32,7 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
 # Import all battsim extensions in current directory.
 # A battsim extension has a file name of battsim_*.py and contains a function battsim_params(info) that contains
@@ -41,7 +40,7 @@ import importlib
 
 # dict of modules found, entries are: name : module_name
 
-battsim_modules = {}
+battsim_modules = plugins.ModuleRegistry(__name__, 'battsim')
 
 
 def params(info, id=None, label='Battery Simulator', group_name=None, active=None, active_value=None):
@@ -57,8 +56,7 @@ def params(info, id=None, label='Battery Simulator', group_name=None, active=Non
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
     info.param(name('auto_config'), label='Configure battery simulator at beginning of test', default='Disabled',
                values=['Enabled', 'Disabled'])
-    for mode, m in battsim_modules.items():
-        m.params(info, group_name=group_name)
+    battsim_modules.params(info, group_name=group_name)
 
 BATTSIM_DEFAULT_ID = 'battsim'
 
@@ -145,29 +143,8 @@ class BattSim(object):
 
 def battsim_scan():
     global battsim_modules
-    # scan all files in current directory that match battsim_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'battsim_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'battsim_info'):
-                info = m.battsim_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    battsim_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise BattSimError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match battsim_*.py, modules are imported when first used
+    battsim_modules.scan(BattSimError)
 
 # scan for battsim modules on import
 battsim_scan()
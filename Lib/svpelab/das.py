@@ -32,15 +32,17 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import os
-import glob
-import importlib
+import collections
+import threading
+import time
 
 from . import dataset
+from . import plugins
 
 '''
 The DAS module supports collecting time series data records in a dataset. Each time series data record is comprised
-of a reading for each data point in the dataset. The Dataset object organizes the data point values as a list of values
-for each data point. The data point lists are contained in a list. The DAS module supports both RMS and waveform
+of a reading for each data point in the dataset. The Dataset object organizes the data point values as a column of values
+for each data point (see dataset.Column). The data point columns are contained in a list. The DAS module supports both RMS and waveform
 datasets and DAS device devices may support either RMS data, waveform data, or both.
 
 The DAS module supports the reading of a single data record as a point in time. The data record read can either be
@@ -76,6 +78,12 @@ dictionary of the DAS object. The soft channel points are added to each dataset
 
     daq.sc['SC_1'] = ''
     daq.sc['SC_2'] = 2
+
+Data capture can optionally run device reads on a background acquisition thread (data_capture(background=True)).
+The thread reads the device at a fixed cadence, timestamps each record when it is read and places it in a bounded
+ring buffer. data_capture_read() and data_capture_dataset() move buffered records into the capture dataset without
+waiting on the device. acquisition_status() reports the achieved sample rate and any overruns (sample periods missed
+because the device read took longer than the sample interval) or records dropped because the buffer was full.
 '''
 
 WFM_STATUS_INACTIVE = 'active'
@@ -90,8 +98,10 @@ points_default = {
 sc_points_default = ('SC_TRIG',)
 
 MINIMUM_SAMPLE_PERIOD = 50
+MINIMUM_BACKGROUND_SAMPLE_PERIOD = 1
+ACQUISITION_BUFFER_SIZE = 100000
 
-das_modules = {}
+das_modules = plugins.ModuleRegistry(__name__, 'das')
 
 def params(info, id=None, label='Data Acquisition System', group_name=None, active=None, active_value=None):
     if group_name is None:
@@ -103,8 +113,7 @@ def params(info, id=None, label='Data Acquisition System', group_name=None, acti
     name = lambda name: group_name + '.' + name
     info.param_group(group_name, label='%s Parameters' % label, active=active, active_value=active_value, glob=True)
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
-    for mode, m in das_modules.items():
-        m.params(info, group_name=group_name)
+    das_modules.params(info, group_name=group_name)
 
 DAS_DEFAULT_ID = 'das'
 
@@ -139,6 +148,128 @@ class DASError(Exception):
     pass
 
 
+class Acquisition(object):
+    """
+    Background acquisition thread. Calls read() every interval seconds and places (timestamp, record) tuples in a
+    bounded ring buffer. The buffer has a single producer (the acquisition thread) and a single consumer (the test
+    script) and uses deque append/popleft, which are atomic, so neither side takes a lock.
+
+    Reads are scheduled on a fixed cadence from the start time. If a read takes longer than the interval, the missed
+    periods are counted as overruns and the schedule skips ahead rather than reading back to back to catch up.
+    """
+
+    def __init__(self, read, interval, buffer_size=ACQUISITION_BUFFER_SIZE, name=None):
+        """
+        :param read: function returning a data record
+        :param interval: sample interval (sec)
+        :param buffer_size: maximum number of records held in the ring buffer
+        :param name: thread name
+        """
+        self._read = read
+        self.interval = float(interval)
+        self.name = name
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._thread = None
+        self._stop = threading.Event()
+        self.samples = 0
+        self.overruns = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.start_time = None
+        self.stop_time = None
+
+    def start(self):
+        if self.running():
+            raise DASError('Acquisition already running')
+        # each run has its own stop event so a thread that outlived stop() never sees a cleared event
+        self._stop = threading.Event()
+        self.samples = self.overruns = self.dropped = self.errors = 0
+        self.last_error = None
+        self.start_time = time.time()
+        self.stop_time = None
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the acquisition thread. If the thread does not exit within timeout (e.g. blocked in a slow read) it keeps
+        running until the read returns, the acquisition stays marked as running and DASError is raised.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            if timeout is None:
+                timeout = self.interval + 5
+            self._thread.join(timeout)
+            self.stop_time = time.time()
+            if self._thread.is_alive():
+                raise DASError('Acquisition thread did not stop within %0.1f sec' % timeout)
+            self._thread = None
+
+    def running(self):
+        if self._thread is not None and not self._thread.is_alive():
+            self._thread = None
+        return self._thread is not None
+
+    def _run(self, stop):
+        interval = self.interval
+        buf = self._buffer
+        next_time = time.monotonic()
+        while not stop.is_set():
+            try:
+                rec = self._read()
+                t = time.time()
+                if len(buf) == buf.maxlen:
+                    self.dropped += 1
+                buf.append((t, rec))
+                self.samples += 1
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                missed = int(-delay / interval) + 1
+                self.overruns += missed
+                next_time += missed * interval
+                delay = next_time - time.monotonic()
+            stop.wait(max(delay, 0))
+
+    def read(self):
+        """
+        Remove and return all buffered (timestamp, record) tuples.
+        """
+        recs = []
+        buf = self._buffer
+        while buf:
+            recs.append(buf.popleft())
+        return recs
+
+    def status(self):
+        """
+        Return dictionary of acquisition statistics.
+        """
+        elapsed = None
+        rate = None
+        if self.start_time is not None:
+            end = self.stop_time
+            if end is None:
+                end = time.time()
+            elapsed = end - self.start_time
+            if elapsed > 0:
+                rate = self.samples / elapsed
+        return {'samples': self.samples,
+                'target_rate': 1. / self.interval,
+                'rate': rate,
+                'elapsed': elapsed,
+                'overruns': self.overruns,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'last_error': self.last_error,
+                'buffered': len(self._buffer)}
+
+
 class DAS(object):
     """
     Template for grid simulator implementations. This class can be used as a base class or
@@ -169,6 +300,8 @@ class DAS(object):
         self._timer = None
         self._ds = None
         self._last_datarec = []
+        self._acq = None
+        self._device_lock = threading.Lock()
 
         # optional interfaces to other SVP abstraction layers/device drivers
         self.dc_measurement_device = None
@@ -241,37 +374,109 @@ class DAS(object):
             raise DASError('DAS device not initialized')
         self.device.close()
 
-    def data_capture(self, enable=True, channels=None):
+    def data_capture(self, enable=True, channels=None, csv_file=None, background=False,
+                     buffer_size=ACQUISITION_BUFFER_SIZE):
         """
         Enable/disable data capture.
 
         If sample_interval == 0, there will be no autonomous data captures and self.data_sample should be used to add
         data points to the capture
+
+        If csv_file is provided, the capture is streamed to the csv file while it is running so the data recorded so
+        far is preserved if the test is interrupted. The file is completed when the capture is disabled.
+
+        If background is True, the device is read on a background acquisition thread instead of the test script
+        timer (see Acquisition). buffer_size is the number of records buffered between data_capture_read() and
+        data_capture_dataset() calls.
+        If the thread of the previous background capture did not stop in time, DASError is raised until it exits.
         """
         if self.device is not None:
             self.sample_interval = self.device.sample_interval
         if enable is True:
             if self._capture is False:
+                # an acquisition thread that outlived its stop() timeout still reads the device, keep the acquisition
+                # until the thread has exited rather than starting a second one
+                if self._acq is not None and self._acq.running():
+                    raise DASError('Previous acquisition thread is still running')
                 self._ds = dataset.Dataset(self.data_points, ts=self.ts)
+                if csv_file is not None:
+                    self._ds.csv_stream(csv_file)
                 self._last_datarec = []
+                self._acq = None
                 if self.sample_interval > 0:
-                    if self.sample_interval < MINIMUM_SAMPLE_PERIOD:
+                    if background:
+                        if self.sample_interval < MINIMUM_BACKGROUND_SAMPLE_PERIOD:
+                            raise DASError('Sample period too small: %s' % (self.sample_interval))
+                        self._acq = Acquisition(self.device_data_read, float(self.sample_interval)/1000,
+                                                buffer_size=buffer_size, name='%s acquisition' % self.group_name)
+                    elif self.sample_interval < MINIMUM_SAMPLE_PERIOD:
                         raise DASError('Sample period too small: %s' % (self.sample_interval))
-                    self._timer = self.ts.timer_start(float(self.sample_interval)/1000, self._timer_timeout,
-                                                      repeating=True)
+                    else:
+                        self._timer = self.ts.timer_start(float(self.sample_interval)/1000, self._timer_timeout,
+                                                          repeating=True)
                 self._capture = True
         elif enable is False:
             if self._capture is True:
                 if self._timer is not None:
                     self.ts.timer_cancel(self._timer)
                 self._timer = None
+                if self._acq is not None:
+                    try:
+                        self._acq.stop()
+                    except DASError as e:
+                        self.ts.log_warning(str(e))
+                    self._acq_read()
+                    self._acq_log()
                 self._capture = False
+                if self._ds is not None:
+                    self._ds.csv_close()
         self.device.data_capture(enable)
+        if enable is True and self._acq is not None and not self._acq.running():
+            self._acq.start()
+
+    def _acq_read(self):
+        """
+        Move records from the acquisition buffer to the capture dataset. The TIME point, if present, is set to the
+        time the record was read.
+        """
+        recs = self._acq.read()
+        if recs:
+            try:
+                time_index = self.data_points.index('TIME')
+            except ValueError:
+                time_index = None
+            for t, rec in recs:
+                if time_index is not None:
+                    rec[time_index] = t
+                self._ds.append(rec)
+            self._last_datarec = recs[-1][1]
+
+    def _acq_log(self):
+        status = self._acq.status()
+        msg = 'DAS acquisition: %s samples, %s samples/sec (target %0.3f), %s overruns, %s dropped, %s errors' % \
+              (status['samples'], '%0.3f' % status['rate'] if status['rate'] is not None else 'N/A',
+               status['target_rate'], status['overruns'], status['dropped'], status['errors'])
+        if status['overruns'] or status['dropped'] or status['errors']:
+            self.ts.log_warning(msg)
+            if status['last_error'] is not None:
+                self.ts.log_warning('DAS acquisition last error: %s' % status['last_error'])
+        else:
+            self.ts.log_debug(msg)
+
+    def acquisition_status(self):
+        """
+        Return background acquisition statistics (see Acquisition.status()) or None if background acquisition is
+        not in use.
+        """
+        if self._acq is not None:
+            return self._acq.status()
 
     def data_capture_read(self):
         """
         Return the last data sample from the data capture in expanded format.
         """
+        if self._acq is not None and self._capture is True:
+            self._acq_read()
         rec = []
         if len(self._last_datarec) > 0:
             rec = self._data_expand(self._last_datarec)
@@ -283,6 +488,8 @@ class DAS(object):
         """
         Return dataset (Dataset) created from last data capture.
         """
+        if self._acq is not None and self._capture is True:
+            self._acq_read()
         return self._ds
 
     def device_data_read(self):
@@ -290,7 +497,8 @@ class DAS(object):
         Read the current data values directly from the DAS. It does not create a new data sample in the
         data capture, if active.
         """
-        data = self.device.data_read()
+        with self._device_lock:
+            data = self.device.data_read()
         # add soft channel points
         for p in self.sc_data_points:
             data.append(self.sc[p])
@@ -309,8 +517,12 @@ class DAS(object):
         Read the current data values directly from the DAS and place in the current dataset.
         """
         if self._capture is True:
-            self._last_datarec = self.device_data_read()
-            self._ds.append(self._last_datarec)
+            if self._acq is not None:
+                # samples are taken by the acquisition thread
+                self._acq_read()
+            else:
+                self._last_datarec = self.device_data_read()
+                self._ds.append(self._last_datarec)
         return self._last_datarec
 
     def waveform_config(self, params):
@@ -357,29 +569,8 @@ class DAS(object):
 
 def das_scan():
     global das_modules
-    # scan all files in current directory that match das_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'das_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'das_info'):
-                info = m.das_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    das_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise DASError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match das_*.py, modules are imported when first used
+    das_modules.scan(DASError)
 
 # scan for das modules on import
 das_scan()
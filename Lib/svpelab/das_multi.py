@@ -0,0 +1,124 @@
+"""
+Copyright (c) 2017, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Questions can be directed to support@sunspec.org
+"""
+
+import os
+
+from . import device_das_multi
+from . import das
+
+'''
+The Multiple DAS mode combines several DAS groups configured in the test (das_1, das_2, ...) into one DAS. Each
+sample reads all of the devices in parallel, the records are merged under a single TIME point and the point names of
+each device are prefixed with the device prefix, if one is given.
+
+    das.params(info, id=1, label='Power Analyzer')
+    das.params(info, id=2, label='HIL')
+    das.params(info)  # mode = 'Multiple DAS', DAS 1 ID = 1, DAS 2 ID = 2, DAS 2 Prefix = HIL
+
+    daq = das.das_init(ts)
+'''
+
+multi_info = {
+    'name': os.path.splitext(os.path.basename(__file__))[0],
+    'mode': 'Multiple DAS'
+}
+
+MAX_DAS_COUNT = 4
+
+def das_info():
+    return multi_info
+
+GROUP_NAME = 'multi'
+
+def params(info, group_name):
+    gname = lambda name: group_name + '.' + name
+    pname = lambda name: group_name + '.' + GROUP_NAME + '.' + name
+    mode = multi_info['mode']
+    info.param_add_value(gname('mode'), mode)
+    info.param_group(gname(GROUP_NAME), label='%s Parameters' % mode, active=gname('mode'), active_value=mode,
+                     glob=True)
+    info.param(pname('sample_interval'), label='Sample Interval (ms)', default=1000)
+    info.param(pname('das_count'), label='Number of DAS', default=2, values=list(range(2, MAX_DAS_COUNT + 1)))
+    for i in range(1, MAX_DAS_COUNT + 1):
+        active = None
+        active_value = None
+        if i > 2:
+            active = pname('das_count')
+            active_value = list(range(i, MAX_DAS_COUNT + 1))
+        info.param(pname('das_%d_id' % i), label='DAS %d ID' % i, default=i, active=active,
+                   active_value=active_value)
+        info.param(pname('das_%d_prefix' % i), label='DAS %d Point Prefix' % i, default='None', active=active,
+                   active_value=active_value)
+
+
+class DAS(das.DAS):
+
+    def __init__(self, ts, group_name, points=None, sc_points=None, support_interfaces=None):
+        das.DAS.__init__(self, ts, group_name, points=points, sc_points=sc_points, support_interfaces=support_interfaces)
+        self.params['ts'] = ts
+        self.params['sample_interval'] = self._param_value('sample_interval')
+
+        # the combined DAS groups are siblings of this group
+        parent_group = None
+        if '.' in group_name:
+            parent_group = group_name.rsplit('.', 1)[0]
+
+        das_list = []
+        prefixes = []
+        for i in range(1, int(self._param_value('das_count')) + 1):
+            das_id = self._param_value('das_%d_id' % i)
+            prefix = self._param_value('das_%d_prefix' % i)
+            if prefix is None or prefix == 'None':
+                prefix = ''
+            # soft channel points are maintained by the combined DAS
+            d = das.das_init(ts, id=das_id, points=points, sc_points=[], group_name=parent_group,
+                             support_interfaces=support_interfaces)
+            if d is None:
+                raise das.DASError('DAS %s (id %s) is disabled' % (i, das_id))
+            das_list.append(d)
+            prefixes.append(prefix)
+
+        self.params['das'] = das_list
+        self.params['prefixes'] = prefixes
+
+        self.device = device_das_multi.Device(self.params)
+        self.data_points = self.device.data_points
+
+        # initialize soft channel points
+        self._init_sc_points()
+
+    def _param_value(self, name):
+        return self.ts.param_value(self.group_name + '.' + GROUP_NAME + '.' + name)
+
+
+if __name__ == "__main__":
+    pass
@@ -76,6 +76,10 @@ def params(info, group_name):
     info.param(pname('sample_rate'), label='Sampling Rate (Hz)', default=2.5e9)
     info.param(pname('length'), label='Data Length', default='1k', values=['1k', '10k', '100k', '1M', '5M'])
     info.param(pname('save_wave'), label='Save Waveforms?', default='No', values=['Yes', 'No'])
+    info.param(pname('wave_format'), label='Waveform File Format', default='csv',
+               values=['csv', 'parquet', 'hdf5'], active=pname('save_wave'), active_value=['Yes'])
+    info.param(pname('wave_encoding'), label='Waveform Transfer Encoding', default='RIBinary',
+               values=['RIBinary', 'FPBinary', 'ASCii'])
 
 GROUP_NAME = 'dpo3000'
 
@@ -106,6 +110,8 @@ class DAS(das.DAS):
         self.params['horiz_scale'] = self._param_value('horiz')
         self.params['sample_rate'] = self._param_value('sample_rate')
         self.params['save_wave'] = self._param_value('save_wave')
+        self.params['wave_format'] = self._param_value('wave_format')
+        self.params['wave_encoding'] = self._param_value('wave_encoding')
 
         if self._param_value('length') == '1k':
             self.params['length'] = 1000
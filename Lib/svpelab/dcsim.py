@@ -32,8 +32,7 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
 # Import all dcsim extensions in current directory.
 # A dcsim extension has a file name of dcsim_*.py and contains a function dcsim_params(info) that contains
@@ -41,7 +40,7 @@ import importlib
 
 # dict of modules found, entries are: name : module_name
 
-dcsim_modules = {}
+dcsim_modules = plugins.ModuleRegistry(__name__, 'dcsim')
 
 def params(info, id=None, label='DC Simulator', group_name=None, active=None, active_value=None):
     if group_name is None:
@@ -55,8 +54,7 @@ def params(info, id=None, label='DC Simulator', group_name=None, active=None, ac
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
     info.param(name('auto_config'), label='Configure dc simulator at beginning of test', default='Disabled',
                values=['Enabled', 'Disabled'])
-    for mode, m in dcsim_modules.items():
-        m.params(info, group_name=group_name)
+    dcsim_modules.params(info, group_name=group_name)
 
 DCSIM_DEFAULT_ID = 'dcsim'
 
@@ -225,29 +223,8 @@ class DCSim(object):
 
 def dcsim_scan():
     global dcsim_modules
-    # scan all files in current directory that match dcsim_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'dcsim_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'dcsim_info'):
-                info = m.dcsim_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    dcsim_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise DCSimError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match dcsim_*.py, modules are imported when first used
+    dcsim_modules.scan(DCSimError)
 
 # scan for dcsim modules on import
 dcsim_scan()
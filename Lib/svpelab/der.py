@@ -31,10 +31,9 @@ Questions can be directed to support@sunspec.org
 """
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
-der_modules = {}
+der_modules = plugins.ModuleRegistry(__name__, 'der')
 
 def params(info, id=None, label='DER', group_name=None, active=None, active_value=None):
     if group_name is None:
@@ -46,8 +45,7 @@ def params(info, id=None, label='DER', group_name=None, active=None, active_valu
     name = lambda name: group_name + '.' + name
     info.param_group(group_name, label='%s Parameters' % label,  active=active, active_value=active_value, glob=True)
     info.param(name('mode'), label='%s Mode' % label, default='Disabled', values=['Disabled'])
-    for mode, m in der_modules.items():
-        m.params(info, group_name=group_name)
+    der_modules.params(info, group_name=group_name)
 
 DER_DEFAULT_ID = 'der'
 
@@ -476,29 +474,8 @@ class DER(object):
 
 def der_scan():
     global der_modules
-    # scan all files in current directory that match der_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'der_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'der_info'):
-                info = m.der_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    der_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise DERError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match der_*.py, modules are imported when first used
+    der_modules.scan(DERError)
 
 # scan for der modules on import
 der_scan()
@@ -31,10 +31,9 @@ Questions can be directed to support@sunspec.org
 """
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
-der1547_modules = {}
+der1547_modules = plugins.ModuleRegistry(__name__, 'der1547')
 
 
 def params(info, id=None, label='DER1547', group_name=None, active=None, active_value=None):
@@ -50,8 +49,7 @@ def params(info, id=None, label='DER1547', group_name=None, active=None, active_
     name = lambda name: group_name + '.' + name
     info.param_group(group_name, label='%s Parameters' % label, active=active, active_value=active_value, glob=True)
     info.param(name('mode'), label='%s Mode' % label, default='Disabled', values=['Disabled'])
-    for mode, m in list(der1547_modules.items()):
-        m.params(info, group_name=group_name)
+    der1547_modules.params(info, group_name=group_name)
 
 
 DER1547_DEFAULT_ID = 'der1547'
@@ -357,29 +355,8 @@ class DER1547(object):
 
 def der1547_scan():
     global der1547_modules
-    # scan all files in current directory that match der1547_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'der1547_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'der1547_info'):
-                info = m.der1547_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    der1547_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise DER1547Error('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match der1547_*.py, modules are imported when first used
+    der1547_modules.scan(DER1547Error)
 
 # scan for der1547 modules on import
 der1547_scan()
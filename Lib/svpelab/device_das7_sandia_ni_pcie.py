@@ -453,6 +453,8 @@ class Device(object):
 
         # Calculate AC information for each device/metered point
         sets = ['mcc', 'load', 'genset', 'pv', 'bat']
+        freq_names = []
+        freq_data = []
         for s in sets:
             ac_voltage_a = None
             ac_voltage_b = None
@@ -466,9 +468,8 @@ class Device(object):
                     self.ts.log_debug('Found Channel %s' % analog_chan_name)
                     if analog_chan_name[-5:] == 'v_phA':
                         ac_voltage_a = data[dsm_name]
-                        svp_name = s + '_freq'
-                        datarec[svp_name], _ = waveform_analysis.freq_from_crossings(self.time_vector, ac_voltage_a,
-                                                                                     self.sample_rate)
+                        freq_names.append(s + '_freq')
+                        freq_data.append(ac_voltage_a)
                     elif analog_chan_name[-5:] == 'v_phB':
                         ac_voltage_b = data[dsm_name]
                     elif analog_chan_name[-5:] == 'v_phC':
@@ -484,42 +485,34 @@ class Device(object):
 
             self.ts.log_debug(datarec)
 
-            avg_P_a = None
-            avg_P_b = None
-            avg_P_c = None
-            S_a = None
-            S_b = None
-            S_c = None
-            Q1_a = None
-            Q1_b = None
-            Q1_c = None
-            PF1_a = None
-
-            if ac_voltage_a is not None and ac_current_a is not None:
-                avg_P_a, S_a, Q1_a, N_a, PF1_a = waveform_analysis.harmonic_analysis(self.time_vector,
-                                                                                     ac_voltage_a, ac_current_a,
-                                                                                     self.sample_rate, self.ts)
+            # analyze all the phases with both current and voltage datasets as one 2-D block
+            ac_voltage = []
+            ac_current = []
+            for ph, v, i in (('A', ac_voltage_a, ac_current_a), ('B', ac_voltage_b, ac_current_b),
+                             ('C', ac_voltage_c, ac_current_c)):
+                if v is not None and i is not None:
+                    ac_voltage.append(v)
+                    ac_current.append(i)
+                else:
+                    self.ts.log_debug('Missing phase %s current or voltage datasets for %s' % (ph, s))
+
+            if len(ac_voltage) == 3:
+                r = waveform_analysis.power_analysis(ac_voltage, ac_current, self.sample_rate)
+                datarec[s + '_p'] = float(np.sum(r['P']))
+                datarec[s + '_s'] = float(np.sum(r['S']))
+                datarec[s + '_q'] = float(np.sum(r['Q1']))
+                datarec[s + '_pf'] = float(r['PF1'][0])
             else:
-                self.ts.log_debug('Missing phase A current or voltage datasets for %s' % s)
+                datarec[s + '_p'] = None
+                datarec[s + '_s'] = None
+                datarec[s + '_q'] = None
+                datarec[s + '_pf'] = None
 
-            if ac_voltage_b is not None and ac_current_b is not None:
-                avg_P_b, S_b, Q1_b, N_b, PF1_b = waveform_analysis.harmonic_analysis(self.time_vector,
-                                                                                     ac_voltage_b, ac_current_b,
-                                                                                     self.sample_rate, self.ts)
-            else:
-                self.ts.log_debug('Missing phase B current or voltage datasets for %s' % s)
-
-            if ac_voltage_c is not None and ac_current_c is not None:
-                avg_P_c, S_c, Q1_c, N_c, PF1_c = waveform_analysis.harmonic_analysis(self.time_vector,
-                                                                                     ac_voltage_c, ac_current_c,
-                                                                                     self.sample_rate, self.ts)
-            else:
-                self.ts.log_debug('Missing phase C current or voltage datasets for %s' % s)
-
-            datarec[s + '_p'] = avg_P_a + avg_P_b + avg_P_c
-            datarec[s + '_s'] = S_a + S_b + S_c
-            datarec[s + '_q'] = Q1_a + Q1_b + Q1_c
-            datarec[s + '_pf'] = PF1_a
+        # estimate the frequency of all the phase A voltages in one pass
+        if freq_data:
+            freqs, _ = waveform_analysis.freq_from_crossings(self.time_vector, freq_data, self.sample_rate)
+            for svp_name, freq in zip(freq_names, freqs):
+                datarec[svp_name] = freq
 
         return datarec
 
@@ -827,9 +820,8 @@ if __name__ == "__main__":
 
     plt.show()
 
-    avg_P, S, Q1, N, PF1 = waveform_analysis.harmonic_analysis(time_vector, data[analog_channels[0]],
-                                                               data[analog_channels[1]],
-                                                               sample_rate, None)
+    r = waveform_analysis.power_analysis(data[analog_channels[0]], data[analog_channels[1]], sample_rate)
+    avg_P, Q1 = r['P'], r['Q1']
 
     print(('Power = %s, Q = %s' % (avg_P, Q1)))
 
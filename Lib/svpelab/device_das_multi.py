@@ -0,0 +1,146 @@
+"""
+Copyright (c) 2017, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Questions can be directed to support@sunspec.org
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DeviceError(Exception):
+    """
+    Exception to wrap all das generated exceptions.
+    """
+    pass
+
+
+class Device(object):
+    """
+    Combined device for several DAS instances. data_read() reads all of the DAS devices concurrently, one thread per
+    device, so the time to take a sample is the longest device read rather than the sum of the device reads.
+
+    The records are aligned to a common timestamp, the mean of the midpoints of the device reads. The TIME points of
+    the individual devices are replaced by this timestamp. The read time of each device and the spread of the read
+    midpoints (skew) of the last sample are available in latency and skew.
+    """
+
+    def __init__(self, params=None):
+        self.params = params
+        self.ts = params.get('ts')
+        self.sample_interval = params.get('sample_interval')
+        self.das = params.get('das')
+        self.prefixes = params.get('prefixes')
+        self.data_points = ['TIME']
+        self.latency = [None] * len(self.das)
+        self.skew = None
+        self._time_index = []
+        self._pool = None
+
+        for d, prefix in zip(self.das, self.prefixes):
+            time_index = None
+            for i, p in enumerate(d.data_points):
+                if p == 'TIME':
+                    time_index = i
+                    continue
+                if prefix:
+                    p = '%s_%s' % (prefix, p)
+                if p in self.data_points:
+                    raise DeviceError('Duplicate data point %s, use a DAS point prefix' % p)
+                self.data_points.append(p)
+            self._time_index.append(time_index)
+
+    def info(self):
+        return 'Multiple DAS - %s' % ', '.join([str(d.info()) for d in self.das])
+
+    def open(self):
+        for d in self.das:
+            d.open()
+        self._pool_open()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for d in self.das:
+            d.close()
+
+    def _pool_open(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=len(self.das))
+
+    def data_capture(self, enable=True):
+        for d in self.das:
+            d.device.data_capture(enable)
+
+    @staticmethod
+    def _read(d):
+        start = time.time()
+        data = d.device_data_read()
+        return start, time.time(), data
+
+    def data_read(self):
+        self._pool_open()
+        futures = [self._pool.submit(self._read, d) for d in self.das]
+        results = []
+        for i, f in enumerate(futures):
+            try:
+                results.append(f.result())
+            except Exception as e:
+                raise DeviceError('Error reading DAS %s: %s' % (i + 1, str(e)))
+
+        mids = [(start + end)/2. for start, end, data in results]
+        self.latency = [end - start for start, end, data in results]
+        self.skew = max(mids) - min(mids)
+
+        rec = [sum(mids)/len(mids)]
+        for (start, end, data), time_index in zip(results, self._time_index):
+            if time_index is not None:
+                data = data[:time_index] + data[time_index + 1:]
+            rec.extend(data)
+        return rec
+
+    def waveform_config(self, params):
+        return self.das[0].waveform_config(params)
+
+    def waveform_capture(self, enable=True, sleep=None):
+        return self.das[0].waveform_capture(enable=enable, sleep=sleep)
+
+    def waveform_status(self):
+        return self.das[0].waveform_status()
+
+    def waveform_force_trigger(self):
+        return self.das[0].waveform_force_trigger()
+
+    def waveform_capture_dataset(self):
+        return self.das[0].waveform_capture_dataset()
+
+
+if __name__ == "__main__":
+    pass
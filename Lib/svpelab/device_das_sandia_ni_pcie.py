@@ -507,16 +507,17 @@ class Device(object):
             if self.analog_channels[k] == 'Ametek_Trigger':
                 self.ametek_trigger = data[self.analog_channels[k]]
 
-        if self.ac_voltage_vector is not None:
-            freq, _ = waveform_analysis.freq_from_crossings(self.time_vector, self.ac_voltage_vector, self.sample_rate)
-        elif self.ac_current_vector is not None:
-            freq, _ = waveform_analysis.freq_from_crossings(self.time_vector, self.ac_current_vector, self.sample_rate)
-        else:
-            freq = None
-
-        avg_P, S, Q1, N, PF1 = waveform_analysis.harmonic_analysis(self.time_vector, self.ac_voltage_vector,
-                                                                   self.ac_current_vector,
-                                                                   self.sample_rate, self.ts)
+        # the DAQ tasks are started and stopped for every read so the blocks are not contiguous, the frequency is
+        # estimated from each block with the batch estimator (FrequencyTracker needs a continuous acquisition)
+        freq = None
+        freq_signal = self.ac_voltage_vector if self.ac_voltage_vector is not None else self.ac_current_vector
+        if freq_signal is not None:
+            freq, _ = waveform_analysis.freq_from_crossings(self.time_vector, freq_signal, self.sample_rate)
+
+        avg_P = S = Q1 = PF1 = None
+        if self.ac_voltage_vector is not None and self.ac_current_vector is not None:
+            r = waveform_analysis.power_analysis(self.ac_voltage_vector, self.ac_current_vector, self.sample_rate)
+            avg_P, S, Q1, PF1 = r['P'], r['S'], r['Q1'], r['PF1']
         datarec = {'TIME': time.time(),
                    'AC_VRMS_1': ac_voltage,
                    'AC_IRMS_1': ac_current,
@@ -701,7 +702,8 @@ class Device(object):
         self.wfm_trigger_cond = trig_condition
 
     def waveform_capture_dataset(self):
-        ds = dataset.Dataset()
+        # scaled channel arrays are used directly as dataset columns and can be saved to any dataset file format
+        ds = dataset.Dataset(sample_rate=self.sample_rate)
         ds.points.append('TIME')
         ds.data.append(self.time_vector)
 
@@ -1259,11 +1261,11 @@ if __name__ == "__main__":
 
     plt.show()
 
-    avg_P, S, Q1, N, PF1 = waveform_analysis.harmonic_analysis(time_vector, data[analog_channels[0]],
-                                                                   data[analog_channels[1]],
-                                                                   sample_rate, None)
-
-    print('Power = %s, Q = %s' % (avg_P, Q1))
+    # both voltage/current pairs in one pass
+    r = waveform_analysis.power_analysis([data[analog_channels[0]], data[analog_channels[2]]],
+                                         [data[analog_channels[1]], data[analog_channels[3]]], sample_rate)
+    print('Power = %s, Q = %s' % (r['P'], r['Q1']))
+    avg_P, Q1 = r['P'][0], r['Q1'][0]
 
     f = open('D:\\SVP\\Node_4_waveforms-P=%s, Q=%s.csv' % (avg_P, Q1), 'w')
     f.write('Python Time (s), AC Voltage (V), AC Current (A)\n')
@@ -32,7 +32,8 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import time
-import socket
+
+from . import scpi
 
 EN_50530_CURVE = 'EN 50530 CURVE'
 SVP_CURVE = 'SVP CURVE'
@@ -53,15 +54,17 @@ class SPS(object):
         self.ipaddr = ipaddr
         self.ipport = ipport
         self.timeout = timeout
-        self.buffer_size = 1024
         self.conn = None
         self.curve = None  # I-V Curve handle
         self.profile = None  # Irradiance/temperature vs time profile
         self.irradiance = 1000  # initial irradiance
         self.group_index = None
 
+        # the network connection is kept open between commands and reopened after communication errors
+        if self.comm == 'Network':
+            self.conn = scpi.TcpTransport(ipaddr, ipport, write_term='\r', read_term='\r', timeout=timeout)
         # if using VISA, configure the connection
-        if self.comm == 'VISA':
+        elif self.comm == 'VISA':
             try:
                 import visa
                 self.rm = visa.ResourceManager()
@@ -74,37 +77,14 @@ class SPS(object):
 
     # TCP/IP command
     def _cmd(self, cmd_str):
-        try:
-            if self.conn is None or self.conn is 'Network':
-                self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.conn.settimeout(self.timeout)
-                self.conn.connect((self.ipaddr, self.ipport))
-
-            # print 'cmd> %s' % (cmd_str)
-            self.conn.send(cmd_str)
-        except Exception as e:
-            raise
+        self.conn.write(cmd_str)
 
     # TCP/IP query
     def _query(self, cmd_str):
-        resp = ''
-        more_data = True
-
-        self._cmd(cmd_str)
-
-        while more_data:
-            try:
-                data = self.conn.recv(self.buffer_size)
-                if len(data) > 0:
-                    for d in data:
-                        resp += d
-                        if d == '\r':
-                            more_data = False
-                            break
-            except Exception as e:
-                raise SPSError('Timeout waiting for response')
-
-        return resp
+        try:
+            return self.conn.query(cmd_str)
+        except scpi.ScpiError as e:
+            raise SPSError(str(e))
 
     def cmd(self, cmd_str):
         try:
@@ -119,8 +99,6 @@ class SPS(object):
                 self.conn.write(cmd_str)
         except Exception as e:
             raise SPSError(str(e))
-        finally:
-            self.close()
 
     def query(self, cmd_str):
         resp = None
@@ -131,8 +109,6 @@ class SPS(object):
                 resp = self.conn.query(cmd_str)
         except Exception as e:
             raise SPSError(str(e))
-        finally:
-            self.close()
 
         return resp
 
@@ -151,8 +127,6 @@ class SPS(object):
                 self.conn.close()
         except Exception as e:
             pass
-        finally:
-            self.conn = None
 
     def curves_get(self):
         return self.query('CURVe:CATalog?\r').strip().split(',')
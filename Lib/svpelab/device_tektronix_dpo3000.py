@@ -36,6 +36,7 @@ import numpy as np
 from pylab import *
 import math
 from . import dataset
+from . import scpi
 
 DATA_POINTS = [  # 3 phase
     'TIME',
@@ -95,6 +96,97 @@ class DeviceError(Exception):
     pass
 
 
+'''
+Binary waveform transfer
+
+With a binary DATa:ENCdg, CURVe? returns an IEEE 488.2 definite length block (#<digits><length><data>) that is
+converted with np.frombuffer into the waveform array preallocated for the record length. The scaling of each channel
+comes from one WFMOutpre? preamble query:
+
+    time_i = XINcr * i
+    value_i = (raw_i - YOFf) * YMUlt + YZEro
+
+wave_encoding sets the encoding, 'ASCii' selects the comma separated transfer.
+'''
+
+WAVE_ENCODING_ASCII = 'ASCii'
+WAVE_ENCODINGS = {'RIBinary': 2, 'RPBinary': 2, 'SRIbinary': 2, 'SRPbinary': 2, 'FPBinary': 4}  # bytes per point
+CURVE_CHUNK = 1000000               # maximum points per CURVe? transfer
+VISA_CHUNK_SIZE = 4 * 1024 * 1024   # VISA read size for the block transfers
+
+# WFMOutpre? response fields
+PREAMBLE_FIELDS = ['BYT_NR', 'BIT_NR', 'ENCDG', 'BN_FMT', 'BYT_OR', 'WFID', 'NR_PT', 'PT_FMT', 'XUNIT', 'XINCR',
+                   'XZERO', 'PT_OFF', 'YUNIT', 'YMULT', 'YOFF', 'YZERO']
+PREAMBLE_NUMBERS = ['BYT_NR', 'BIT_NR', 'NR_PT', 'XINCR', 'XZERO', 'PT_OFF', 'YMULT', 'YOFF', 'YZERO']
+
+
+def parse_block(raw):
+    """
+    Return the data of an IEEE 488.2 block response.
+
+    :param raw: response bytes, #<digits><length><data> optionally preceded by a header
+    :return: memoryview of the block data
+    """
+    start = raw.find(b'#')
+    if start < 0 or len(raw) < start + 2:
+        raise DeviceError('Invalid block response: %r' % bytes(raw[:20]))
+    digits = raw[start + 1] - 0x30
+    if digits == 0:
+        # indefinite length block terminated by the message terminator
+        return memoryview(raw)[start + 2:len(raw.rstrip(b'\r\n'))]
+    if not 1 <= digits <= 9:
+        raise DeviceError('Invalid block response: %r' % bytes(raw[start:start + 20]))
+    begin = start + 2 + digits
+    length = int(raw[start + 2:begin])
+    if len(raw) < begin + length:
+        raise DeviceError('Incomplete block response: %d of %d bytes' % (len(raw) - begin, length))
+    return memoryview(raw)[begin:begin + length]
+
+
+def parse_preamble(resp):
+    """
+    Parse a WFMOutpre? response, with or without headers.
+
+    :param resp: response string
+    :return: dict of PREAMBLE_FIELDS names: values, numbers converted to float
+    """
+    preamble = {}
+    for i, unit in enumerate(scpi.split_response(resp.strip())):
+        name = None
+        if unit[:1] == ':' or (unit[:1].isalpha() and ' ' in unit.split('"', 1)[0]):
+            header, unit = unit.split(' ', 1)
+            header = header.split(':')[-1].upper()
+            for field in PREAMBLE_FIELDS:
+                if field.startswith(header) or header.startswith(field):
+                    name = field
+                    break
+        elif i < len(PREAMBLE_FIELDS):
+            name = PREAMBLE_FIELDS[i]
+        if name is not None:
+            unit = unit.strip()
+            if name in PREAMBLE_NUMBERS:
+                try:
+                    unit = float(unit)
+                except ValueError:
+                    raise DeviceError('Invalid waveform preamble %s value: %s' % (name, unit))
+            preamble[name] = unit
+    for name in ('BYT_NR', 'BN_FMT', 'YMULT', 'YOFF', 'YZERO', 'XINCR'):
+        if name not in preamble:
+            raise DeviceError('Waveform preamble %s missing: %s' % (name, resp))
+    return preamble
+
+
+def preamble_dtype(preamble):
+    """
+    Return the numpy dtype of the curve data described by a waveform preamble.
+    """
+    kind = {'RI': 'i', 'RP': 'u', 'FP': 'f'}.get(str(preamble['BN_FMT']).upper()[:2])
+    if kind is None:
+        raise DeviceError('Unsupported binary format: %s' % preamble['BN_FMT'])
+    order = '<' if str(preamble.get('BYT_OR', 'MSB')).upper().startswith('L') else '>'
+    return np.dtype('%s%s%d' % (order, kind, int(preamble['BYT_NR'])))
+
+
 class Device(object):
 
     def __init__(self, params):
@@ -106,6 +198,12 @@ class Device(object):
         self.ts = params.get('ts')
         self.sample_interval = params.get('sample_interval')
         self.save_wave = params.get('save_wave')
+        self.wave_format = params.get('wave_format')
+        if self.wave_format is None:
+            self.wave_format = dataset.FILE_FORMAT_CSV
+        self.wave_encoding = params.get('wave_encoding')
+        if self.wave_encoding is None:
+            self.wave_encoding = 'RIBinary'
 
         self.data_points = []
         for x in range(len(DATA_POINTS)):
@@ -153,6 +251,7 @@ class Device(object):
                 self.rm = visa.ResourceManager()
                 self.conn = self.rm.open_resource(params.get('visa_id'))
                 self.conn.write_termination = '\n'
+                self.conn.chunk_size = VISA_CHUNK_SIZE
 
                 try:
                     if self.ts is not None:
@@ -236,6 +335,20 @@ class Device(object):
 
         return resp
 
+    def query_raw(self, cmd_str):
+        """
+        Query returning the raw response bytes, for block responses.
+        """
+        try:
+            resp = b''
+            if self.params.get('comm') == 'VISA':
+                self.conn.write(cmd_str)
+                resp = self.conn.read_raw()
+        except Exception as e:
+            raise DeviceError('DPO3000 communication error: %s' % str(e))
+
+        return resp
+
     def open(self):
         pass
 
@@ -277,22 +390,24 @@ class Device(object):
         wfm_sw_i_2 = None
         wfm_sw_v_2 = None
         wfm_bus_v = None
-        times = None
-        for i in range(1, 4):  # pull data from each channel
-            if self.chan_types.get(i) != 'None':
-                if self.chan_types.get(i) == 'Switch_Current':
-                    times, wfm_sw_i = self.bitstream_to_analog(channel=i)
-                if self.chan_types.get(i) == 'Switch_Voltage':
-                    times, wfm_sw_v = self.bitstream_to_analog(channel=i)
-                if self.chan_types.get(i) == 'Bus_Voltage':
-                    times, wfm_bus_v = self.bitstream_to_analog(channel=i)
+        # pull data from each channel
+        channels = [i for i in range(1, 4) if self.chan_types.get(i) in ('Switch_Current', 'Switch_Voltage',
+                                                                          'Bus_Voltage')]
+        times, wfms = self.read_waveforms(channels)
+        for i in channels:
+            if self.chan_types.get(i) == 'Switch_Current':
+                wfm_sw_i = wfms[i]
+            if self.chan_types.get(i) == 'Switch_Voltage':
+                wfm_sw_v = wfms[i]
+            if self.chan_types.get(i) == 'Bus_Voltage':
+                wfm_bus_v = wfms[i]
 
         # save the waveform data to a csv in the test manifest
         wave_filename = None
         if self.save_wave == 'Yes':
-            self.ts.log('Saving a .csv file of the waveform. This will take a while...')
-            ds = dataset.Dataset()
-            wave_filename = '%s_wave.csv' % time.time()
+            self.ts.log('Saving a %s file of the waveform. This will take a while...' % self.wave_format)
+            ds = dataset.Dataset(sample_rate=self.sample_rate)
+            wave_filename = '%s_wave%s' % (time.time(), dataset.file_formats[self.wave_format]['ext'][0])
             self.ts.log('Saving file: %s' % wave_filename)
             ds.points.append('TIME')
             if times is not None:
@@ -308,7 +423,7 @@ class Device(object):
                         ds.data.append(wfm_sw_v)
                     if self.chan_types.get(chan+1) == 'Bus_Voltage':
                         ds.data.append(wfm_bus_v)
-            ds.to_csv(self.ts.result_file_path(wave_filename))
+            ds.save(self.ts.result_file_path(wave_filename), fmt=self.wave_format)
             self.ts.result_file(wave_filename)
 
         v_off_1 = None
@@ -556,12 +671,67 @@ class Device(object):
         """
         pass
 
+    def read_waveforms(self, channels):
+        """
+        Collect the data of several channels and convert it to current/voltage values.
+
+        With a binary wave_encoding the curves are transferred as blocks converted into numpy arrays, the record is
+        transferred in CURVE_CHUNK point blocks without waiting between them.
+
+        :param channels: list of channel numbers
+        :return: (times, dict of channel: values)
+        """
+        if self.wave_encoding == WAVE_ENCODING_ASCII:
+            times = None
+            wfms = {}
+            for channel in channels:
+                times, wfms[channel] = self.bitstream_to_analog(channel=channel)
+            return times, wfms
+
+        width = WAVE_ENCODINGS.get(self.wave_encoding)
+        if width is None:
+            raise DeviceError('Unknown waveform encoding: %s' % self.wave_encoding)
+        total_length = int(float(self.query('HORizontal:RECOrdlength?').split('\n')[0]))
+        self.cmd('DATa:ENCdg ' + self.wave_encoding)
+        self.cmd('WFMOutpre:BYT_Nr ' + str(width))
+        self.query('*OPC?')  # returns when the pending operations are complete
+
+        times = None
+        wfms = {}
+        for channel in channels:
+            self.cmd('DATa:SOUrce CH' + str(channel))
+            wfm = np.empty(total_length)
+            pos = 0
+            preamble = dtype = None
+            for start in range(1, total_length + 1, CURVE_CHUNK):
+                self.cmd('DATa:STARt ' + str(start))
+                self.cmd('DATa:STOP ' + str(min(start + CURVE_CHUNK - 1, total_length)))
+                if preamble is None:
+                    preamble = parse_preamble(self.query('WFMOutpre?'))
+                    dtype = preamble_dtype(preamble)
+                data = np.frombuffer(parse_block(self.query_raw('CURVe?')), dtype=dtype)
+                n = min(len(data), total_length - pos)
+                chunk = wfm[pos:pos + n]
+                np.subtract(data[:n], preamble['YOFF'], out=chunk)
+                chunk *= preamble['YMULT']
+                chunk += preamble['YZERO']
+                pos += n
+            wfms[channel] = wfm[:pos]
+            if times is None:
+                times = np.arange(pos) * preamble['XINCR']
+        return times, wfms
+
     def bitstream_to_analog(self, channel=1):
         """
         Collect data and convert channels to current/voltage values
         """
 
+        if self.wave_encoding != WAVE_ENCODING_ASCII:
+            times, wfms = self.read_waveforms([channel])
+            return times, wfms[channel]
+
         self.cmd('DATa:SOUrce CH' + str(channel))  # setup the channel to read
+        self.cmd('DATa:ENCdg ASCii')
 
         """
         Get the conversion parameters to move bit stream into voltage/current values
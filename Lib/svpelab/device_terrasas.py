@@ -34,7 +34,8 @@ Documentation: http://www.programmablepower.com/custom-power-supply/ETS/download
 
 import sys
 import time
-import socket
+
+from . import scpi
 
 EN_50530_CURVE = 'EN 50530 CURVE'
 SVP_CURVE = 'SVP CURVE'
@@ -52,41 +53,18 @@ class TerraSAS(object):
         self.ipaddr = ipaddr
         self.ipport = ipport
         self.timeout = timeout
-        self.buffer_size = 1024
-        self.conn = None
+        # the connection is kept open between commands and reopened after communication errors
+        self.conn = scpi.TcpTransport(ipaddr, ipport, write_term='\r', read_term='\r', timeout=timeout,
+                                      encoding='utf-8')
 
     def _cmd(self, cmd_str):
-        try:
-            if self.conn is None:
-                self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.conn.settimeout(self.timeout)
-                self.conn.connect((self.ipaddr, self.ipport))
-
-            # print 'cmd> %s' % (cmd_str)
-            cmd_str = cmd_str.encode('utf-8')
-            self.conn.send(cmd_str)
-        except Exception as e:
-            raise
+        self.conn.write(cmd_str)
 
     def _query(self, cmd_str):
-        resp = ''
-        more_data = True
-
-        self._cmd(cmd_str)
-
-        while more_data:
-            try:
-                data = self.conn.recv(self.buffer_size).decode('utf-8')
-                if len(data) > 0:
-                    for d in data:
-                        resp += d
-                        if d == '\r':
-                            more_data = False
-                            break
-            except Exception as e:
-                raise TerraSASError('Timeout waiting for response')
-
-        return resp
+        try:
+            return self.conn.query(cmd_str)
+        except scpi.ScpiError as e:
+            raise TerraSASError(str(e))
 
     def cmd(self, cmd_str):
         try:
@@ -98,16 +76,12 @@ class TerraSAS(object):
                     raise TerraSASError(resp)
         except Exception as e:
             raise TerraSASError(str(e))
-        finally:
-            self.close()
 
     def query(self, cmd_str):
         try:
             resp = self._query(cmd_str).strip()
         except Exception as e:
             raise TerraSASError(str(e))
-        finally:
-            self.close()
 
         return resp
 
@@ -129,13 +103,7 @@ class TerraSAS(object):
             pass
 
     def close(self):
-        try:
-            if self.conn is not None:
-                self.conn.close()
-        except Exception as e:
-            pass
-        finally:
-            self.conn = None
+        self.conn.close()
 
     def curves_get(self):
         return self.query('CURVe:CATalog?\r').strip().split(',')
@@ -0,0 +1,428 @@
+"""
+Copyright (c) 2017, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Questions can be directed to support@sunspec.org
+"""
+
+
+import json
+import os
+
+import numpy as np
+
+'''
+Min/max envelope pyramid for plotting long captures.
+
+The pyramid holds the minimum and maximum of each channel over buckets of 2**base samples at level 1, and over
+buckets twice as large at each following level, up to a level with at most ENVELOPE_MIN_BUCKETS buckets. It is
+about a quarter of the size of the raw data with the default base and is built once per capture in a few vectorized
+passes, then saved next to the capture.
+
+query() returns the coarsest data that still resolves the requested time span at the requested width (pixels or
+chart points): the raw samples when the span holds few enough of them, otherwise the finest level with no more
+buckets in the span than the width. Drawing each bucket as a vertical min/max stroke keeps every excursion visible,
+unlike plain decimation.
+
+    env = envelope.capture_envelope('capture.csv')       # loads capture_envelope.npz or builds and saves it
+    t, lines = env.lines(t0=10., t1=20., width=1200)     # x and y arrays ready to plot
+
+Workbook charts of long captures plot chart_envelope() rows, written to a hidden worksheet by
+add_envelope_worksheet(), instead of every row of the capture.
+'''
+
+ENVELOPE_VERSION = 1
+ENVELOPE_SUFFIX = '_envelope.npz'
+ENVELOPE_BASE = 4              # level 1 bucket size is 2**ENVELOPE_BASE samples
+ENVELOPE_MIN_BUCKETS = 256     # the coarsest level has at most this many buckets
+ENVELOPE_WIDTH = 2000          # default query width
+ENVELOPE_CHART_WIDTH = 4000    # workbook chart buckets, each bucket is two chart points
+SHEET_NAME_LEN = 31            # maximum worksheet name length in Excel
+
+
+class EnvelopeError(Exception):
+    """
+    Exception to wrap all envelope generated exceptions.
+    """
+    pass
+
+
+def envelope_filename(capture):
+    """
+    Return the envelope pyramid file name for a capture file name.
+    """
+    return os.path.splitext(capture)[0] + ENVELOPE_SUFFIX
+
+
+def _source_key(filename):
+    st = os.stat(filename)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _reduce(t_first, t_last, v_min, v_max, factor):
+    """
+    Combine groups of factor buckets (or samples), the last group may be partial. NaN values are ignored.
+    """
+    n = v_min.shape[1]
+    full = n - n % factor
+    channels = v_min.shape[0]
+    r_min = np.fmin.reduce(v_min[:, :full].reshape(channels, -1, factor), axis=2)
+    r_max = np.fmax.reduce(v_max[:, :full].reshape(channels, -1, factor), axis=2)
+    r_first = t_first[:full:factor]
+    r_last = t_last[factor - 1:full:factor]
+    if full < n:
+        r_min = np.concatenate((r_min, np.fmin.reduce(v_min[:, full:], axis=1)[:, np.newaxis]), axis=1)
+        r_max = np.concatenate((r_max, np.fmax.reduce(v_max[:, full:], axis=1)[:, np.newaxis]), axis=1)
+        r_first = np.append(r_first, t_first[full])
+        r_last = np.append(r_last, t_last[-1])
+    return r_first, r_last, r_min, r_max
+
+
+class EnvelopeLevel(object):
+    """
+    One level of the pyramid: first and last sample time, minimum and maximum of each bucket.
+    """
+
+    def __init__(self, bucket, t_first, t_last, v_min, v_max):
+        self.bucket = bucket          # samples per bucket
+        self.t_first = t_first
+        self.t_last = t_last
+        self.min = v_min              # shape (channels, buckets)
+        self.max = v_max
+
+    def __len__(self):
+        return len(self.t_first)
+
+    def span(self, t0, t1):
+        """
+        Return the bucket index range overlapping [t0, t1].
+        """
+        i0 = np.searchsorted(self.t_last, t0, side='left')
+        i1 = np.searchsorted(self.t_first, t1, side='right')
+        return i0, max(i0, i1)
+
+
+class EnvelopePyramid(object):
+    """
+    Multi-resolution min/max envelope of a set of channels sharing a time base.
+    """
+
+    def __init__(self, names, levels, samples, time=None, data=None, loader=None):
+        """
+        :param names: channel names
+        :param levels: list of EnvelopeLevel, finest first
+        :param samples: number of raw samples
+        :param time: raw time values, if loaded
+        :param data: raw channel values (channels, samples), if loaded
+        :param loader: function returning (time, data) used to load the raw samples when a query needs them
+        """
+        self.names = list(names)
+        self.levels = levels
+        self.samples = samples
+        self.time = time
+        self.data = data
+        self.loader = loader
+
+    @classmethod
+    def build(cls, time, data, names=None, base=ENVELOPE_BASE, min_buckets=ENVELOPE_MIN_BUCKETS):
+        """
+        Build the pyramid.
+
+        :param time: time values, None to use the sample index
+        :param data: channel values, sequence of channels or 2-D array (channels, samples)
+        :param names: channel names, defaults to the channel index
+        :param base: level 1 bucket size is 2**base samples
+        :param min_buckets: levels are added until a level has at most min_buckets buckets
+        """
+        data = np.atleast_2d(np.asarray(data, dtype=np.float64))
+        samples = data.shape[1]
+        if time is None:
+            time = np.arange(samples, dtype=np.float64)
+        time = np.asarray(time, dtype=np.float64)
+        if len(time) != samples:
+            raise EnvelopeError('Time length %d does not match data length %d' % (len(time), samples))
+        if names is None:
+            names = [str(i) for i in range(data.shape[0])]
+        levels = []
+        if samples > 0:
+            bucket = 2**base
+            level = _reduce(time, time, data, data, bucket)
+            levels.append(EnvelopeLevel(bucket, *level))
+            while len(levels[-1]) > min_buckets:
+                bucket *= 2
+                level = _reduce(*(level + (2,)))
+                levels.append(EnvelopeLevel(bucket, *level))
+        return cls(names, levels, samples, time=time, data=data)
+
+    def _raw(self):
+        if self.data is None and self.loader is not None:
+            self.time, self.data = self.loader()
+            self.data = np.atleast_2d(np.asarray(self.data, dtype=np.float64))
+            self.time = np.asarray(self.time, dtype=np.float64)
+        return self.time, self.data
+
+    def _channels(self, channels):
+        if channels is None:
+            return list(range(len(self.names)))
+        try:
+            return [self.names.index(c) for c in channels]
+        except ValueError as e:
+            raise EnvelopeError('Channel not found: %s' % str(e))
+
+    def time_range(self):
+        if not self.levels:
+            return None, None
+        return float(self.levels[0].t_first[0]), float(self.levels[0].t_last[-1])
+
+    def query(self, t0=None, t1=None, width=ENVELOPE_WIDTH, channels=None):
+        """
+        Return the data for plotting the channels over [t0, t1] at width points.
+
+        :return: dict with 'level' (0 for raw samples), 'time' and 'min'/'max' (channels, points) arrays, for raw
+                 samples min and max are the sample values
+        """
+        idx = self._channels(channels)
+        start, stop = self.time_range()
+        if start is None:
+            empty = np.zeros((len(idx), 0))
+            return {'level': 0, 'time': np.zeros(0), 'min': empty, 'max': empty}
+        t0 = start if t0 is None else t0
+        t1 = stop if t1 is None else t1
+
+        # raw samples in the span, estimated from the finest level
+        i0, i1 = self.levels[0].span(t0, t1)
+        if (i1 - i0)*self.levels[0].bucket <= 2*width:
+            time, data = self._raw()
+            if data is not None:
+                s0 = np.searchsorted(time, t0, side='left')
+                s1 = np.searchsorted(time, t1, side='right')
+                s0 = max(s0 - 1, 0)
+                s1 = min(s1 + 1, len(time))
+                values = data[idx, s0:s1]
+                return {'level': 0, 'time': time[s0:s1], 'min': values, 'max': values}
+
+        for k, level in enumerate(self.levels):
+            i0, i1 = level.span(t0, t1)
+            if i1 - i0 <= width or k == len(self.levels) - 1:
+                break
+        return {'level': k + 1, 'time': (level.t_first[i0:i1] + level.t_last[i0:i1])/2.,
+                'min': level.min[idx, i0:i1], 'max': level.max[idx, i0:i1]}
+
+    def lines(self, t0=None, t1=None, width=ENVELOPE_WIDTH, channels=None):
+        """
+        Return (x, {name: y}) arrays for plotting, each bucket is drawn as a vertical min/max stroke.
+        """
+        q = self.query(t0, t1, width, channels)
+        names = [self.names[i] for i in self._channels(channels)]
+        if q['level'] == 0:
+            return q['time'], dict(zip(names, q['min']))
+        x = np.repeat(q['time'], 2)
+        y = np.empty((q['min'].shape[0], 2*q['min'].shape[1]))
+        y[:, 0::2] = q['min']
+        y[:, 1::2] = q['max']
+        return x, dict(zip(names, y))
+
+    def save(self, filename, source=None):
+        """
+        Save the levels as a compressed numpy archive, the raw samples are not saved.
+
+        :param source: capture file name, its modification time and size are stored to detect a stale pyramid
+        """
+        meta = {'version': ENVELOPE_VERSION, 'names': self.names, 'samples': self.samples,
+                'buckets': [level.bucket for level in self.levels]}
+        if source is not None:
+            meta['source'] = os.path.basename(source)
+            meta['source_key'] = _source_key(source)
+        arrays = {'meta': np.array(json.dumps(meta))}
+        for k, level in enumerate(self.levels):
+            arrays['t_first_%d' % k] = level.t_first
+            arrays['t_last_%d' % k] = level.t_last
+            arrays['min_%d' % k] = level.min
+            arrays['max_%d' % k] = level.max
+        with open(filename, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, filename, source=None, loader=None):
+        """
+        Load a pyramid saved with save().
+
+        :param source: capture file name, if given EnvelopeError is raised if the capture changed since the pyramid
+                       was saved
+        :param loader: function returning (time, data) for the raw samples
+        """
+        try:
+            with np.load(filename, allow_pickle=False) as f:
+                meta = json.loads(str(f['meta']))
+                if meta.get('version') != ENVELOPE_VERSION:
+                    raise EnvelopeError('Unsupported envelope version: %s' % meta.get('version'))
+                if source is not None and meta.get('source_key') != _source_key(source):
+                    raise EnvelopeError('Envelope %s is out of date for %s' % (filename, source))
+                levels = []
+                for k, bucket in enumerate(meta['buckets']):
+                    levels.append(EnvelopeLevel(bucket, f['t_first_%d' % k], f['t_last_%d' % k], f['min_%d' % k],
+                                                f['max_%d' % k]))
+        except (IOError, OSError, KeyError, ValueError) as e:
+            raise EnvelopeError('Error loading envelope %s: %s' % (filename, str(e)))
+        return cls(meta['names'], levels, meta['samples'], loader=loader)
+
+
+def chart_point_names(params):
+    """
+    Return the names of the points plotted by the workbook chart plot parameters.
+    """
+    names = []
+    for axis in ('x', 'y', 'y2'):
+        points = params.get('plot.%s.points' % axis)
+        if points is not None:
+            names.extend([x.strip() for x in points.split(',')])
+    for name in list(names):
+        for error in ('min_error', 'max_error'):
+            if params.get('plot.%s.%s' % (name, error)):
+                names.append(params.get('plot.%s.%s' % (name, error)))
+    return names
+
+
+def chart_envelope(columns, x, width=ENVELOPE_CHART_WIDTH):
+    """
+    Return the min/max envelope of the columns of a workbook chart.
+
+    :param columns: dict of column index: values, non-numeric values are treated as missing
+    :param x: column index of the chart x values
+    :param width: number of envelope buckets
+    :return: dict of column index: values with two rows (minimum, maximum) per bucket, missing values are None, or
+             None if the columns are short enough to chart directly or the x values are not increasing
+    """
+    def values(col):
+        return np.array([v if isinstance(v, float) else np.nan for v in col], dtype=np.float64)
+
+    x_values = values(columns[x])
+    if len(x_values) <= 2*width or not np.all(x_values[1:] >= x_values[:-1]):
+        return None
+    index = [i for i in columns if i != x]
+    env = EnvelopePyramid.build(x_values, [values(columns[i]) for i in index], names=[str(i) for i in index],
+                                min_buckets=width)
+    t, lines = env.lines(width=width)
+    result = {x: t.tolist()}
+    for i in index:
+        result[i] = [None if v != v else v for v in lines[str(i)].tolist()]
+    return result
+
+
+def envelope_sheet_name(wb, title):
+    """
+    Return a worksheet name for the envelope of the title worksheet that is not used in the workbook.
+    """
+    names = set([ws.get_name().lower() for ws in wb.worksheets()])
+    suffix = '_env'
+    n = 1
+    while True:
+        name = title[:SHEET_NAME_LEN - len(suffix)] + suffix
+        if name.lower() not in names:
+            return name
+        n += 1
+        suffix = '_env%d' % n
+
+
+def add_envelope_worksheet(wb, title, params, columns, first_row=0):
+    """
+    Add a hidden worksheet with the min/max envelope of the chart columns of a long capture to a workbook.
+
+    :param wb: xlsxwriter workbook
+    :param title: name of the capture worksheet
+    :param params: plot parameters of the capture
+    :param columns: dict of column index: values of the chart columns
+    :param first_row: row of the point names, the values start on the following row
+    :return: (worksheet, point value count) of the envelope worksheet, None if the capture is short enough to chart
+             directly
+    """
+    point_names = params.get('plot.point_names', [])
+    x_points = [x.strip() for x in (params.get('plot.x.points') or '').split(',')]
+    if x_points[0] not in point_names or point_names.index(x_points[0]) not in columns:
+        return None
+    x = point_names.index(x_points[0])
+    env = chart_envelope(columns, x)
+    if env is None:
+        return None
+    ws = wb.add_worksheet(envelope_sheet_name(wb, title))
+    ws.hide()
+    ws.write_row(first_row, 0, point_names)
+    for i, values in env.items():
+        ws.write_column(first_row + 1, i, values)
+    return ws, len(env[x]) + first_row + 1
+
+def _csv_loader(filename, time_point=None):
+    """
+    Return a function reading (time, data, names) of the numeric channels of a csv capture.
+    """
+    def load():
+        from . import dataset
+        names, columns = dataset.read_csv(filename)
+        t_name = time_point if time_point is not None else names[0]
+        if t_name not in names:
+            raise EnvelopeError('Time point not found: %s' % t_name)
+        time = np.asarray(columns[names.index(t_name)], dtype=np.float64)
+        data_names = []
+        data = []
+        for name, col in zip(names, columns):
+            if name != t_name and not isinstance(col, dataset.EventColumn):
+                data_names.append(name)
+                data.append(np.asarray(col, dtype=np.float64))
+        return time, np.array(data).reshape(len(data), len(time)), data_names
+    return load
+
+
+def capture_envelope(filename, time_point=None, rebuild=False):
+    """
+    Return the envelope pyramid of the numeric channels of a csv capture, loaded from the envelope file next to the
+    capture if it is up to date, otherwise built from the capture and saved. The raw samples are read again only if
+    a query needs them.
+
+    :param time_point: time channel name, defaults to the first column
+    :param rebuild: if True, always build the pyramid from the capture
+    """
+    load = _csv_loader(filename, time_point=time_point)
+    env_file = envelope_filename(filename)
+
+    def loader():
+        time, data, names = load()
+        return time, data
+
+    if not rebuild and os.path.exists(env_file):
+        try:
+            return EnvelopePyramid.load(env_file, source=filename, loader=loader)
+        except EnvelopeError:
+            pass
+    time, data, names = load()
+    env = EnvelopePyramid.build(time, data, names=names)
+    env.loader = loader
+    try:
+        env.save(env_file, source=filename)
+    except (IOError, OSError):
+        pass
+    return env
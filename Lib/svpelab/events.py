@@ -0,0 +1,339 @@
+"""
+Copyright (c) 2017, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Questions can be directed to support@sunspec.org
+"""
+
+
+import json
+import os
+
+import numpy as np
+
+'''
+Event index for waveform and RMS captures.
+
+Each indexed quantity (a threshold level, a band, the RMS of a channel against a band or a trigger channel) is reduced
+in one vectorized pass to a track holding its state at the first sample and the times at which the state changes.
+Queries such as "first time the RMS voltage leaves the band after t0" are then binary searches over the change
+times instead of scans of the raw samples, and the index can be saved next to the capture and reloaded for repeated
+analyses (ride-through, trip time, ...).
+
+Track states:
+
+    level       True where value >= threshold (value > threshold if not inclusive)
+    band        True where low < value < high
+    trigger     level on a trigger channel
+
+    events = EventIndex(time=wfmtime)
+    events.add_rms_band('voltage', ac_voltage, low=220., high=260., window=400)
+    events.add_trigger('trigger', grid_trig)
+    t_start = events['voltage'].first(False)            # first time outside the band
+    t_trig = events['trigger'].first(True, after=0.5)    # first trigger after 0.5 s
+    events.save(events_filename('capture.csv'), source='capture.csv')
+'''
+
+EVENTS_VERSION = 1
+EVENTS_SUFFIX = '_events.npz'
+TRIGGER_THRESHOLD = 3.
+
+
+class EventError(Exception):
+    """
+    Exception to wrap all event index generated exceptions.
+    """
+    pass
+
+
+def events_filename(capture):
+    """
+    Return the event index file name for a capture file name.
+    """
+    return os.path.splitext(capture)[0] + EVENTS_SUFFIX
+
+
+def _source_key(filename):
+    st = os.stat(filename)
+    return [st.st_mtime_ns, st.st_size]
+
+
+class EventTrack(object):
+    """
+    State changes of one indexed quantity.
+    """
+
+    def __init__(self, name, kind, params, initial, time, sample, start_time, stop_time):
+        """
+        :param name: track name
+        :param kind: 'level', 'band' or 'trigger'
+        :param params: dict of the detection parameters
+        :param initial: state at the first sample
+        :param time: times at which the state changes (time of the first sample in the new state)
+        :param sample: sample index of each state change in the source series
+        :param start_time: time of the first sample
+        :param stop_time: time of the last sample
+        """
+        self.name = name
+        self.kind = kind
+        self.params = params
+        self.initial = bool(initial)
+        self.time = np.asarray(time, dtype=np.float64)
+        self.sample = np.asarray(sample, dtype=np.int64)
+        self.start_time = start_time
+        self.stop_time = stop_time
+
+    def __len__(self):
+        return len(self.time)
+
+    def __repr__(self):
+        return 'EventTrack(%r, %s, %s, %d changes)' % (self.name, self.kind, self.params, len(self.time))
+
+    def state(self, t):
+        """
+        Return the state at time t.
+        """
+        count = np.searchsorted(self.time, t, side='right')
+        return self.initial != bool(count % 2)
+
+    def _first(self, state, after):
+        """
+        Return the position of the first change to state at or after after, -1 if the state already holds at
+        after, or None.
+        """
+        state = bool(state)
+        if after is None or after <= self.start_time:
+            if self.initial == state:
+                return -1
+            start = 0
+        else:
+            if self.state(after) == state:
+                return -1
+            start = np.searchsorted(self.time, after, side='left')
+        # changes alternate states, change j leaves the state initial ^ (j is even)
+        if start < len(self.time) and (self.initial != (start % 2 == 0)) != state:
+            start += 1
+        if start < len(self.time):
+            return start
+        return None
+
+    def first(self, state=True, after=None):
+        """
+        Return the first time at or after after (the start of the series if None) with the given state, or None.
+        """
+        pos = self._first(state, after)
+        if pos is None:
+            return None
+        if pos < 0:
+            return self.start_time if after is None else max(after, self.start_time)
+        return float(self.time[pos])
+
+    def first_sample(self, state=True, after=None):
+        """
+        Return the sample index of the first change to state at or after after, or None if there is no change. Returns
+        None also if the state already holds at after.
+        """
+        pos = self._first(state, after)
+        if pos is None or pos < 0:
+            return None
+        return int(self.sample[pos])
+
+    def edges(self, state=None, start=None, stop=None):
+        """
+        Return (time, sample) arrays of the state changes between start and stop, only the changes to state if given.
+        """
+        lo = 0 if start is None else np.searchsorted(self.time, start, side='left')
+        hi = len(self.time) if stop is None else np.searchsorted(self.time, stop, side='right')
+        pos = np.arange(lo, hi)
+        if state is not None:
+            pos = pos[(self.initial != (pos % 2 == 0)) == bool(state)]
+        return self.time[pos], self.sample[pos]
+
+    def intervals(self, state=True):
+        """
+        Return a list of (start, stop) times of the intervals with the given state, stop is None for an interval that
+        lasts to the end of the series.
+        """
+        bounds = [self.start_time] + self.time.tolist() + [None]
+        first = 0 if self.initial == bool(state) else 1
+        return [(bounds[i], bounds[i + 1]) for i in range(first, len(bounds) - 1, 2)]
+
+
+class EventIndex(object):
+    """
+    Collection of event tracks over a capture.
+    """
+
+    def __init__(self, time=None, sample_rate=None, start_time=0.):
+        """
+        :param time: time vector of the capture
+        :param sample_rate: samples/second, used with start_time if time is not given
+        :param start_time: time of the first sample if time is not given
+        """
+        self.time = None if time is None else np.asarray(time, dtype=np.float64)
+        self.sample_rate = sample_rate
+        self.start_time = start_time
+        self.tracks = {}
+
+    def __getitem__(self, name):
+        return self.tracks[name]
+
+    def __contains__(self, name):
+        return name in self.tracks
+
+    def __iter__(self):
+        return iter(self.tracks)
+
+    def _time(self, n, time=None):
+        if time is not None:
+            time = np.asarray(time, dtype=np.float64)
+        elif self.time is not None:
+            time = self.time
+        elif self.sample_rate:
+            return None
+        else:
+            raise EventError('No time vector or sample rate for the event index')
+        if len(time) != n:
+            raise EventError('Time vector length %d does not match data length %d' % (len(time), n))
+        return time
+
+    def _add(self, name, kind, params, state, time=None, sample=None):
+        """
+        Index the boolean state series, sample maps the series positions to source sample indexes.
+        """
+        state = np.asarray(state, dtype=bool)
+        n = len(state)
+        if n == 0:
+            raise EventError('No data for event track %s' % name)
+        changes = np.flatnonzero(state[1:] != state[:-1]) + 1
+        time = self._time(n, time)
+        if time is not None:
+            change_time = time[changes]
+            start_time = float(time[0])
+            stop_time = float(time[-1])
+        else:
+            change_time = self.start_time + changes/float(self.sample_rate)
+            start_time = self.start_time
+            stop_time = self.start_time + (n - 1)/float(self.sample_rate)
+        if sample is not None:
+            changes = np.asarray(sample)[changes]
+        track = EventTrack(name, kind, params, state[0], change_time, changes, start_time, stop_time)
+        self.tracks[name] = track
+        return track
+
+    def add_level(self, name, data, threshold, inclusive=True, time=None):
+        """
+        Index the crossings of data through threshold, the state is True above the threshold.
+
+        :param time: time vector of data if it is not on the capture time base (e.g. an RMS series)
+        """
+        data = np.asarray(data, dtype=np.float64)
+        state = data >= threshold if inclusive else data > threshold
+        return self._add(name, 'level', {'threshold': threshold, 'inclusive': inclusive}, state, time=time)
+
+    def add_band(self, name, data, low, high, time=None):
+        """
+        Index the entries and exits of data in the band low < value < high, the state is True inside the band.
+
+        :param time: time vector of data if it is not on the capture time base (e.g. an RMS series)
+        """
+        data = np.asarray(data, dtype=np.float64)
+        state = (data > low) & (data < high)
+        return self._add(name, 'band', {'low': low, 'high': high}, state, time=time)
+
+    def add_rms_band(self, name, data, low, high, window, hop=None):
+        """
+        Index the excursions of the sliding window RMS of data from the band low < rms < high. Each RMS value is
+        placed at the last sample of its window.
+
+        :param window: window length in samples
+        :param hop: samples between windows, defaults to window
+        """
+        from . import waveform_analysis
+        left, rms = waveform_analysis.sliding_rms(data, window, hop)
+        sample = left + int(window) - 1
+        time = self._time(len(data))
+        if time is not None:
+            time = time[sample]
+        else:
+            time = self.start_time + sample/float(self.sample_rate)
+        state = (rms > low) & (rms < high)
+        return self._add(name, 'band', {'low': low, 'high': high, 'window': int(window), 'hop': hop}, state,
+                         time=time, sample=sample)
+
+    def add_trigger(self, name, data, threshold=TRIGGER_THRESHOLD):
+        """
+        Index the edges of a trigger channel, the state is True when the trigger is active (>= threshold).
+        """
+        data = np.asarray(data, dtype=np.float64)
+        return self._add(name, 'trigger', {'threshold': threshold}, data >= threshold)
+
+    def save(self, filename, source=None):
+        """
+        Save the index as a compressed numpy archive.
+
+        :param source: capture file name, its modification time and size are stored to detect a stale index
+        """
+        meta = {'version': EVENTS_VERSION, 'tracks': []}
+        if source is not None:
+            meta['source'] = os.path.basename(source)
+            meta['source_key'] = _source_key(source)
+        arrays = {}
+        for i, track in enumerate(self.tracks.values()):
+            meta['tracks'].append({'name': track.name, 'kind': track.kind, 'params': track.params,
+                                   'initial': track.initial, 'start_time': track.start_time,
+                                   'stop_time': track.stop_time})
+            arrays['time_%d' % i] = track.time
+            arrays['sample_%d' % i] = track.sample
+        arrays['meta'] = np.array(json.dumps(meta))
+        with open(filename, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, filename, source=None):
+        """
+        Load an index saved with save().
+
+        :param source: capture file name, if given EventError is raised if the capture changed since the index was
+                       saved
+        """
+        try:
+            with np.load(filename, allow_pickle=False) as f:
+                meta = json.loads(str(f['meta']))
+                if meta.get('version') != EVENTS_VERSION:
+                    raise EventError('Unsupported event index version: %s' % meta.get('version'))
+                if source is not None and meta.get('source_key') != _source_key(source):
+                    raise EventError('Event index %s is out of date for %s' % (filename, source))
+                index = cls()
+                for i, t in enumerate(meta['tracks']):
+                    index.tracks[t['name']] = EventTrack(t['name'], t['kind'], t['params'], t['initial'],
+                                                         f['time_%d' % i], f['sample_%d' % i], t['start_time'],
+                                                         t['stop_time'])
+        except (IOError, OSError, KeyError, ValueError) as e:
+            raise EventError('Error loading event index %s: %s' % (filename, str(e)))
+        return index
@@ -7,10 +7,9 @@ V1.0 - Jay Johnson - 7/31/2018
 
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
-genset_modules = {}
+genset_modules = plugins.ModuleRegistry(__name__, 'genset')
 
 def params(info, id=None, label='Genset', group_name=None, active=None, active_value=None):
     if group_name is None:
@@ -22,8 +21,7 @@ def params(info, id=None, label='Genset', group_name=None, active=None, active_v
     name = lambda name: group_name + '.' + name
     info.param_group(group_name, label='%s Parameters' % label,  active=active, active_value=active_value, glob=True)
     info.param(name('mode'), label='%s Mode' % label, default='Disabled', values=['Disabled'])
-    for mode, m in genset_modules.items():
-        m.params(info, group_name=group_name)
+    genset_modules.params(info, group_name=group_name)
 
 GENSET_DEFAULT_ID = 'genset'
 
@@ -130,29 +128,8 @@ class Genset(object):
 
 def genset_scan():
     global genset_modules
-    # scan all files in current directory that match genset_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'genset_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'genset_info'):
-                info = m.genset_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    genset_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise GensetError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match genset_*.py, modules are imported when first used
+    genset_modules.scan(GensetError)
 
 # scan for genset modules on import
 genset_scan()
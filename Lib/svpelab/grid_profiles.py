@@ -30,6 +30,10 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 Questions can be directed to support@sunspec.org
 """
 
+import functools
+
+import numpy as np
+
 # (time offset in seconds, % nominal voltage 1, % nominal voltage 2, % nominal voltage 3, % nominal frequency)
 vv_voltage_profile = [
     (0, 100, 100, 100, 100),
@@ -92,6 +96,169 @@ profiles = {
     'VRT Test Profile': vrt_50v_2s
 }
 
-if __name__ == "__main__":
+'''
+Profile compiler
+
+A profile is a list of (time offset, % nominal voltage 1, % nominal voltage 2, % nominal voltage 3, % nominal frequency)
+points, or (time offset, % nominal voltage, % nominal frequency) points with the voltage applied to all phases (the
+rt_profile and transient step form). Consecutive points with the same time offset are a step, otherwise the values
+ramp linearly between the points.
+
+compile_profile() validates a profile and converts it once to numpy point and segment tables in volts and Hz.
+Compiled profiles are cached per (profile, v_nom, f_nom) and are read-only, so grid simulator drivers and the
+simulated grid simulator can share them.
 
+    cp = grid_profiles.compile_profile('VV Profile', v_nom=240., f_nom=60.)
+    cp.dwell, cp.v, cp.f, cp.v_slew, cp.f_slew      # segment table, one row per segment of nonzero duration
+    v, f = cp.values([0., 12.5, 135.])              # interpolated per-phase voltages and frequency
+    t, v, f = cp.resample(0.1)                      # values every 100 ms
+'''
+
+PROFILE_CACHE_SIZE = 64
+
+
+class ProfileError(Exception):
+    """
+    Exception to wrap all profile generated exceptions.
+    """
     pass
+
+
+def _profile_points(profile):
+    """
+    Return the profile points as a tuple of 5 float tuples.
+    """
+    if isinstance(profile, str):
+        name = profile
+        profile = profiles.get(name)
+        if profile is None:
+            raise ProfileError('Profile Not Found: %s' % name)
+    points = []
+    try:
+        for p in profile:
+            if len(p) == 3:
+                points.append((float(p[0]), float(p[1]), float(p[1]), float(p[1]), float(p[2])))
+            elif len(p) == 5:
+                points.append(tuple(float(x) for x in p))
+            else:
+                raise ProfileError('Invalid profile point: %s' % (p,))
+    except (TypeError, ValueError) as e:
+        raise ProfileError('Invalid profile: %s' % str(e))
+    return tuple(points)
+
+
+class CompiledProfile(object):
+    """
+    Validated profile point and segment tables.
+
+    Points: time (s), v (points, 3) per-phase voltage (V), f (Hz).
+
+    Segments, one per pair of consecutive points with a nonzero time difference: start (s), dwell (s), v (segments, 3)
+    and f at the end of the segment, v_slew (segments, 3) and f_slew ramp rates (V/s, Hz/s) over the segment. A
+    segment following a step starts at the stepped values. A zero slew means the value does not change over the
+    segment (instruments program it as an immediate change, e.g. 'MAX').
+    """
+
+    def __init__(self, points, v_nom, f_nom):
+        table = np.array(points, dtype=float).reshape(-1, 5)
+        if len(table) == 0:
+            raise ProfileError('Empty profile')
+        if not np.all(np.isfinite(table)):
+            raise ProfileError('Profile values must be finite')
+        if table[0, 0] < 0 or np.any(np.diff(table[:, 0]) < 0):
+            raise ProfileError('Profile time offsets must be nonnegative and nondecreasing')
+        if np.any(table[:, 1:] < 0):
+            raise ProfileError('Profile voltages and frequencies must be nonnegative')
+
+        self.v_nom = v_nom
+        self.f_nom = f_nom
+        self.time = table[:, 0]
+        self.v = table[:, 1:4] * (v_nom / 100.)
+        self.f = table[:, 4] * (f_nom / 100.)
+
+        dt = np.diff(self.time)
+        seg = np.nonzero(dt > 0)[0]
+        self.start = self.time[seg]
+        self.dwell = dt[seg]
+        self.seg_v = self.v[seg + 1]
+        self.seg_f = self.f[seg + 1]
+        self.v_slew = np.abs(self.v[seg + 1] - self.v[seg]) / self.dwell[:, np.newaxis]
+        self.f_slew = np.abs(self.f[seg + 1] - self.f[seg]) / self.dwell
+
+        for a in (self.time, self.v, self.f, self.start, self.dwell, self.seg_v, self.seg_f, self.v_slew,
+                  self.f_slew):
+            a.setflags(write=False)
+
+    @property
+    def duration(self):
+        return float(self.time[-1])
+
+    def __len__(self):
+        return len(self.dwell)
+
+    def values(self, t):
+        """
+        Return the per-phase voltages and frequency at the time offsets t. Values are held before the first and after
+        the last point, at a step the value after the step is returned.
+
+        :param t: time offset or sequence of time offsets (s)
+        :return: (v, f) with v (len(t), 3) and f (len(t)) arrays, (3) array and float for a scalar t
+        """
+        scalar = np.ndim(t) == 0
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        t = np.clip(t, self.time[0], self.time[-1])
+        i = np.searchsorted(self.time, t, side='right') - 1
+        j = np.minimum(i + 1, len(self.time) - 1)
+        span = self.time[j] - self.time[i]
+        w = np.divide(t - self.time[i], span, out=np.zeros_like(t), where=span > 0)
+        v = self.v[i] + (self.v[j] - self.v[i]) * w[:, np.newaxis]
+        f = self.f[i] + (self.f[j] - self.f[i]) * w
+        if scalar:
+            return v[0], float(f[0])
+        return v, f
+
+    def resample(self, dt, start=0.):
+        """
+        Return the profile sampled every dt seconds from start to the end of the profile.
+
+        :return: (t, v, f) arrays
+        """
+        if dt <= 0:
+            raise ProfileError('Invalid resample interval: %s' % dt)
+        t = np.arange(start, self.duration + dt / 2., dt)
+        v, f = self.values(t)
+        return t, v, f
+
+    def segments(self):
+        """
+        Return the segment table as a list of (start, dwell, v1, v2, v3, v_slew, f, f_slew) tuples, with v_slew the
+        largest per-phase voltage slew for instruments with a single voltage slew setting.
+        """
+        v_slew = self.v_slew.max(axis=1) if len(self) else np.zeros(0)
+        return list(zip(self.start.tolist(), self.dwell.tolist(), self.seg_v[:, 0].tolist(),
+                        self.seg_v[:, 1].tolist(), self.seg_v[:, 2].tolist(), v_slew.tolist(), self.seg_f.tolist(),
+                        self.f_slew.tolist()))
+
+
+@functools.lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def _compile(points, v_nom, f_nom):
+    return CompiledProfile(points, v_nom, f_nom)
+
+
+def compile_profile(profile, v_nom=100., f_nom=100.):
+    """
+    Compile a profile. With the default v_nom and f_nom the values stay in % nominal.
+
+    :param profile: profile name in profiles or list of profile points
+    :param v_nom: nominal voltage (V)
+    :param f_nom: nominal frequency (Hz)
+    :return: CompiledProfile, shared with other callers compiling the same profile
+    """
+    return _compile(_profile_points(profile), float(v_nom), float(f_nom))
+
+
+if __name__ == "__main__":
+
+    cp = compile_profile('VV Profile', v_nom=240., f_nom=60.)
+    for seg in cp.segments():
+        print(seg)
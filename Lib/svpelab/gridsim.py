@@ -32,8 +32,8 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import os
-import glob
-import importlib
+import contextlib
+from . import plugins
 
 # Import all gridsim extensions in current directory.
 # A gridsim extension has a file name of gridsim_*.py and contains a function gridsim_params(info) that contains
@@ -41,7 +41,7 @@ import importlib
 
 # dict of modules found, entries are: name : module_name
 
-gridsim_modules = {}
+gridsim_modules = plugins.ModuleRegistry(__name__, 'gridsim')
 
 
 def params(info, id=None, label='Grid Simulator', group_name=None, active=None, active_value=None):
@@ -56,8 +56,7 @@ def params(info, id=None, label='Grid Simulator', group_name=None, active=None,
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
     info.param(name('auto_config'), label='Configure grid simulator at beginning of test', default='Disabled',
                values=['Enabled', 'Disabled'])
-    for mode, m in gridsim_modules.items():
-        m.params(info, group_name=group_name)
+    gridsim_modules.params(info, group_name=group_name)
 
 GRIDSIM_DEFAULT_ID = 'gridsim'
 
@@ -163,6 +162,18 @@ class GridSim(object):
         """
         pass
 
+    def transaction(self):
+        """
+        Context manager deferring the command error checks to the end of the block for grid simulators that support
+        it, errors are raised when the block exits. The template implementation leaves each command checked as it is
+        sent.
+
+            with gsim.transaction():
+                gsim.freq(60.)
+                gsim.voltage((120., 120., 120.))
+        """
+        return contextlib.nullcontext()
+
     def current_max(self, current=None):
         """
         Set the value for max current if provided. If none provided, obtains the value for max current.
@@ -347,29 +358,8 @@ class GridSim(object):
 
 def gridsim_scan():
     global gridsim_modules
-    # scan all files in current directory that match gridsim_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'gridsim_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'gridsim_info'):
-                info = m.gridsim_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    gridsim_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise GridSimError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match gridsim_*.py, modules are imported when first used
+    gridsim_modules.scan(GridSimError)
 
 # scan for gridsim modules on import
 gridsim_scan()
@@ -31,11 +31,11 @@ Questions can be directed to support@sunspec.org
 """
 
 import os
+import contextlib
 import time
-import socket
-import serial
 from . import grid_profiles
 from . import gridsim
+from . import scpi
 
 ametek_info = {
     'name': os.path.splitext(os.path.basename(__file__))[0],
@@ -68,6 +68,17 @@ def params(info, group_name):
 
 GROUP_NAME = 'ametek'
 
+# measurement points: (MEASure/FETCh query header, scale)
+MEAS_QUERIES = {
+    'AC_VRMS': ('volt:ac', 1.),
+    'AC_IRMS': ('curr:ac', 1.),
+    'AC_P': ('pow:ac', 1000.),
+    'AC_S': ('pow:ac:app', 1000.),
+    'AC_PF': ('pow:pfac', 1.),
+    'AC_FREQ': ('freq', 1.)
+}
+MEAS_POINTS = ('AC_VRMS', 'AC_IRMS', 'AC_P', 'AC_S', 'AC_PF', 'AC_FREQ')
+
 
 class GridSim(gridsim.GridSim):
     """
@@ -89,7 +100,6 @@ class GridSim(gridsim.GridSim):
       ip_port
     """
     def __init__(self, ts, group_name):
-        self.buffer_size = 1024
         self.conn = None
 
         gridsim.GridSim.__init__(self, ts, group_name)
@@ -109,15 +119,19 @@ class GridSim(gridsim.GridSim):
         self.cmd_str = ''
         self._cmd = None
         self._query = None
+        self._transaction = None
         self.profile_name = ts.param_value('profile.profile_name')
 
         if self.comm == 'Serial':
+            self.conn = scpi.SerialTransport(self.serial_port, baudrate=self.baudrate, timeout=self.timeout,
+                                             write_timeout=self.write_timeout)
             self.open()  # open communications
-            self._cmd = self.cmd_serial
-            self._query = self.query_serial
         elif self.comm == 'TCP/IP':
-            self._cmd = self.cmd_tcp
-            self._query = self.query_tcp
+            self.ts.log('ipaddr = %s  ipport = %s' % (self.ipaddr, self.ipport))
+            self.conn = scpi.TcpTransport(self.ipaddr, self.ipport, timeout=self.timeout)
+        if self.conn is not None:
+            self._cmd = self.conn.write
+            self._query = self.conn.query
 
         self.cmd('*CLS\n')
         # self.cmd('*RST\n')  # Reset the entire system
@@ -138,80 +152,12 @@ class GridSim(gridsim.GridSim):
     def _param_value(self, name):
         return self.ts.param_value(self.group_name + '.' + GROUP_NAME + '.' + name)
 
-    def cmd_serial(self, cmd_str):
-        self.cmd_str = cmd_str
-        try:
-            if self.conn is None:
-                raise gridsim.GridSimError('Communications port not open')
-
-            self.conn.flushInput()
-            self.conn.write(cmd_str)
-        except Exception as e:
-             raise gridsim.GridSimError(str(e))
-
-    def query_serial(self, cmd_str):
-        resp = ''
-        more_data = True
-
-        self.cmd_serial(cmd_str)
-
-        while more_data:
-            try:
-                count = self.conn.inWaiting()
-                if count < 1:
-                    count = 1
-                data = self.conn.read(count)
-                if len(data) > 0:
-                    for d in data:
-                        resp += d
-                        if d == '\n':
-                            more_data = False
-                            break
-                else:
-                    raise gridsim.GridSimError('Timeout waiting for response')
-            except gridsim.GridSimError:
-                raise
-            except Exception as e:
-                raise gridsim.GridSimError('Timeout waiting for response - More data problem')
-
-        return resp
-
-    def cmd_tcp(self, cmd_str):
-        try:
-            if self.conn is None:
-                self.ts.log('ipaddr = %s  ipport = %s' % (self.ipaddr, self.ipport))
-                self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.conn.settimeout(self.timeout)
-                self.conn.connect((self.ipaddr, self.ipport))
-
-            # print 'cmd> %s' % (cmd_str)
-            self.conn.send(cmd_str)
-        except Exception as e:
-            raise gridsim.GridSimError(str(e))
-
-    def query_tcp(self, cmd_str):
-        resp = ''
-        more_data = True
-
-        self._cmd(cmd_str)
-
-        while more_data:
-            try:
-                data = self.conn.recv(self.buffer_size)
-                if len(data) > 0:
-                    for d in data:
-                        resp += d
-                        if d == '\n': #\r
-                            more_data = False
-                            break
-            except Exception as e:
-                raise gridsim.GridSimError('Timeout waiting for response')
-
-        return resp
-
     def cmd(self, cmd_str):
         self.cmd_str = cmd_str
         try:
+            if self._transaction is not None:
+                self._transaction.write(cmd_str)
+                return
             self._cmd(cmd_str)
             resp = self._query('SYSTem:ERRor?\n') #\r
 
@@ -223,48 +169,73 @@ class GridSim(gridsim.GridSim):
 
     def query(self, cmd_str):
         try:
+            if self._transaction is not None:
+                return self._transaction.query(cmd_str).strip()
             resp = self._query(cmd_str).strip()
         except Exception as e:
             raise gridsim.GridSimError(str(e))
 
         return resp
 
+    @contextlib.contextmanager
+    def transaction(self, mode=scpi.CHECK_PIPELINE):
+        """
+        Defer the SYSTem:ERRor? checks of the commands sent in the block to the end of the block. In CHECK_PIPELINE
+        mode errors are attributed to the failing commands, in CHECK_ESR mode the block is checked with *ESR?. Nested
+        blocks join the outer transaction.
+
+        :param mode: scpi.CHECK_PIPELINE or scpi.CHECK_ESR
+        """
+        if self._transaction is not None or not isinstance(self.conn, scpi.Transport):
+            yield self._transaction
+            return
+        try:
+            with self.conn.transaction(mode=mode, error_query='SYSTem:ERRor?\n') as t:
+                self._transaction = t
+                try:
+                    yield t
+                finally:
+                    self._transaction = None
+        except scpi.ScpiError as e:
+            raise gridsim.GridSimError(str(e))
+
     def info(self):
         return self.query('*IDN?\n')
 
     def config_phase_angles(self, config=False):
         if config:
-            if self.phases_param == 1:
-                self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
-                self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:phas 180.0\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:phas 180.0\n')
-                self.cmd('inst:coup none;:inst:nsel 1;:func sin\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:func sin\n')
-            elif self.phases_param == 3:
-                # set the phase angles for the 3 phases
-                self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
-                self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:phas 120.0\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:phas 120.0\n')
-                self.cmd('inst:coup none;:inst:nsel 3;:phas 240.0\n')
-                self.cmd('inst:coup none;:inst:nsel 3;:phas 240.0\n')
-                self.cmd('inst:coup none;:inst:nsel 1;:func sin\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:func sin\n')
-                self.cmd('inst:coup none;:inst:nsel 3;:func sin\n')
-            elif self.phases_param == 2:
-                # set the phase angles for the 2 phases
-                self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
-                self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:phas 180.0\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:phas 180.0\n')
-                self.cmd('inst:coup none;:inst:nsel 3;:phas 0.0\n')
-                self.cmd('inst:coup none;:inst:nsel 3;:phas 0.0\n')
-                self.cmd('inst:coup none;:inst:nsel 1;:func sin\n')
-                self.cmd('inst:coup none;:inst:nsel 2;:func sin\n')
-                self.cmd('inst:coup none;:inst:nsel 3;:func sin\n')
-            else:
-                raise gridsim.GridSimError('Unsupported phase parameter: %s' % (self.phases_param))
+            with self.transaction():
+                if self.phases_param == 1:
+                    self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:phas 180.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:phas 180.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 1;:func sin\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:func sin\n')
+                elif self.phases_param == 3:
+                    # set the phase angles for the 3 phases
+                    self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:phas 120.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:phas 120.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 3;:phas 240.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 3;:phas 240.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 1;:func sin\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:func sin\n')
+                    self.cmd('inst:coup none;:inst:nsel 3;:func sin\n')
+                elif self.phases_param == 2:
+                    # set the phase angles for the 2 phases
+                    self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 1;:phas 0.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:phas 180.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:phas 180.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 3;:phas 0.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 3;:phas 0.0\n')
+                    self.cmd('inst:coup none;:inst:nsel 1;:func sin\n')
+                    self.cmd('inst:coup none;:inst:nsel 2;:func sin\n')
+                    self.cmd('inst:coup none;:inst:nsel 3;:func sin\n')
+                else:
+                    raise gridsim.GridSimError('Unsupported phase parameter: %s' % (self.phases_param))
 
         ph1 = float(self.query('inst:coup none;:inst:nsel 1;:phas?\n'))
         ph2 = float(self.query('inst:coup none;:inst:nsel 2;:phas?\n'))
@@ -309,7 +280,8 @@ class GridSim(gridsim.GridSim):
         """
         self.ts.log('Grid simulator model: %s' % self.info().strip())
 
-        # put simulator in regenerative mode
+        # put simulator in regenerative mode, each command is checked before the next so regen is only switched on
+        # with the relay open
         state = self.regen()
         if state != gridsim.REGEN_ON:
             if self.relay() == gridsim.RELAY_CLOSED:
@@ -317,44 +289,45 @@ class GridSim(gridsim.GridSim):
             state = self.regen(gridsim.REGEN_ON)
         self.ts.log('Grid sim regenerative mode is: %s' % state)
 
-        # set frequency
-        self.freq(self.freq_param)
+        # the settings are checked for errors once at the end
+        with self.transaction():
+            # set frequency
+            self.freq(self.freq_param)
 
-        # set the phase angles for the active phases
-        ph1, ph2, ph3 = self.config_phase_angles(config=True)
-        self.ts.log('Grid sim phase angles are: phase1 = %s, phase2 = %s, phase3 = %s' % (ph1, ph2, ph3))
+            # set the phase angles for the active phases
+            ph1, ph2, ph3 = self.config_phase_angles(config=True)
+            self.ts.log('Grid sim phase angles are: phase1 = %s, phase2 = %s, phase3 = %s' % (ph1, ph2, ph3))
 
-        # set voltage range
-        v_max = self.v_max_param
-        v1, v2, v3 = self.voltage_max()
-        if v1 != v_max or v2 != v_max or v3 != v_max:
-            self.voltage_max(voltage=(v_max, v_max, v_max))
+            # set voltage range
+            v_max = self.v_max_param
             v1, v2, v3 = self.voltage_max()
-        self.ts.log('Grid sim max voltage settings: v1 = %s, v2 = %s, v3 = %s' % (v1, v2, v3))
+            if v1 != v_max or v2 != v_max or v3 != v_max:
+                self.voltage_max(voltage=(v_max, v_max, v_max))
+                v1, v2, v3 = self.voltage_max()
+            self.ts.log('Grid sim max voltage settings: v1 = %s, v2 = %s, v3 = %s' % (v1, v2, v3))
 
-        # set nominal voltage
-        v_nom = self.v_nom_param
-        v1, v2, v3 = self.voltage()
-        if v1 != v_nom or v2 != v_nom or v3 != v_nom:
-            self.voltage(voltage=(v_nom, v_nom, v_nom))
+            # set nominal voltage
+            v_nom = self.v_nom_param
             v1, v2, v3 = self.voltage()
-        self.ts.log('Grid sim nominal voltage settings: v1 = %s, v2 = %s, v3 = %s' % (v1, v2, v3))
+            if v1 != v_nom or v2 != v_nom or v3 != v_nom:
+                self.voltage(voltage=(v_nom, v_nom, v_nom))
+                v1, v2, v3 = self.voltage()
+            self.ts.log('Grid sim nominal voltage settings: v1 = %s, v2 = %s, v3 = %s' % (v1, v2, v3))
 
-        # set max current if it's not already at gridsim_Imax
-        i_max = self.i_max_param
-        current = self.current()
-        if current != i_max:
-            self.current(i_max)
+            # set max current if it's not already at gridsim_Imax
+            i_max = self.i_max_param
             current = self.current()
-        self.ts.log('Grid sim max current: %s Amps' % current)
+            if current != i_max:
+                self.current(i_max)
+                current = self.current()
+            self.ts.log('Grid sim max current: %s Amps' % current)
 
     def open(self):
         """
         Open the communications resources associated with the grid simulator.
         """
         try:
-            self.conn = serial.Serial(port=self.serial_port, baudrate=self.baudrate, bytesize=8, stopbits=1, xonxoff=0,
-                                      timeout=self.timeout, writeTimeout=self.write_timeout)
+            self.conn.open()
             time.sleep(2)
         except Exception as e:
             raise gridsim.GridSimError(str(e))
@@ -410,70 +383,32 @@ class GridSim(gridsim.GridSim):
                 return
 
             # for simple transient steps in voltage or frequency, use v_step, f_step, and t_step
-            if profile_name is 'Transient_Step':
+            if profile_name == 'Transient_Step':
                 if t_step is None:
                     raise gridsim.GridSimError('Transient profile did not have a duration.')
                 else:
                     # (time offset in seconds, % nominal voltage, % nominal frequency)
                     profile = [(0, v_step, f_step), (t_step, v_step, f_step), (t_step, 100, 100)]
-
             else:
-                # get the profile from grid_profiles
-                profile = grid_profiles.profiles.get(profile_name)
-                if profile is None:
-                    raise gridsim.GridSimError('Profile Not Found: %s' % profile_name)
-
-        dwell_list = ''
-        v1_list = ''
-        v2_list = ''
-        v3_list = ''
-        v_slew_list = ''
-        freq_list = ''
-        freq_slew_list = ''
-        func_list = ''
-        rep_list = ''
-        for i in range(1, len(profile)):
-            v1 = float(profile[i - 1][1])
-            v2 = float(profile[i - 1][2])
-            v3 = float(profile[i - 1][3])
-            freq = float(profile[i - 1][4])
-            t_delta = float(profile[i][0]) - float(profile[i - 1][0])
-            v_delta = max(abs(float(profile[i][1]) - v1), abs(float(profile[i][2]) - v2),
-                          abs(float(profile[i][3]) - v3))
-            freq_delta = abs(float(profile[i][4]) - freq)
-
-            v_slew = 'MAX'
-            freq_slew = 'MAX'
-            # if t_delta == 0:
-            #     t_delta = 0.001
-            if t_delta > 0:
-                if i > 1:
-                    dwell_list += ','
-                    v1_list += ','
-                    v2_list += ','
-                    v3_list += ','
-                    v_slew_list += ','
-                    freq_list += ','
-                    freq_slew_list += ','
-                    func_list += ','
-                    rep_list += ','
-                if v_delta > 0:
-                    v_slew = '%0.3f' % (((v_delta/t_delta)/100.) * float(v_nom))
-                    v1 = float(profile[i][1])  # look at next voltage
-                    v2 = float(profile[i][2])
-                    v3 = float(profile[i][3])
-                if freq_delta > 0:
-                    freq_slew = '%0.3f' % (((freq_delta/t_delta)/100.) * float(freq_nom))
-                    freq = float(profile[i][4])  # look at next frequency
-                dwell_list += '%0.3f' % t_delta
-                v1_list += '%0.3f' % ((v1/100.) * float(v_nom))
-                v2_list += '%0.3f' % ((v2/100.) * float(v_nom))
-                v3_list += '%0.3f' % ((v3/100.) * float(v_nom))
-                v_slew_list += v_slew
-                freq_list += '%0.3f' % ((freq/100.) * float(freq_nom))
-                freq_slew_list += freq_slew
-                func_list += 'SINE'
-                rep_list += '0'
+                profile = profile_name
+
+        try:
+            cp = grid_profiles.compile_profile(profile, v_nom=v_nom, f_nom=freq_nom)
+        except grid_profiles.ProfileError as e:
+            raise gridsim.GridSimError(str(e))
+
+        # a zero slew is a step (no ramp over the segment), programmed as MAX
+        slew = lambda s: '%0.3f' % s if s > 0 else 'MAX'
+        segments = cp.segments()
+        dwell_list = ','.join(['%0.3f' % seg[1] for seg in segments])
+        v1_list = ','.join(['%0.3f' % seg[2] for seg in segments])
+        v2_list = ','.join(['%0.3f' % seg[3] for seg in segments])
+        v3_list = ','.join(['%0.3f' % seg[4] for seg in segments])
+        v_slew_list = ','.join([slew(seg[5]) for seg in segments])
+        freq_list = ','.join(['%0.3f' % seg[6] for seg in segments])
+        freq_slew_list = ','.join([slew(seg[7]) for seg in segments])
+        func_list = ','.join(['SINE'] * len(segments))
+        rep_list = ','.join(['0'] * len(segments))
 
         cmd_list = []
         cmd_list.append('trig:tran:sour imm\n')
@@ -510,8 +445,14 @@ class GridSim(gridsim.GridSim):
         Start the loaded profile.
         """
         if self.profile is not None:
-            for entry in self.profile:
-                self.cmd(entry)
+            # the list upload is checked before the profile is triggered (last entry)
+            with self.transaction():
+                for entry in self.profile[:-1]:
+                    if entry.strip().endswith('?'):
+                        self.query(entry)
+                    else:
+                        self.cmd(entry)
+            self.cmd(self.profile[-1])
 
     def profile_stop(self):
         """
@@ -612,114 +553,87 @@ class GridSim(gridsim.GridSim):
     # Measurements from the grid simulator.
     # MEASure triggers the acquisition of new measurement data before returning a reading.
     # FETCh returns a reading computed from previously acquired data.
+    # The phase selection, readings and the error queue check are sent as one compound message (one round trip).
+    def _meas_query(self, queries):
+        """
+        Send the queries and an error queue check as one compound message.
+
+        :param queries: list of queries, each returning one reading
+        :return: list of readings
+        """
+        # inside a transaction the query goes through it so its pending error checks are read first
+        conn = self._transaction if self._transaction is not None else self.conn
+        try:
+            resp = conn.query_many(list(queries) + ['syst:err?'])
+        except Exception as e:
+            raise gridsim.GridSimError(str(e))
+        err = resp.pop()
+        if len(err) > 0 and err[0] != '0':
+            raise gridsim.GridSimError(err + ' ' + ';'.join(queries))
+        return resp
+
+    @staticmethod
+    def _meas_value(resp, scale=1.):
+        try:
+            return float(resp) * scale
+        except ValueError:
+            return float(resp[:-1]) * scale
+
+    def _meas_phases(self, header, ph_list, scale=1.):
+        phases = [ph for ph in (1, 2, 3) if ph in ph_list]
+        resp = self._meas_query(['inst:coup none;:inst:nsel %d;:meas:%s?' % (ph, header) for ph in phases])
+        values = dict(zip(phases, resp))
+        return tuple([self._meas_value(values[ph], scale) if ph in values else None for ph in (1, 2, 3)])
+
     def meas_current(self, ph_list=(1, 2, 3)):
-        if 1 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 1\n')
-            i1 = self.query('meas:curr:ac?\n')
-            i1 = float(i1[:-1])
-        else:
-            i1 = None
-        if 2 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 2\n')
-            i2 = self.query('meas:curr:ac?\n')
-            i2 = float(i2[:-1])
-        else:
-            i2 = None
-        if 3 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 3\n')
-            i3 = self.query('meas:curr:ac?\n')
-            i3 = float(i3[:-1])
-        else:
-            i3 = None
-        return i1, i2, i3
+        return self._meas_phases('curr:ac', ph_list)
 
     def meas_voltage(self, ph_list=(1, 2, 3)):
-        if 1 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 1\n')
-            v1 = self.query('meas:volt:ac?\n')
-            v1 = float(v1[:-1])
-        else:
-            v1 = None
-        if 2 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 2\n')
-            v2 = self.query('meas:volt:ac?\n')
-            v2 = float(v2[:-1])
-        else:
-            v2 = None
-        if 3 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 3\n')
-            v3 = self.query('meas:volt:ac?\n')
-            v3 = float(v3[:-1])
-        else:
-            v3 = None
-        return v1, v2, v3
+        return self._meas_phases('volt:ac', ph_list)
 
     def meas_freq(self):
         freq = self.query('meas:FREQ?\n')
         return freq
 
     def meas_power(self, ph_list=(1, 2, 3)):
-        if 1 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 1\n')
-            p1 = self.query('meas:pow:ac?\n')
-            p1 = float(p1[:-1])*1000.
-        else:
-            p1 = None
-        if 2 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 2\n')
-            p2 = self.query('meas:pow:ac?\n')
-            p2 = float(p2[:-1])*1000.
-        else:
-            p2 = None
-        if 3 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 3\n')
-            p3 = self.query('meas:pow:ac?\n')
-            p3 = float(p3[:-1])*1000.
-        else:
-            p3 = None
-        return p1, p2, p3
+        return self._meas_phases('pow:ac', ph_list, scale=1000.)
 
     def meas_va(self, ph_list=(1, 2, 3)):
-        if 1 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 1\n')
-            va1 = self.query('meas:pow:ac:app?\n')
-            va1 = float(va1[:-1])*1000.
-        else:
-            va1 = None
-        if 2 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 2\n')
-            va2 = self.query('meas:pow:ac:app?\n')
-            va2 = float(va2[:-1])*1000.
-        else:
-            va2 = None
-        if 3 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 3\n')
-            va3 = self.query('meas:pow:ac:app?\n')
-            va3 = float(va3[:-1])*1000.
-        else:
-            va3 = None
-        return va1, va2, va3
+        return self._meas_phases('pow:ac:app', ph_list, scale=1000.)
 
     def meas_pf(self, ph_list=(1, 2, 3)):
-        if 1 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 1\n')
-            pf1 = self.query('meas:pow:pfac?\n')
-            pf1 = float(pf1[:-1])
-        else:
-            pf1 = None
-        if 1 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 2\n')
-            pf2 = self.query('meas:pow:pfac?\n')
-            pf2 = float(pf2[:-1])
-        else:
-            pf2 = None
-        if 1 in ph_list:
-            self.cmd('inst:coup none;:inst:nsel 3\n')
-            pf3 = self.query('meas:pow:pfac?\n')
-            pf3 = float(pf3[:-1])
-        else:
-            pf3 = None
-        return pf1, pf2, pf3
+        return self._meas_phases('pow:pfac', ph_list)
+
+    def meas_all(self, ph_list=(1, 2, 3), points=MEAS_POINTS):
+        """
+        Measure all quantities on all phases in one round trip: the first reading triggers a new acquisition
+        (MEASure) and the others are fetched from the same acquisition (FETCh). The error queue is checked once for
+        the batch.
+
+        :param ph_list: list of phases to be measured
+        :param points: list of points to be measured, from MEAS_POINTS
+        :return: dictionary of DAS point name: value, e.g. {'AC_VRMS_1': 277.1, ..., 'AC_FREQ_1': 60.0}
+        """
+        phases = [ph for ph in (1, 2, 3) if ph in ph_list]
+        queries = []
+        names = []
+        scales = []
+        for ph in phases:
+            select = 'inst:coup none;:inst:nsel %d;:' % ph
+            for p in points:
+                if p == 'AC_FREQ':
+                    continue
+                header, scale = MEAS_QUERIES[p]
+                queries.append('%s%s:%s?' % (select, 'fetc' if queries else 'meas', header))
+                names.append('%s_%d' % (p, ph))
+                scales.append(scale)
+                select = ''
+        if 'AC_FREQ' in points:
+            queries.append('%s:freq?' % ('fetc' if queries else 'meas'))
+            names.append('AC_FREQ_1')
+            scales.append(1.)
+        resp = self._meas_query(queries)
+        return dict([(n, self._meas_value(r, scale)) for n, r, scale in zip(names, resp, scales)])
 
     def fetch_current(self):
         self.cmd('inst:coup none;:inst:nsel 1\n')
@@ -31,15 +31,15 @@ Questions can be directed to support@sunspec.org
 """
 
 import os
+import contextlib
 import time
-import socket
 import re
 
-import serial
 import visa
 
 from . import grid_profiles
 from . import gridsim
+from . import scpi
 
 pacific_info = {
     'name': os.path.splitext(os.path.basename(__file__))[0],
@@ -95,7 +95,6 @@ class GridSim(gridsim.GridSim):
       ip_port
     """
     def __init__(self, ts, group_name):
-        self.buffer_size = 1024
         self.conn = None
 
         gridsim.GridSim.__init__(self, ts, group_name)
@@ -117,13 +116,18 @@ class GridSim(gridsim.GridSim):
         self.cmd_str = ''
         self._cmd = None
         self._query = None
+        self._transaction = None
         self.profile_name = ts.param_value('profile.profile_name')
 
         if self.comm == 'Serial':
+            self.conn = scpi.SerialTransport(self.serial_port, baudrate=self.baudrate, timeout=self.timeout,
+                                             write_timeout=self.write_timeout)
             self.open()  # open communications
-            self._cmd = self.cmd_serial
-            self._query = self.query_serial
+            self._cmd = self.conn.write
+            self._query = self.conn.query
         elif self.comm == 'TCP/IP':
+            self.ts.log('ipaddr = %s  ipport = %s' % (self.ipaddr, self.ipport))
+            self.conn = scpi.TcpTransport(self.ipaddr, self.ipport, timeout=self.timeout)
             self._cmd = self.cmd_tcp
             self._query = self.query_tcp
         elif self.comm == 'REMOTE IP-GPIB':
@@ -156,22 +160,24 @@ class GridSim(gridsim.GridSim):
 
         # The Pacific Grid simulator can be configured with either programs or with direct commands.
         # Here we take the conservative approach of creating and executing a program and also sending direct commands.
-        self.cmd('*CLS\n')  # Clear error/event queue
-        self.ts.log('Device info: %s' % self.info())
+        # the settings are checked for errors once before the program is executed
+        with self.transaction():
+            self.cmd('*CLS\n')  # Clear error/event queue
+            self.ts.log('Device info: %s' % self.info())
 
-        self.ts.log('Configuring the default settings into Program 0...')
-        self.program(prog=0, config=True)
+            self.ts.log('Configuring the default settings into Program 0...')
+            self.program(prog=0, config=True)
 
-        self.ts.log('Configuring the operational program...')
-        self.program(prog=1, config=True)
-        self.ts.log('New settings: %s' % self.program(prog=1))
+            self.ts.log('Configuring the operational program...')
+            self.program(prog=1, config=True)
+            self.ts.log('New settings: %s' % self.program(prog=1))
 
-        # set voltage max
-        v_max = self.v_max_param
-        self.ts.log('Setting maximum voltage to %0.2f V.' % v_max)
-        self.voltage_max(voltage=(v_max, v_max, v_max))
+            # set voltage max
+            v_max = self.v_max_param
+            self.ts.log('Setting maximum voltage to %0.2f V.' % v_max)
+            self.voltage_max(voltage=(v_max, v_max, v_max))
 
-        # Note, max voltage must be set prior to program execution.
+        # Note, max voltage must be set prior to program execution, the transaction has checked the settings above.
         self.ts.log('Executing program.')
         self.execute_program(prog=1)  # program 0 is default
 
@@ -281,77 +287,19 @@ class GridSim(gridsim.GridSim):
         """ Execute transient portion of given program, use with start_profile() """
         self.cmd(':PROG:EXEC:TRANS %d\n' % int(prog))
 
-    def cmd_serial(self, cmd_str):
-        self.cmd_str = cmd_str
-        try:
-            if self.conn is None:
-                raise gridsim.GridSimError('Communications port not open')
-
-            self.conn.flushInput()
-            self.conn.write(cmd_str)
-        except Exception as e:
-             raise gridsim.GridSimError(str(e))
-
-    def query_serial(self, cmd_str):
-        resp = ''
-        more_data = True
-
-        self.cmd_serial(cmd_str)
-
-        while more_data:
-            try:
-                count = self.conn.inWaiting()
-                if count < 1:
-                    count = 1
-                data = self.conn.read(count)
-                if len(data) > 0:
-                    for d in data:
-                        resp += d
-                        if d == '\n':
-                            more_data = False
-                            break
-                else:
-                    raise gridsim.GridSimError('Timeout waiting for response')
-            except gridsim.GridSimError:
-                raise
-            except Exception as e:
-                raise gridsim.GridSimError('Timeout waiting for response - More data problem')
-
-        return resp
-
     def cmd_tcp(self, cmd_str):
         try:
-            if self.conn is None:
-                self.ts.log('ipaddr = %s  ipport = %s' % (self.ipaddr, self.ipport))
-                self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.conn.settimeout(self.timeout)
-                self.conn.connect((self.ipaddr, self.ipport))
-
-            # print 'cmd> %s' % (cmd_str)
-            self.conn.send(cmd_str)
+            self.conn.write(cmd_str)
             self.ts.sleep(1)
         except Exception as e:
             raise gridsim.GridSimError(str(e))
 
     def query_tcp(self, cmd_str):
-        resp = ''
-        more_data = True
-
-        self._cmd(cmd_str)
-
-        while more_data:
-            try:
-                data = self.conn.recv(self.buffer_size)
-                if len(data) > 0:
-                    for d in data:
-                        resp += d
-                        if d == '\n': #\r
-                            more_data = False
-                            break
-            except Exception as e:
-                raise gridsim.GridSimError('Timeout waiting for response')
-
-        return resp
+        try:
+            self.cmd_tcp(cmd_str)
+            return self.conn.read_line()
+        except Exception as e:
+            raise gridsim.GridSimError('Timeout waiting for response')
 
     def cmd_remote_tcp(self, cmd_str):
         try:
@@ -393,6 +341,9 @@ class GridSim(gridsim.GridSim):
     def cmd(self, cmd_str):
         self.cmd_str = cmd_str
         try:
+            if self._transaction is not None:
+                self._transaction.write(cmd_str)
+                return
             self._cmd(cmd_str)
             resp = self._query('SYSTem:ERRor?\n') #\r
 
@@ -404,12 +355,37 @@ class GridSim(gridsim.GridSim):
 
     def query(self, cmd_str):
         try:
+            if self._transaction is not None:
+                return self._transaction.query(cmd_str).strip()
             resp = self._query(cmd_str).strip()
         except Exception as e:
             raise gridsim.GridSimError(str(e))
 
         return resp
 
+    @contextlib.contextmanager
+    def transaction(self, mode=scpi.CHECK_PIPELINE):
+        """
+        Defer the SYSTem:ERRor? checks of the commands sent in the block to the end of the block. In CHECK_PIPELINE
+        mode errors are attributed to the failing commands, in CHECK_ESR mode the block is checked with *ESR?. Nested
+        blocks join the outer transaction. Only the serial interface uses transactions, the TCP/IP interfaces keep the
+        1 s pacing and the check of each command.
+
+        :param mode: scpi.CHECK_PIPELINE or scpi.CHECK_ESR
+        """
+        if self._transaction is not None or self.comm != 'Serial':
+            yield self._transaction
+            return
+        try:
+            with self.conn.transaction(mode=mode, error_query='SYSTem:ERRor?\n') as t:
+                self._transaction = t
+                try:
+                    yield t
+                finally:
+                    self._transaction = None
+        except scpi.ScpiError as e:
+            raise gridsim.GridSimError(str(e))
+
     def info(self):
         return self.query('*IDN?\n')
 
@@ -453,8 +429,7 @@ class GridSim(gridsim.GridSim):
         Open the communications resources associated with the grid simulator.
         """
         try:
-            self.conn = serial.Serial(port=self.serial_port, baudrate=self.baudrate, bytesize=8, stopbits=1, xonxoff=0,
-                                      timeout=self.timeout, writeTimeout=self.write_timeout)
+            self.conn.open()
             time.sleep(2)
         except Exception as e:
             raise gridsim.GridSimError(str(e))
@@ -629,8 +604,9 @@ class GridSim(gridsim.GridSim):
         # WFSEG3,1,TSEG,0.500000,SEG,3,FSEG,60.000000,VSEG1,120.000000,VSEG2,120.000000,VSEG3,120.000000,WFSEG1,1,
         # WFSEG2,1,WFSEG3,1,TSEG,0.000200,LAST
 
-        self.cmd(':PROG:NAME 1\n')
-        self.cmd(self.profile)
+        with self.transaction():
+            self.cmd(':PROG:NAME 1\n')
+            self.cmd(self.profile)
         self.ts.log_debug('Returned program string: %s' % self.query_program(prog=1))
 
         # Example returned program string:
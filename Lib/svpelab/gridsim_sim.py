@@ -31,7 +31,9 @@ Questions can be directed to support@sunspec.org
 """
 
 import os
+import time
 
+from . import grid_profiles
 from . import gridsim
 
 sim_info = {
@@ -50,6 +52,8 @@ def params(info, group_name):
     info.param_group(gname(GROUP_NAME), label='%s Parameters' % mode,
                      active=gname('mode'),  active_value=mode, glob=True)
     info.param_add_value(gname('mode'), sim_info['mode'])
+    info.param(pname('v_nom'), label='Nominal voltage for all phases', default=120.0)
+    info.param(pname('freq'), label='Frequency', default=60.0)
 
 GROUP_NAME = 'sim'
 
@@ -58,3 +62,69 @@ class GridSim(gridsim.GridSim):
 
     def __init__(self, ts, group_name, params=None, support_interfaces=None):
         gridsim.GridSim.__init__(self, ts, group_name, params, support_interfaces=support_interfaces)
+        self.v_nom_param = float(self._param_value('v_nom') or 120.0)
+        self.freq_param = float(self._param_value('freq') or 60.0)
+        self.v = (self.v_nom_param,) * 3
+        self.f = self.freq_param
+        self.profile = None
+        self.profile_start_time = None
+
+    def _param_value(self, name):
+        return self.ts.param_value(self.group_name + '.' + GROUP_NAME + '.' + name)
+
+    def _profile_values(self):
+        """
+        Return the simulated (voltage, freq) values, following the running profile.
+        """
+        if self.profile is not None and self.profile_start_time is not None:
+            v, f = self.profile.values(time.time() - self.profile_start_time)
+            return tuple(v.tolist()), f
+        return self.v, self.f
+
+    def freq(self, freq=None):
+        if freq is not None:
+            self.f = freq
+        return self._profile_values()[1]
+
+    def voltage(self, voltage=None):
+        if voltage is not None:
+            if isinstance(voltage, (int, float)):
+                voltage = (voltage, voltage, voltage)
+            self.v = tuple(voltage)
+        return self._profile_values()[0]
+
+    def profile_load(self, profile_name=None, v_step=100, f_step=100, t_step=None, profile=None):
+        if profile is None:
+            if profile_name is None:
+                raise gridsim.GridSimError('Profile not specified.')
+            if profile_name == 'Manual':  # Manual reserved for not running a profile.
+                self.ts.log_warning('Manual reserved for not running a profile')
+                return
+            if profile_name == 'Transient_Step':
+                if t_step is None:
+                    raise gridsim.GridSimError('Transient profile did not have a duration.')
+                profile = [(0, v_step, f_step), (t_step, v_step, f_step), (t_step, 100, 100)]
+            else:
+                profile = profile_name
+        try:
+            self.profile = grid_profiles.compile_profile(profile, v_nom=self.v_nom_param, f_nom=self.freq_param)
+        except grid_profiles.ProfileError as e:
+            raise gridsim.GridSimError(str(e))
+
+    def profile_start(self):
+        if self.profile is not None:
+            self.profile_start_time = time.time()
+
+    def profile_stop(self):
+        if self.profile_start_time is not None:
+            # hold the values reached when the profile is stopped
+            self.v, self.f = self._profile_values()
+            self.profile_start_time = None
+
+    def meas_voltage(self, ph_list=(1,2,3)):
+        v = self._profile_values()[0]
+        return tuple([v[i - 1] for i in ph_list])
+
+    def meas_freq(self):
+        f = self._profile_values()[1]
+        return f, f, f
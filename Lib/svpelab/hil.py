@@ -31,8 +31,7 @@ Questions can be directed to support@sunspec.org
 """
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
 
 class HILGenericException(Exception):
@@ -60,7 +59,7 @@ class HILSimulationException(Exception):
 
 # dict of modules found, entries are: name : module_name
 
-hil_modules = {}
+hil_modules = plugins.ModuleRegistry(__name__, 'hil')
 
 def params(info, id=None, label='HIL', group_name=None, active=None, active_value=None):
     if group_name is None:
@@ -72,9 +71,7 @@ def params(info, id=None, label='HIL', group_name=None, active=None, active_valu
     name = lambda name: group_name + '.' + name
     info.param_group(group_name, label='%s Parameters' % label, active=active, active_value=active_value, glob=True)
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
-    for mode, m in hil_modules.items():
-
-        m.params(info, group_name=group_name)
+    hil_modules.params(info, group_name=group_name)
 
 HIL_DEFAULT_ID = 'hil'
 
@@ -179,29 +176,8 @@ class HIL(object):
 
 def hil_scan():
     global hil_modules
-    # scan all files in current directory that match hil_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'hil_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'hil_info'):
-                info = m.hil_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    hil_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise HILError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match hil_*.py, modules are imported when first used
+    hil_modules.scan(HILError)
 
 # scan for hil modules on import
 hil_scan()
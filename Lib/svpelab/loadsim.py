@@ -32,10 +32,9 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
-loadsim_modules = {}
+loadsim_modules = plugins.ModuleRegistry(__name__, 'loadsim')
 
 def params(info, id=None, label='Load Simulator', group_name=None, active=None, active_value=None):
     if group_name is None:
@@ -49,8 +48,7 @@ def params(info, id=None, label='Load Simulator', group_name=None, active=None,
     info.param_group(group_name, label='%s Parameters' % label, active=active, active_value=active_value, glob=True)
     print('name = %s' % name('mode'))
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
-    for mode, m in loadsim_modules.items():
-        m.params(info, group_name=group_name)
+    loadsim_modules.params(info, group_name=group_name)
 
 LOADSIM_DEFAULT_ID = 'loadsim'
 
@@ -175,29 +173,8 @@ class LoadSim(object):
 
 def loadsim_scan():
     global loadsim_modules
-    # scan all files in current directory that match loadsim_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'loadsim_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'loadsim_info'):
-                info = m.loadsim_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    loadsim_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise LoadSimError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match loadsim_*.py, modules are imported when first used
+    loadsim_modules.scan(LoadSimError)
 
 # scan for loadsim modules on import
 loadsim_scan()
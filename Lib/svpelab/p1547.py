@@ -43,6 +43,8 @@ import collections
 import numpy as np
 import pandas as pd
 import random
+
+from . import phasor
 # import sys
 # import os
 # import glob
@@ -608,6 +610,297 @@ class DataLogging:
         #    raise p1547Error('Error in get_tr_data(): %s' % (str(e)))
 
 
+    def _measurement_totals(self, ds, type_meas, index):
+        """
+        Vectorized get_measurement_total() over the dataset samples at index.
+
+        :param ds:          dataset from data acquisition object
+        :param type_meas:   Either V, P, Q, F, ...
+        :param index:       array of sample indexes
+        :return: array of measurement totals
+        """
+        labels = self.get_measurement_label(type_meas)
+        if type_meas == 'F':
+            labels = labels[:1]
+        try:
+            value = sum(np.asarray(ds.point_data(label), dtype=float)[index] for label in labels)
+        except Exception as e:
+            # fall back to the soft channel recorded during the test
+            try:
+                return np.round(np.asarray(ds.point_data('%s_MEAS' % type_meas), dtype=float)[index], 3)
+            except Exception:
+                raise p1547Error('Error in _measurement_totals() : %s' % (str(e)))
+        if type_meas == 'V':
+            value = value / len(labels)
+        return np.round(value, 3)
+
+    def timeresponse_table(self, ds, step_value, t_step=None, time_point='TIME'):
+        """
+        Batch version of record_timeresponse() evaluated on the dataset captured during a step. The Tr instants are
+        located by timestamp search and the measured, target, min and max values of all meas_values are computed for
+        all Tr iterations at once.
+
+        :param ds:          dataset (Dataset) captured during the step, with a time point in seconds
+        :param step_value:  the step value of X
+        :param t_step:      time of the step in the dataset time base, defaults to the first sample with the step label
+                            in the EVENT point or, if there is none, the first sample
+        :param time_point:  name of the time point
+
+        :return: (table, t_step, initial) with table a numpy structured array with one row per Tr iteration with the
+                 TR iteration, the TIME of the sample and the <meas>_MEAS, <meas>_TARGET, <meas>_TARGET_MIN and
+                 <meas>_TARGET_MAX values (nan if not applicable) and initial a dictionary of the measured values at
+                 the step
+        """
+        x = self.x_criteria
+        y = self.y_criteria
+        time = np.asarray(ds.point_data(time_point), dtype=float)
+        if len(time) == 0:
+            raise p1547Error('Error in timeresponse_table() : empty dataset')
+
+        if t_step is None:
+            t_step = time[0]
+            if 'EVENT' in ds.points and self.current_step_label is not None:
+                events = np.asarray(ds.point_data('EVENT'), dtype=object)
+                step_index = np.nonzero(events == self.current_step_label)[0]
+                if len(step_index) > 0:
+                    t_step = time[step_index[0]]
+
+        # Tr deadlines, each evaluated on the first sample at or after the deadline as in record_timeresponse()
+        tr_iters = np.arange(1, self.n_tr + 1)
+        t_tr = t_step + tr_iters * self.tr
+        index = np.searchsorted(time, t_tr, side='left')
+        missing = index >= len(time)
+        if np.any(missing):
+            self.ts.log_warning('Dataset ends before Tr %s' % tr_iters[missing].tolist())
+        index = np.minimum(index, len(time) - 1)
+        initial_index = max(int(np.searchsorted(time, t_step, side='right')) - 1, 0)
+
+        fields = [('TR', int), ('TIME', float)]
+        for meas_value in self.meas_values:
+            fields.extend([('%s_MEAS' % meas_value, float), ('%s_TARGET' % meas_value, float),
+                           ('%s_TARGET_MIN' % meas_value, float), ('%s_TARGET_MAX' % meas_value, float)])
+        table = np.zeros(len(tr_iters), dtype=fields)
+        for name in table.dtype.names[1:]:
+            table[name] = np.nan
+        table['TR'] = tr_iters
+        table['TIME'] = time[index]
+
+        initial = {}
+        for meas_value in self.meas_values:
+            totals = self._measurement_totals(ds, meas_value, np.append(index, initial_index))
+            table['%s_MEAS' % meas_value] = np.where(missing, np.nan, totals[:-1])
+            initial[meas_value] = float(totals[-1])
+            if meas_value in x:
+                table['%s_TARGET' % meas_value] = step_value
+            elif meas_value in y:
+                table['%s_TARGET' % meas_value] = self.update_target_value(step_value)
+                if isinstance(self, ResponseEnvelope):
+                    y_min, y_max = self.envelope(self._measurement_totals(ds, x[0], index))
+                    table['%s_TARGET_MIN' % meas_value] = np.where(missing, np.nan, y_min)
+                    table['%s_TARGET_MAX' % meas_value] = np.where(missing, np.nan, y_max)
+                    continue
+                for i in range(len(index)):
+                    if not missing[i]:
+                        data = dict((p, ds.data[k][index[i]]) for k, p in enumerate(ds.points))
+                        table['%s_TARGET_MIN' % meas_value][i], table['%s_TARGET_MAX' % meas_value][i] = \
+                            self.calculate_min_max_values(daq=None, data=data)
+
+        return table, t_step, initial
+
+    def evaluate_timeresponse(self, ds, step_value, t_step=None, time_point='TIME'):
+        """
+        Fill the time response values (tr_value) and the initial values from the dataset captured during a step
+        using timeresponse_table() instead of sampling at each Tr deadline, e.g. to re-score stored data. The result
+        can be evaluated with the criteria and written with write_rslt_sum() as for record_timeresponse().
+
+        :return: returns the tr_value dictionary
+        """
+        table, t_step, initial = self.timeresponse_table(ds, step_value, t_step=t_step, time_point=time_point)
+        x = self.x_criteria
+        y = self.y_criteria
+
+        self.initial_value['timestamp'] = datetime.fromtimestamp(t_step)
+        for meas_value in self.meas_values:
+            if meas_value in x:
+                self.initial_value[meas_value] = {'x_value': initial[meas_value]}
+            elif meas_value in y:
+                self.initial_value[meas_value] = {'y_value': initial[meas_value]}
+
+        for row in table:
+            tr_iter = int(row['TR'])
+            for meas_value in self.meas_values:
+                self.tr_value['%s_TR_%s' % (meas_value, tr_iter)] = float(row['%s_MEAS' % meas_value])
+                if meas_value in x:
+                    self.tr_value['%s_TR_TARG_%s' % (meas_value, tr_iter)] = float(row['%s_TARGET' % meas_value])
+                elif meas_value in y:
+                    self.tr_value['%s_TR_TARG_%s' % (meas_value, tr_iter)] = float(row['%s_TARGET' % meas_value])
+                    self.tr_value['%s_TR_%s_MIN' % (meas_value, tr_iter)] = float(row['%s_TARGET_MIN' % meas_value])
+                    self.tr_value['%s_TR_%s_MAX' % (meas_value, tr_iter)] = float(row['%s_TARGET_MAX' % meas_value])
+            self.tr_value['timestamp_%s' % tr_iter] = self.initial_value['timestamp'] + \
+                timedelta(seconds=self.tr * tr_iter)
+            self.tr_value['LAST_ITER'] = tr_iter
+        self.tr_value['FIRST_ITER'] = 1
+
+        return self.tr_value
+
+
+OPEN_LOOP_TAU_GRID = 48        # coarse time constant grid points per step
+OPEN_LOOP_TAU_REFINE = 24      # fine grid points between the neighbours of the coarse minimum
+OPEN_LOOP_SETTLING = 0.02      # default settling band, fraction of the step size
+OPEN_LOOP_MIN_STEP = 1e-9      # smallest fitted step size, fraction of the Y values, treated as a change
+OPEN_LOOP_F_CRITICAL = 3.4     # F statistic of the fit against a constant exceeded by 5 % of pure-noise captures
+
+
+def open_loop_value(duration, y0, y_ss, tr):
+    """
+    Vectorized CriteriaValidation.calculate_open_loop_value(): Y(duration) of the open loop response from y0 to y_ss
+    with the open loop response time tr (90 % change).
+    """
+    time_const = tr / (-(math.log(0.1)))
+    resp_fraction = 1 - np.exp(-np.asarray(duration, dtype=float) / time_const)
+    return (y_ss - y0) * resp_fraction + y0
+
+
+def _open_loop_sse(t, y, w, tau):
+    """
+    Least squares fit of y = a + b * exp(-t/tau) for fixed tau per step, returns (sse, a, b).
+    """
+    e = np.exp(-t / tau[:, np.newaxis]) * w
+    s1 = w.sum(axis=1)
+    se = e.sum(axis=1)
+    see = (e * e).sum(axis=1)
+    sy = (y * w).sum(axis=1)
+    sey = (e * y).sum(axis=1)
+    syy = (y * y * w).sum(axis=1)
+    det = s1 * see - se * se
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b = np.where(det > 0, (s1 * sey - se * sy) / det, 0.)
+        a = (sy - b * se) / s1
+    sse = np.maximum(syy - a * sy - b * sey, 0.)
+    return sse, a, b
+
+
+def _open_loop_scan(t, y, w, grid):
+    """
+    Return the grid time constant with the lowest fit error per step and its grid index.
+    """
+    sse = np.empty(grid.shape)
+    for k in range(grid.shape[1]):
+        sse[:, k] = _open_loop_sse(t, y, w, grid[:, k])[0]
+    k = np.argmin(sse, axis=1)
+    return k, sse
+
+
+def fit_open_loop(times, values, settling_band=None):
+    """
+    Fit the first order (open loop) response y(t) = y_ss + (y0 - y_ss) * exp(-t/tau) to the full transient of each
+    step by least squares, in batch over all steps.
+
+    The fit is linear in y0 and y_ss for a given tau, so the time constant is found by scanning a logarithmic grid per
+    step, refining around the minimum and interpolating the error parabola. The 95 % confidence bounds of Tr are from
+    the covariance of the three parameters.
+
+    :param times: sequence of time arrays (s since the step), one per step, or 2-D array (steps, samples)
+    :param values: sequence of Y arrays matching times, NaN samples are ignored
+    :param settling_band: settling band in Y units, scalar or per step, defaults to OPEN_LOOP_SETTLING of the fitted
+                          step size
+    :return: dictionary of arrays, one value per step: y0, y_ss, tau, tr (2.3 * tau, 90 % change), tr_low, tr_high,
+             rmse, overshoot (fraction of the step size beyond y_ss), settling (time of the last sample outside the
+             settling band, NaN if the response did not settle), f_stat (F statistic of the fit against a constant
+             value), changed (False if the fitted step size is zero or f_stat is below OPEN_LOOP_F_CRITICAL, tau, tr
+             and its bounds are NaN for those steps)
+
+    The F test accounts for the time constant search: OPEN_LOOP_F_CRITICAL was set from simulated pure-noise captures
+    of 50 to 2000 samples, it flags 4 to 5 % of them as changed (the F distribution 95 % point of 3.0 flags about 7 %).
+    """
+    steps = len(times)
+    if steps == 0:
+        return dict([(key, np.zeros(0)) for key in ('y0', 'y_ss', 'tau', 'tr', 'tr_low', 'tr_high', 'rmse',
+                                                     'overshoot', 'settling', 'f_stat')] +
+                    [('changed', np.zeros(0, dtype=bool))])
+    n = max([len(tt) for tt in times]) if steps else 0
+    t = np.full((steps, n), np.nan)
+    y = np.full((steps, n), np.nan)
+    for i in range(steps):
+        t[i, :len(times[i])] = times[i]
+        y[i, :len(values[i])] = values[i]
+    mask = ~np.isnan(t) & ~np.isnan(y)
+    w = mask.astype(float)
+    t = np.where(mask, t, 0.)
+    y = np.where(mask, y, 0.)
+    count = w.sum(axis=1)
+    if np.any(count < 4):
+        raise p1547Error('Open loop fit needs at least 4 samples per step')
+
+    # logarithmic time constant grid from a fraction of the sample interval to twice the capture duration
+    duration = np.where(mask, t, -np.inf).max(axis=1)
+    dt = duration / (count - 1)
+    unit = np.logspace(0., 1., OPEN_LOOP_TAU_GRID)
+    lo = np.log10(dt / 4.)
+    hi = np.log10(2. * duration)
+    grid = 10 ** (lo[:, np.newaxis] + (hi - lo)[:, np.newaxis] * np.log10(unit)[np.newaxis, :])
+    k, sse = _open_loop_scan(t, y, w, grid)
+    rows = np.arange(steps)
+    left = grid[rows, np.maximum(k - 1, 0)]
+    right = grid[rows, np.minimum(k + 1, OPEN_LOOP_TAU_GRID - 1)]
+    fine = np.exp(np.log(left)[:, np.newaxis] +
+                  (np.log(right) - np.log(left))[:, np.newaxis] * np.linspace(0., 1., OPEN_LOOP_TAU_REFINE))
+    k, sse = _open_loop_scan(t, y, w, fine)
+
+    # parabolic interpolation of the error in log(tau)
+    log_tau = np.log(fine[rows, k])
+    inner = (k > 0) & (k < OPEN_LOOP_TAU_REFINE - 1)
+    km = np.clip(k - 1, 0, OPEN_LOOP_TAU_REFINE - 1)
+    kp = np.clip(k + 1, 0, OPEN_LOOP_TAU_REFINE - 1)
+    s0, s1, s2 = sse[rows, km], sse[rows, k], sse[rows, kp]
+    curv = s0 - 2 * s1 + s2
+    step = np.log(fine[rows, kp]) - log_tau
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(inner & (curv > 0), 0.5 * step * (s0 - s2) / curv, 0.)
+    tau = np.exp(log_tau + np.clip(shift, -step, step))
+    sse, a, b = _open_loop_sse(t, y, w, tau)
+
+    # parameter covariance from the jacobian of (a, b, tau)
+    e = np.exp(-t / tau[:, np.newaxis]) * w
+    jac = np.stack((w, e, b[:, np.newaxis] * e * t / (tau ** 2)[:, np.newaxis]), axis=2)
+    jtj = np.einsum('sni,snj->sij', jac, jac)
+    sigma2 = sse / np.maximum(count - 3, 1)
+    cov = np.linalg.pinv(jtj) * sigma2[:, np.newaxis, np.newaxis]
+    sd_tau = np.sqrt(np.maximum(cov[:, 2, 2], 0.))
+
+    # F test of the fit (3 parameters) against a constant (1 parameter)
+    sse_const = (w * (y - ((w * y).sum(axis=1) / count)[:, np.newaxis]) ** 2).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_stat = ((sse_const - sse) / 2.) / (sse / np.maximum(count - 3, 1))
+
+    y_ss = a
+    y0 = a + b
+    tr_factor = -math.log(0.1)
+    size = np.abs(b)
+    direction = np.sign(-b)
+    # without a change tau is unconstrained and the grid edge it lands on is not a response time
+    changed = (f_stat > OPEN_LOOP_F_CRITICAL) & (size > OPEN_LOOP_MIN_STEP * np.maximum(np.abs(a), np.abs(y0)))
+    tau = np.where(changed, tau, np.nan)
+    sd_tau = np.where(changed, sd_tau, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beyond = np.where(mask, direction[:, np.newaxis] * (y - y_ss[:, np.newaxis]), -np.inf).max(axis=1)
+        overshoot = np.where(size > 0, np.maximum(beyond, 0.) / size, 0.)
+
+    if settling_band is None:
+        settling_band = OPEN_LOOP_SETTLING * size
+    band = np.broadcast_to(np.asarray(settling_band, dtype=float), (steps,))
+    outside = mask & (np.abs(y - y_ss[:, np.newaxis]) > band[:, np.newaxis])
+    last_valid = n - 1 - np.argmax(mask[:, ::-1], axis=1)
+    last_out = n - 1 - np.argmax(outside[:, ::-1], axis=1)
+    settling = np.where(outside.any(axis=1), t[rows, last_out], 0.)
+    settling = np.where(outside[rows, last_valid], np.nan, settling)
+
+    return {'y0': y0, 'y_ss': y_ss, 'tau': tau, 'tr': tau * tr_factor,
+            'tr_low': (tau - 1.96 * sd_tau) * tr_factor, 'tr_high': (tau + 1.96 * sd_tau) * tr_factor,
+            'rmse': np.sqrt(sse / count), 'overshoot': overshoot, 'settling': settling, 'f_stat': f_stat,
+            'changed': changed}
+
+
 class CriteriaValidation:
     def __init__(self, criteria):
         self.criteria_mode = criteria
@@ -641,6 +934,71 @@ class CriteriaValidation:
 
         return resp
 
+    def open_loop_envelope(self, duration, y_start, y_ss, tr):
+        """
+        Vectorized open loop response bounds of open_loop_resp_criteria() at each duration since the step.
+
+        :return: (y_target, y_min, y_max) arrays
+        """
+        y = self.y_criteria[0]
+        mra_y = self.MRA[y]
+        duration = np.asarray(duration, dtype=float)
+        if self.script_name == CRP:
+            y_start = 0.0
+            mra_t = np.zeros_like(duration)
+        else:
+            mra_t = self.MRA['T'] * duration
+        y_target = open_loop_value(duration, y_start, y_ss, tr)
+        y_early = open_loop_value(np.maximum(duration - 1.5 * mra_t, 0.), y_start, y_ss, tr)
+        y_late = open_loop_value(duration + 1.5 * mra_t, y_start, y_ss, tr)
+        y_min = np.minimum(y_early, y_late) - 1.5 * mra_y
+        y_max = np.maximum(y_early, y_late) + 1.5 * mra_y
+        return y_target, y_min, y_max
+
+    def open_loop_fit_criteria(self, times, values, y_start, y_ss, tr=None):
+        """
+        Batch open loop response evaluation of the full transient of each step: fits the first order response with
+        fit_open_loop() and checks every sample against the open loop response envelope (the bounds used by
+        open_loop_resp_criteria() at Tr).
+
+        :param times: sequence of time arrays (s since the step), one per step
+        :param values: sequence of Y arrays matching times
+        :param y_start: initial Y values, scalar or one per step
+        :param y_ss: final (target) Y values, scalar or one per step
+        :param tr: open loop response time, defaults to the time response setting
+
+        :return: fit_open_loop() dictionary plus, per step, 'TR_FIT_PF' ('Pass' if the fitted Tr is within Tr and its
+                 time accuracy, 'N/A' if the fit found no step), 'TRAJECTORY_INSIDE' (fraction of samples within the
+                 envelope) and 'TRAJECTORY_PF'
+        """
+        if tr is None:
+            tr = self.tr
+        fit = fit_open_loop(times, values)
+        steps = len(times)
+        y_start = np.broadcast_to(np.asarray(y_start, dtype=float), (steps,))
+        y_ss = np.broadcast_to(np.asarray(y_ss, dtype=float), (steps,))
+
+        inside = np.zeros(steps)
+        for i in range(steps):
+            t = np.asarray(times[i], dtype=float)
+            y = np.asarray(values[i], dtype=float)
+            y_target, y_min, y_max = self.open_loop_envelope(t, y_start[i], y_ss[i], tr)
+            if self.script_name == CRP:  # 1-sided analysis
+                if y_start[i] <= y_ss[i]:
+                    ok = y_min <= y
+                else:
+                    ok = y <= y_max
+            else:
+                ok = (y_min <= y) & (y <= y_max)
+            valid = ~np.isnan(y)
+            inside[i] = ok[valid].mean() if np.any(valid) else 0.
+
+        fit['TR_FIT_PF'] = np.where(fit['changed'], np.where(fit['tr'] <= tr * (1 + self.MRA['T']), 'Pass', 'Fail'),
+                                    'N/A')
+        fit['TRAJECTORY_INSIDE'] = inside
+        fit['TRAJECTORY_PF'] = np.where(inside >= 1., 'Pass', 'Fail')
+        return fit
+
     def open_loop_resp_criteria(self, tr=1):
         """
         TRANSIENT: Open Loop Time Response (OLTR) = 90% of (y_final-y_initial) + y_initial
@@ -754,6 +1112,87 @@ class CriteriaValidation:
                         self.tr_value['%s_TR_%s_PF' % (y, tr_iter)]))
 
 
+class ResponseEnvelope:
+    """
+    Vectorized target and pass/fail envelope of a function characteristic.
+
+    Each function defines curve_points() returning the (x, y) breakpoints of its piecewise linear characteristic for
+    the current curve and power level, the arrays are computed once per (curve, pwr). The target is the
+    characteristic at x, held at the end values outside the breakpoints. The envelope is the minimum and maximum of
+    the target for x within +/- 1.5 * MRA(x), widened by 1.5 * MRA(y), so a whole captured step can be checked at once:
+
+        y_min, y_max = vv.envelope(v_meas)
+        passed = vv.check(v_meas, q_meas)
+    """
+
+    def curve_points(self):
+        """
+        Return the (x, y) breakpoints of the characteristic for the current curve and power level, implemented by
+        each function using the envelope.
+        """
+        raise NotImplementedError('%s.curve_points() is not implemented' % type(self).__name__)
+
+    def curve_arrays(self):
+        """
+        Return the (x, y) breakpoint arrays of the current curve and power level.
+        """
+        params = self.param[self.curve]
+        key = (self.curve, self.pwr, tuple(sorted(params.items())))
+        cache = self.__dict__.setdefault('_curve_cache', {})
+        arrays = cache.get(key)
+        if arrays is None:
+            x, y = self.curve_points()
+            x = np.asarray(x, dtype=float)
+            y = np.asarray(y, dtype=float)
+            order = np.argsort(x, kind='stable')
+            arrays = (x[order], y[order])
+            cache[key] = arrays
+        return arrays
+
+    def target(self, x):
+        """
+        :param x: X value(s), e.g. voltage for VV
+        :return: target Y value(s)
+        """
+        xp, yp = self.curve_arrays()
+        return np.round(np.interp(x, xp, yp), 1)
+
+    def envelope(self, x):
+        """
+        :param x: measured X value(s)
+        :return: (y_min, y_max) pass/fail bounds of Y
+        """
+        xp, yp = self.curve_arrays()
+        x = np.asarray(x, dtype=float)
+        dx = 1.5 * self.MRA[self.x_criteria[0]]
+        dy = 1.5 * self.MRA[self.y_criteria[0]]
+        y_lo = np.interp(x - dx, xp, yp)
+        y_hi = np.interp(x + dx, xp, yp)
+        y_min = np.minimum(y_lo, y_hi)
+        y_max = np.maximum(y_lo, y_hi)
+        # breakpoints within the X accuracy window
+        inside = (xp >= (x - dx)[..., np.newaxis]) & (xp <= (x + dx)[..., np.newaxis])
+        if np.any(inside):
+            y_min = np.minimum(y_min, np.where(inside, yp, np.inf).min(axis=-1))
+            y_max = np.maximum(y_max, np.where(inside, yp, -np.inf).max(axis=-1))
+        return np.round(y_min, 1) - dy, np.round(y_max, 1) + dy
+
+    def check(self, x, y):
+        """
+        :return: boolean array, True where y is within the envelope of x
+        """
+        y_min, y_max = self.envelope(x)
+        return (y_min <= y) & (y <= y_max)
+
+    def update_target_value(self, value):
+        return float(self.target(value))
+
+    def calculate_min_max_values(self, daq, data):
+        x = self.get_measurement_total(data=data, type_meas=self.x_criteria[0], log=False)
+        y_min, y_max = self.envelope(x)
+        return float(y_min), float(y_max)
+
+
 class ImbalanceComponent:
 
     def __init__(self):
@@ -836,7 +1275,9 @@ class ImbalanceComponent:
         Configure the grid simulator to change the magnitude and angles.
         :param grid:   A gridsim object from the svpelab library
         :param case:   string (case_a or case_b)
-        :return: nothing
+        :param imbalance_resp: voltage the EUT responds to, 'AVG_3PH_RMS', 'INDIVIDUAL_PHASES_VOLTAGES' or
+                               'POSITIVE_SEQUENCE_VOLTAGES'
+        :return: the average voltage, the list of the individual phase voltages or the positive sequence voltage
         """
         self.ts.log_debug(f'mag={self.mag}')
         self.ts.log_debug(f'grid={grid}')
@@ -847,12 +1288,13 @@ class ImbalanceComponent:
         if imbalance_resp == 'AVG_3PH_RMS':
             self.ts.log_debug(f'mag={self.mag[case]}')
             return round(sum(self.mag[case])/3.0,2)
-        elif imbalance_resp is 'INDIVIDUAL_PHASES_VOLTAGES':
-            #TODO TO BE COMPLETED
-            pass
-        elif imbalance_resp is 'POSITIVE_SEQUENCE_VOLTAGES':
-            #TODO to be completed
-            pass
+        elif imbalance_resp == 'INDIVIDUAL_PHASES_VOLTAGES':
+            return [round(v, 2) for v in self.mag[case]]
+        elif imbalance_resp == 'POSITIVE_SEQUENCE_VOLTAGES':
+            # the grid simulator angles are phase lags, [0, 120, -120] is the balanced ABC set
+            zero, positive, negative = phasor.sequence_from_polar(self.mag[case], [-a for a in self.ang[case]])
+            self.ts.log_debug(f'V0={abs(zero):.3f}, V1={abs(positive):.3f}, V2={abs(negative):.3f}')
+            return round(float(abs(positive)), 2)
 """
 Section for criteria validation
 """
@@ -904,7 +1346,8 @@ class HilModel(object):
 This section is for Voltage stabilization function such as VV, VW, CPF and CRP
 """
 
-class VoltVar(EutParameters, UtilParameters, DataLogging, CriteriaValidation, ImbalanceComponent):
+class VoltVar(EutParameters, UtilParameters, DataLogging, CriteriaValidation, ImbalanceComponent,
+              ResponseEnvelope):
     """
     param curve: choose curve characterization [1-3] 1 is default
     """
@@ -964,31 +1407,20 @@ class VoltVar(EutParameters, UtilParameters, DataLogging, CriteriaValidation, Im
             'Q4': round(self.var_rated * -1.0, 2)
         }
 
-    def update_target_value(self, value):
+    def curve_points(self):
+        param = self.param[self.curve]
+        x = [param['V1'], param['V2'], param['V3'], param['V4']]
+        y = [param['Q1'], param['Q2'], param['Q3'], param['Q4']]
+        return x, np.array(y) * self.pwr
 
-        x = [self.param[self.curve]['V1'], self.param[self.curve]['V2'],
-             self.param[self.curve]['V3'], self.param[self.curve]['V4']]
-        y = [self.param[self.curve]['Q1'], self.param[self.curve]['Q2'],
-             self.param[self.curve]['Q3'], self.param[self.curve]['Q4']]
-        q_value = float(np.interp(value, x, y))
-        q_value *= self.pwr
-        return round(q_value, 1)
-
-    def calculate_min_max_values(self, daq, data):
-        y = 'Q'
-        v_meas = self.get_measurement_total(data=data, type_meas='V', log=False)
-        target_min = self.update_target_value(v_meas + self.MRA['V'] * 1.5) - (self.MRA['Q'] * 1.5)
-        target_max = self.update_target_value(v_meas - self.MRA['V'] * 1.5) + (self.MRA['Q'] * 1.5)
-
-        return target_min, target_max
-
-class VoltWatt(EutParameters, UtilParameters, DataLogging, ImbalanceComponent):
+class VoltWatt(EutParameters, UtilParameters, DataLogging, ImbalanceComponent, ResponseEnvelope):
     """
     param curve: choose curve characterization [1-3] 1 is default
     """
     # Default curve initialization will be 1
     def __init__(self, ts, curve=1):
         EutParameters.__init__(self, ts)
+        UtilParameters.__init__(self)
         self.curve = curve
         self.pairs = {}
         self.param = [0, 0, 0, 0]
@@ -1012,40 +1444,60 @@ class VoltWatt(EutParameters, UtilParameters, DataLogging, ImbalanceComponent):
         # self.set_imbalance_config()
 
     def set_params(self):
+        # P2 is the lesser of 0.2 Prated and Pmin
+        p2 = 0.2 * self.p_rated
+        if self.p_min is not None:
+            p2 = min(p2, self.p_min)
         self.param[1] = {
             'V1': round(1.06 * self.v_nom, 2),
             'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
+            'P1': round(self.p_rated, 2),
+            'P2': round(p2, 2)
         }
         self.param[2] = {
             'V1': round(1.05 * self.v_nom, 2),
             'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
+            'P1': round(self.p_rated, 2),
+            'P2': round(p2, 2)
         }
         self.param[3] = {
             'V1': round(1.09 * self.v_nom, 2),
             'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
+            'P1': round(self.p_rated, 2),
+            'P2': round(p2, 2)
         }
 
-class ConstantPowerFactor(EutParameters, UtilParameters, ImbalanceComponent):
+    def curve_points(self):
+        # the output is the lesser of the available power (pwr) and the volt-watt curve
+        param = self.param[self.curve]
+        p_avl = param['P1'] * self.pwr
+        if p_avl <= param['P2']:
+            return [param['V1']], [p_avl]
+        v_avl = param['V1'] + (param['P1'] - p_avl) / (param['P1'] - param['P2']) * (param['V2'] - param['V1'])
+        return [v_avl, param['V2']], [p_avl, param['P2']]
+
+class ConstantPowerFactor(EutParameters, UtilParameters, ImbalanceComponent, ResponseEnvelope):
+    """
+    param curve: choose power factor setting [1-4] 1 is default
+    """
     def __init__(self, ts, curve=1):
         EutParameters.__init__(self, ts)
+        UtilParameters.__init__(self)
         self.curve = curve
         self.pairs = {}
-        self.param = [0, 0, 0, 0]
+        self.param = [0, 0, 0, 0, 0]
         self.target_dict = []
-        self.script_name = VW
-        self.script_complete_name = 'Volt-Watt'
-        self.rslt_sum_col_name = 'P_TR_ACC_REQ, TR_REQ, P_FINAL_ACC_REQ, V_MEAS, P_MEAS, P_TARGET, P_TARGET_MIN,' \
-                                 'P_TARGET_MAX, STEP, FILENAME\n'
+        self.script_name = CPF
+        self.script_complete_name = 'Constant Power Factor'
+        self.rslt_sum_col_name = 'Q_TR_ACC_REQ, TR_REQ, Q_FINAL_ACC_REQ, P_MEAS, Q_MEAS, Q_TARGET, Q_TARGET_MIN,' \
+                                 'Q_TARGET_MAX, STEP, FILENAME\n'
         self.criteria_mode = [True, True, True]
         # Values to be recorded
-        self.meas_values = ['V', 'P']
+        self.meas_values = ['V', 'P', 'Q']
         # Values defined as target/step values which will be controlled as step
-        self.x_criteria = ['V']
+        self.x_criteria = ['P']
         # Values defined as values which will be controlled as step
-        self.y_criteria = ['P']
+        self.y_criteria = ['Q']
         self._config()
 
     def _config(self):
@@ -1054,40 +1506,42 @@ class ConstantPowerFactor(EutParameters, UtilParameters, ImbalanceComponent):
         # self.set_imbalance_config()
 
     def set_params(self):
-        self.param[1] = {
-            'V1': round(1.06 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
-        }
-        self.param[2] = {
-            'V1': round(1.05 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
-        }
-        self.param[3] = {
-            'V1': round(1.09 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
-        }
-
-class ConstantReactivePower(EutParameters, UtilParameters, ImbalanceComponent):
+        # minimum and mid power factor settings, injecting (overexcited) and absorbing (underexcited) reactive power
+        self.param[1] = {'PF': 0.90, 'excitation': 'inj'}
+        self.param[2] = {'PF': 0.95, 'excitation': 'inj'}
+        self.param[3] = {'PF': 0.90, 'excitation': 'abs'}
+        self.param[4] = {'PF': 0.95, 'excitation': 'abs'}
+
+    def curve_points(self):
+        param = self.param[self.curve]
+        q_ratio = math.tan(math.acos(param['PF']))
+        if param['excitation'] == 'abs':
+            q_ratio = -q_ratio
+        x = [-self.s_rated, self.s_rated]
+        return x, [q_ratio * p for p in x]
+
+class ConstantReactivePower(EutParameters, UtilParameters, ImbalanceComponent, ResponseEnvelope):
+    """
+    param curve: choose reactive power setting [1-4] 1 is default
+    """
     def __init__(self, ts, curve=1):
         EutParameters.__init__(self, ts)
+        UtilParameters.__init__(self)
         self.curve = curve
         self.pairs = {}
-        self.param = [0, 0, 0, 0]
+        self.param = [0, 0, 0, 0, 0]
         self.target_dict = []
-        self.script_name = VW
-        self.script_complete_name = 'Volt-Watt'
-        self.rslt_sum_col_name = 'P_TR_ACC_REQ, TR_REQ, P_FINAL_ACC_REQ, V_MEAS, P_MEAS, P_TARGET, P_TARGET_MIN,' \
-                                 'P_TARGET_MAX, STEP, FILENAME\n'
+        self.script_name = CRP
+        self.script_complete_name = 'Constant Reactive Power'
+        self.rslt_sum_col_name = 'Q_TR_ACC_REQ, TR_REQ, Q_FINAL_ACC_REQ, V_MEAS, Q_MEAS, Q_TARGET, Q_TARGET_MIN,' \
+                                 'Q_TARGET_MAX, STEP, FILENAME\n'
         self.criteria_mode = [True, True, True]
         # Values to be recorded
-        self.meas_values = ['V', 'P']
+        self.meas_values = ['V', 'P', 'Q']
         # Values defined as target/step values which will be controlled as step
         self.x_criteria = ['V']
         # Values defined as values which will be controlled as step
-        self.y_criteria = ['P']
+        self.y_criteria = ['Q']
         self._config()
 
     def _config(self):
@@ -1096,35 +1550,32 @@ class ConstantReactivePower(EutParameters, UtilParameters, ImbalanceComponent):
         # self.set_imbalance_config()
 
     def set_params(self):
-        self.param[1] = {
-            'V1': round(1.06 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
-        }
-        self.param[2] = {
-            'V1': round(1.05 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
-        }
-        self.param[3] = {
-            'V1': round(1.09 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
-        }
+        var_rated = self.var_rated
+        if var_rated is None:
+            var_rated = 0.44 * self.s_rated
+        # maximum and half of maximum reactive power, injecting and absorbing
+        self.param[1] = {'Q': round(var_rated, 2)}
+        self.param[2] = {'Q': round(-var_rated, 2)}
+        self.param[3] = {'Q': round(0.5 * var_rated, 2)}
+        self.param[4] = {'Q': round(-0.5 * var_rated, 2)}
+
+    def curve_points(self):
+        return [self.v_nom], [self.param[self.curve]['Q']]
 
 """
 This section is for 
 """
 
-class FrequencyWatt(EutParameters, UtilParameters):
+class FrequencyWatt(EutParameters, UtilParameters, ResponseEnvelope):
     def __init__(self, ts, curve=1):
         EutParameters.__init__(self, ts)
+        UtilParameters.__init__(self)
         self.curve = curve
         self.pairs = {}
         self.param = [0, 0, 0, 0]
         self.target_dict = []
-        self.script_name = VW
-        self.script_complete_name = 'Volt-Watt'
+        self.script_name = FW
+        self.script_complete_name = 'Frequency-Watt'
         self.rslt_sum_col_name = 'P_TR_ACC_REQ, TR_REQ, P_FINAL_ACC_REQ, F_MEAS, P_MEAS, P_TARGET, P_TARGET_MIN,' \
                                  'P_TARGET_MAX, STEP, FILENAME\n'
         self.criteria_mode = [True, True, True]
@@ -1159,6 +1610,17 @@ class FrequencyWatt(EutParameters, UtilParameters):
             'f_small': p_small * self.f_nom * 0.02
         }
 
+    def curve_points(self):
+        # P changes by p_rated/(f_nom*k) per Hz outside of the deadband, from the pre-disturbance power (pwr) up to
+        # p_rated for underfrequency and down to p_min for overfrequency
+        param = self.param[self.curve]
+        p_pre = self.pwr * self.p_rated
+        p_min = self.p_min if self.p_min is not None else 0.
+        f_k = param['kof'] * self.f_nom / self.p_rated
+        x = [self.f_nom - param['dbf'] - f_k * (self.p_rated - p_pre), self.f_nom - param['dbf'],
+             self.f_nom + param['dbf'], self.f_nom + param['dbf'] + f_k * (p_pre - p_min)]
+        return x, [self.p_rated, p_pre, p_pre, p_min]
+
 class Interoperability(EutParameters, UtilParameters):
     def __init__(self, ts, curve=1):
         EutParameters.__init__(self, ts)
@@ -1201,24 +1663,25 @@ class Interoperability(EutParameters, UtilParameters):
             'P1': round(self.p_rated, 2)
         }
 
-class WattVar(EutParameters, UtilParameters):
+class WattVar(EutParameters, UtilParameters, ResponseEnvelope):
     def __init__(self, ts, curve=1):
         EutParameters.__init__(self, ts)
+        UtilParameters.__init__(self)
         self.curve = curve
         self.pairs = {}
         self.param = [0, 0, 0, 0]
         self.target_dict = []
-        self.script_name = VW
-        self.script_complete_name = 'Volt-Watt'
-        self.rslt_sum_col_name = 'P_TR_ACC_REQ, TR_REQ, P_FINAL_ACC_REQ, V_MEAS, P_MEAS, P_TARGET, P_TARGET_MIN,' \
-                                 'P_TARGET_MAX, STEP, FILENAME\n'
+        self.script_name = WV
+        self.script_complete_name = 'Watt-Var'
+        self.rslt_sum_col_name = 'Q_TR_ACC_REQ, TR_REQ, Q_FINAL_ACC_REQ, P_MEAS, Q_MEAS, Q_TARGET, Q_TARGET_MIN,' \
+                                 'Q_TARGET_MAX, STEP, FILENAME\n'
         self.criteria_mode = [True, True, True]
         # Values to be recorded
-        self.meas_values = ['V', 'P']
+        self.meas_values = ['P', 'Q']
         # Values defined as target/step values which will be controlled as step
-        self.x_criteria = ['V']
+        self.x_criteria = ['P']
         # Values defined as values which will be controlled as step
-        self.y_criteria = ['P']
+        self.y_criteria = ['Q']
         self._config()
 
     def _config(self):
@@ -1227,22 +1690,21 @@ class WattVar(EutParameters, UtilParameters):
         # self.set_imbalance_config()
 
     def set_params(self):
+        # default watt-var characteristic (IEEE 1547-2018 Table 9, category B)
+        p_min = self.p_min if self.p_min is not None else 0.
         self.param[1] = {
-            'V1': round(1.06 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
-        }
-        self.param[2] = {
-            'V1': round(1.05 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
-        }
-        self.param[3] = {
-            'V1': round(1.09 * self.v_nom, 2),
-            'V2': round(1.10 * self.v_nom, 2),
-            'P1': round(self.p_rated, 2)
+            'P1': round(max(0.2 * self.p_rated, p_min), 2),
+            'P2': round(0.5 * self.p_rated, 2),
+            'P3': round(self.p_rated, 2),
+            'Q1': 0.,
+            'Q2': 0.,
+            'Q3': round(-0.44 * self.s_rated, 2)
         }
 
+    def curve_points(self):
+        param = self.param[self.curve]
+        return [param['P1'], param['P2'], param['P3']], [param['Q1'], param['Q2'], param['Q3']]
+
 
 """
 This section is for Ride-Through test
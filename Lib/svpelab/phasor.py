@@ -0,0 +1,294 @@
+"""
+Copyright (c) 2017, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Questions can be directed to support@sunspec.org
+"""
+
+
+import cmath
+import functools
+import math
+
+import numpy as np
+
+'''
+Phasor and symmetrical components estimation for three-phase waveforms.
+
+The fundamental phasor of each channel is estimated over windows of a whole number of nominal cycles with a least
+squares fit of a sinusoid at the nominal frequency, which is the full-cycle DFT when a cycle is a whole number of
+samples and avoids the leakage of a rounded DFT window otherwise (166.67 samples/cycle at 10 kS/s). The samples are
+demodulated by the nominal frequency once and the window sums are taken from cumulative sums, so per-cycle windows and
+sliding windows with any step cost O(N) per channel and all channels are processed as one 2-D array. Phasor magnitudes are RMS values and angles are referenced to the first
+sample of the record (or of the stream), so they are stable from window to window at the nominal frequency.
+
+Sequence components follow the Fortescue transform for ABC phase sequence:
+
+    V0 = (Va + Vb + Vc)/3
+    V1 = (Va + a*Vb + a^2*Vc)/3
+    V2 = (Va + a^2*Vb + a*Vc)/3      a = 1 /120 deg
+
+Post-processing:
+
+    r = phasor.sequence_analysis(wf, channels=['AC_V_1', 'AC_V_2', 'AC_V_3'])
+    r['positive'], r['negative'], r['unbalance']
+
+Streaming on DAS waveform blocks:
+
+    est = phasor.PhasorEstimator(fs, channels=3)
+    for block in blocks:                    # block shape (3, n), contiguous samples
+        index, ph = est.update(block)
+        zero, positive, negative = phasor.sequence_components(ph)
+'''
+
+F_NOM = 60.
+A = cmath.exp(2j*math.pi/3)
+SEQUENCE_MATRIX = np.array([[1, 1, 1], [1, A, A*A], [1, A*A, A]])/3.
+
+
+class PhasorError(Exception):
+    """
+    Exception to wrap all phasor generated exceptions.
+    """
+    pass
+
+
+def window_size(fs, f_nom=F_NOM, cycles=1):
+    """
+    Return the number of samples in a window of cycles nominal cycles.
+    """
+    n = int(round(cycles*fs/float(f_nom)))
+    if n < 2:
+        raise PhasorError('Phasor window of %s cycles is too short at %s samples/second' % (cycles, fs))
+    return n
+
+
+@functools.lru_cache(maxsize=32)
+def _demodulation_period(fs, f_nom):
+    """
+    Return the number of samples after which the demodulation sequence repeats exactly, or None.
+    """
+    ratio = fs/float(f_nom)
+    for cycles in range(1, 101):
+        samples = ratio*cycles
+        if abs(samples - round(samples)) < 1e-9:
+            return int(round(samples))
+    return None
+
+
+def _demodulation(offset, count, fs, f_nom):
+    """
+    Return exp(-j*w*m) for the absolute sample indexes m = offset ... offset + count - 1.
+    """
+    period = _demodulation_period(fs, f_nom)
+    m = np.arange(offset, offset + count)
+    if period is not None:
+        # keep the phase argument small for long streams
+        m = m % period
+    return np.exp(-2j*math.pi*f_nom/fs*m)
+
+
+def _window_phasors(x, starts, n, offset, fs, f_nom):
+    """
+    Least squares fit of a*cos(w*m) + b*sin(w*m) to the windows x[:, start:start + n] from the cumulative sums of the
+    demodulated samples and of exp(2j*w*m).
+    """
+    z = _demodulation(offset, x.shape[1], fs, f_nom)
+    cs_x = np.zeros((x.shape[0], x.shape[1] + 1), dtype=complex)
+    np.cumsum(x*z, axis=1, out=cs_x[:, 1:])
+    cs_z = np.zeros(x.shape[1] + 1, dtype=complex)
+    np.cumsum(np.conj(z*z), out=cs_z[1:])
+    stops = starts + n
+    sxz = cs_x[:, stops] - cs_x[:, starts]      # sum(x*cos) - j*sum(x*sin)
+    sz = cs_z[stops] - cs_z[starts]             # sum(cos(2wm)) + j*sum(sin(2wm))
+    scc = (n + sz.real)/2.
+    sss = (n - sz.real)/2.
+    scs = sz.imag/2.
+    sxc = sxz.real
+    sxs = -sxz.imag
+    det = scc*sss - scs*scs
+    a = (sxc*sss - sxs*scs)/det
+    b = (sxs*scc - sxc*scs)/det
+    # x = A*cos(w*m + phi) = A*cos(phi)*cos(w*m) - A*sin(phi)*sin(w*m)
+    return (a - 1j*b)/math.sqrt(2.)
+
+
+def phasors(data, fs, f_nom=F_NOM, cycles=1, step=None):
+    """
+    Estimate the fundamental phasors of one or more channels.
+
+    :param data: samples, 1-D array or 2-D array with one row per channel
+    :param fs: sampling frequency (Hz)
+    :param f_nom: nominal frequency (Hz)
+    :param cycles: window length in nominal cycles
+    :param step: samples between window starts, defaults to the window length (per-cycle phasors), 1 for a phasor per
+                 sample
+    :return: (index, phasors) with the index of the last sample of each window and the complex RMS phasors, shape
+             (windows,) for 1-D data or (channels, windows)
+    """
+    x = np.asarray(data, dtype=np.float64)
+    single = x.ndim == 1
+    x = np.atleast_2d(x)
+    n = window_size(fs, f_nom, cycles)
+    if step is None:
+        step = n
+    if step < 1:
+        raise PhasorError('Invalid phasor window step: %s' % step)
+    starts = np.arange(0, x.shape[1] - n + 1, int(step))
+    ph = _window_phasors(x, starts, n, 0, float(fs), float(f_nom))
+    if single:
+        ph = ph[0]
+    return starts + n - 1, ph
+
+
+def sequence_components(ph):
+    """
+    Return the (zero, positive, negative) sequence phasors of the three phase phasors ph, shape (3,) or (3, windows).
+    """
+    ph = np.asarray(ph)
+    if ph.shape[0] != 3:
+        raise PhasorError('Sequence components require three phases, got %d' % ph.shape[0])
+    seq = np.tensordot(SEQUENCE_MATRIX, ph, axes=1)
+    return seq[0], seq[1], seq[2]
+
+
+def sequence_from_polar(mag, ang):
+    """
+    Return the (zero, positive, negative) sequence phasors of three phase magnitudes and angles in degrees.
+    """
+    mag = np.asarray(mag, dtype=np.float64)
+    ang = np.radians(np.asarray(ang, dtype=np.float64))
+    return sequence_components(mag*np.exp(1j*ang))
+
+
+def _channel_data(obj, channels):
+    """
+    Return (time, data) from a Waveform (channels/channel_data) or Dataset (points/data) object.
+    """
+    if hasattr(obj, 'channel_data'):
+        names = obj.channels
+        values = obj.channel_data
+    else:
+        names = obj.points
+        values = obj.data
+    time = None
+    for c in ('TIME', 'Time'):
+        if c in names:
+            time = np.asarray(values[names.index(c)], dtype=np.float64)
+            break
+    data = []
+    for c in channels:
+        if c not in names:
+            raise PhasorError('Channel not found: %s' % c)
+        data.append(np.asarray(values[names.index(c)], dtype=np.float64))
+    return time, np.array(data)
+
+
+def sequence_analysis(obj, channels, fs=None, f_nom=F_NOM, cycles=1, step=None):
+    """
+    Per-phase phasors and sequence components of three channels of a Waveform or Dataset.
+
+    :param obj: Waveform or Dataset
+    :param channels: the three phase channel names in ABC order, e.g. ['AC_V_1', 'AC_V_2', 'AC_V_3']
+    :param fs: sampling frequency (Hz), defaults to the sample_rate of obj or the time channel sample spacing
+    :param f_nom: nominal frequency (Hz)
+    :param cycles: window length in nominal cycles
+    :param step: samples between window starts, defaults to the window length
+    :return: dict with 'time' (time of the last sample of each window, None without a time channel), 'index', 'mag'
+             and 'ang' (degrees) arrays with one row per phase, 'zero', 'positive', 'negative' magnitudes and
+             'positive_ang', 'unbalance' (negative/positive) arrays
+    """
+    if len(channels) != 3:
+        raise PhasorError('Sequence analysis requires three channels')
+    time, data = _channel_data(obj, channels)
+    if fs is None:
+        fs = getattr(obj, 'sample_rate', None)
+    if not fs:
+        if time is None or len(time) < 2 or time[-1] == time[0]:
+            raise PhasorError('Unable to determine the sampling frequency')
+        fs = (len(time) - 1)/(time[-1] - time[0])
+    index, ph = phasors(data, fs, f_nom=f_nom, cycles=cycles, step=step)
+    zero, positive, negative = sequence_components(ph)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unbalance = np.abs(negative)/np.abs(positive)
+    return {'time': time[index] if time is not None else None,
+            'index': index,
+            'mag': np.abs(ph),
+            'ang': np.degrees(np.angle(ph)),
+            'zero': np.abs(zero),
+            'positive': np.abs(positive),
+            'negative': np.abs(negative),
+            'positive_ang': np.degrees(np.angle(positive)),
+            'unbalance': unbalance}
+
+
+class PhasorEstimator(object):
+    """
+    Streaming phasor estimation for contiguous blocks of samples. The samples of a window spanning a block boundary
+    are carried to the next block, phasor angles are referenced to the first sample of the stream.
+    """
+
+    def __init__(self, fs, f_nom=F_NOM, cycles=1, step=None, channels=3):
+        self.fs = float(fs)
+        self.f_nom = float(f_nom)
+        self.channels = channels
+        self.n = window_size(self.fs, self.f_nom, cycles)
+        self.step = self.n if step is None else int(step)
+        if self.step < 1:
+            raise PhasorError('Invalid phasor window step: %s' % step)
+        self.reset()
+
+    def reset(self):
+        self.samples = 0            # samples received
+        self._next = 0              # absolute index of the next window start
+        self._buf = np.zeros((self.channels, 0))
+        self._buf_start = 0         # absolute index of the first buffered sample
+
+    def update(self, block):
+        """
+        Process the next block of samples.
+
+        :param block: 1-D array for a single channel or 2-D array with one row per channel
+        :return: (index, phasors) with the absolute index of the last sample of each completed window and the complex
+                 RMS phasors (channels, windows)
+        """
+        x = np.atleast_2d(np.asarray(block, dtype=np.float64))
+        if x.shape[0] != self.channels:
+            raise PhasorError('Expected %d channels, got %d' % (self.channels, x.shape[0]))
+        buf = np.concatenate((self._buf, x), axis=1)
+        self.samples += x.shape[1]
+        end = self._buf_start + buf.shape[1]
+        starts = np.arange(self._next, end - self.n + 1, self.step)
+        ph = _window_phasors(buf, starts - self._buf_start, self.n, self._buf_start, self.fs, self.f_nom)
+        if len(starts) > 0:
+            self._next = starts[-1] + self.step
+        # keep the samples from the start of the next window
+        keep = min(self._next, end)
+        self._buf = buf[:, keep - self._buf_start:]
+        self._buf_start = keep
+        return starts + self.n - 1, ph
@@ -0,0 +1,482 @@
+"""
+Copyright (c) 2017, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Questions can be directed to support@sunspec.org
+"""
+
+import ast
+import glob
+import importlib
+import json
+import os
+import sys
+
+'''
+Lazy plugin registry for the abstraction layer modules (das, gridsim, der, pvsim, ...).
+
+Each abstraction module finds its implementations by scanning the files named <prefix>_*.py in this directory for a
+<prefix>_info() function returning a dict with the mode name. Rather than importing every implementation to call
+<prefix>_info(), the registry reads the mode from the module source (the <prefix>_info() return value or the module
+level dict it returns) without executing it. Implementation modules are imported only when they are used, so unused
+drivers and their dependencies (vendor SDKs, DAQ libraries, ...) are never loaded and a driver with a missing
+dependency only fails if it is selected.
+
+The modes found are kept in a manifest file in the __pycache__ directory, keyed by file name, modification time and
+size, so the module sources are only parsed again when they change. If the mode can not be determined from the
+source, the module is imported and <prefix>_info() is called as before. Modules that fail to import at that point
+are skipped and recorded in the registry errors dict. Requesting a mode that is not found while modules whose mode is
+unknown have failed raises the registry error with those modules, and a mode whose module fails to import raises the
+import error when it is used.
+
+    das_modules = plugins.ModuleRegistry(__name__, 'das')
+
+    das_modules.scan(DASError)
+    m = das_modules.get('Manual')    # imports das_manual
+
+The parameter declarations of each implementation (the info.param_group(), info.param() and info.param_add_value()
+calls made by its params() function) are recorded once into a schema stored in the manifest and replayed into the
+script info when the parameter tree is built, so building the tree does not import the implementation modules either.
+The schema is recorded with a placeholder group name that is replaced with the group name on replay. It is recorded
+again when the implementation file or one of the package modules it imports changes. Implementations whose params()
+use anything other than those calls, or pass values that can not be stored as JSON, are not cached and their params()
+is called directly.
+
+    das_modules.params(info, group_name='das')
+'''
+
+MANIFEST_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '__pycache__')
+MANIFEST_FILE = 'plugin_manifest.json'
+MANIFEST_VERSION = 1
+
+SCHEMA_GROUP_NAME = '__svp_group__'
+SCHEMA_METHODS = ('param_group', 'param', 'param_add_value')
+
+
+def manifest_path():
+    return os.path.join(MANIFEST_DIR, MANIFEST_FILE)
+
+
+def manifest_load():
+    try:
+        with open(manifest_path(), 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest.get('files', {})
+    except (IOError, OSError, ValueError):
+        pass
+    return {}
+
+
+def manifest_update(entries):
+    """
+    Merge the entries into the manifest file. The manifest is a cache, failures to write it are ignored.
+    """
+    try:
+        files = manifest_load()
+        files.update(entries)
+        if not os.path.isdir(MANIFEST_DIR):
+            os.makedirs(MANIFEST_DIR)
+        path = manifest_path()
+        tmp = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': files}, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except (IOError, OSError):
+        pass
+
+
+def file_key(filename):
+    st = os.stat(filename)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _literal(node, assigns):
+    """
+    Return the literal value of an AST node, resolving module level names from assigns.
+    """
+    if isinstance(node, ast.Name) and node.id in assigns:
+        node = assigns[node.id]
+    if isinstance(node, ast.Dict):
+        d = {}
+        for k, v in zip(node.keys, node.values):
+            if isinstance(k, ast.Constant) and isinstance(v, ast.Constant):
+                d[k.value] = v.value
+        return d
+    if isinstance(node, ast.Constant):
+        return node.value
+
+
+def source_info(filename, info_func):
+    """
+    Return (found, mode) for the module source. found is False if the module does not define info_func, mode is
+    None if the mode can not be determined without importing the module.
+    """
+    with open(filename, 'rb') as f:
+        tree = ast.parse(f.read(), filename)
+    assigns = {}
+    func = None
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    assigns[target.id] = node.value
+        elif isinstance(node, ast.FunctionDef) and node.name == info_func:
+            func = node
+    if func is None:
+        return False, None
+    for node in ast.walk(func):
+        if isinstance(node, ast.Return) and node.value is not None:
+            info = _literal(node.value, assigns)
+            if isinstance(info, dict) and isinstance(info.get('mode'), str):
+                return True, info.get('mode')
+    return True, None
+
+
+def source_imports(filename):
+    """
+    Return the files of the package modules imported by the module source (from . import x, from .x import y).
+    """
+    with open(filename, 'rb') as f:
+        tree = ast.parse(f.read(), filename)
+    path = os.path.dirname(filename)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.level == 1:
+            if node.module:
+                names.add(node.module.split('.')[0])
+            else:
+                names.update(alias.name for alias in node.names)
+    files = []
+    for name in sorted(names):
+        f = os.path.join(path, name + '.py')
+        if os.path.exists(f):
+            files.append(f)
+    return files
+
+
+class SchemaError(Exception):
+    pass
+
+
+class SchemaRecorder(object):
+    """
+    Stand-in for the script info object that records the parameter declarations made by a params() function.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def _record(self, method, args, kwargs):
+        self.calls.append([method, list(args), dict(kwargs)])
+
+    def param_group(self, *args, **kwargs):
+        self._record('param_group', args, kwargs)
+
+    def param(self, *args, **kwargs):
+        self._record('param', args, kwargs)
+
+    def param_add_value(self, *args, **kwargs):
+        self._record('param_add_value', args, kwargs)
+
+    def __getattr__(self, name):
+        raise SchemaError('Unsupported info attribute: %s' % name)
+
+    def schema(self):
+        """
+        Return the recorded calls as JSON compatible data, raises SchemaError if a value does not survive the JSON
+        round trip unchanged (tuples, objects, ...).
+        """
+        try:
+            schema = json.loads(json.dumps(self.calls))
+        except (TypeError, ValueError) as e:
+            raise SchemaError(str(e))
+        if schema != self.calls:
+            raise SchemaError('Parameter declarations are not JSON compatible')
+        return schema
+
+
+def _schema_value(value, group_name):
+    if isinstance(value, str):
+        return value.replace(SCHEMA_GROUP_NAME, group_name)
+    if isinstance(value, list):
+        return [_schema_value(v, group_name) for v in value]
+    if isinstance(value, dict):
+        return dict((k, _schema_value(v, group_name)) for k, v in value.items())
+    return value
+
+
+def schema_replay(schema, info, group_name):
+    """
+    Replay the recorded parameter declarations into info for group_name.
+    """
+    for method, args, kwargs in schema:
+        getattr(info, method)(*_schema_value(args, group_name), **_schema_value(kwargs, group_name))
+
+
+class ModuleRegistry(object):
+    """
+    Dictionary-like map of mode name to implementation module. Values are imported on first access.
+    """
+
+    def __init__(self, name, prefix, info_func=None):
+        """
+        :param name: __name__ of the abstraction module, used to determine the package
+        :param prefix: implementation file prefix ('das' for das_*.py)
+        :param info_func: name of the info function, defaults to <prefix>_info
+        """
+        self.package_name = '.'.join(name.split('.')[:-1])
+        self.prefix = prefix
+        self.info_func = info_func
+        if self.info_func is None:
+            self.info_func = prefix + '_info'
+        self.error = Exception
+        self.errors = {}             # module name: error for modules that could not be scanned
+        self._modules = {}           # mode: module or module name
+        self._files = {}             # mode: implementation file
+        self._schemas = {}           # mode: parameter schema loaded during this session
+
+    def _module_name(self, filename):
+        module_name = os.path.splitext(os.path.basename(filename))[0]
+        if self.package_name:
+            module_name = self.package_name + '.' + module_name
+        return module_name
+
+    def _import(self, module_name):
+        try:
+            return importlib.import_module(module_name)
+        except Exception as e:
+            if module_name in sys.modules:
+                del sys.modules[module_name]
+            raise self.error('Error importing module %s: %s' % (module_name, str(e)))
+
+    def scan(self, error=None, path=None):
+        """
+        Find the implementation modules.
+
+        :param error: exception class raised for scan and import errors
+        :param path: directory to scan, defaults to this package directory
+        """
+        if error is not None:
+            self.error = error
+        if path is None:
+            path = os.path.dirname(os.path.realpath(__file__))
+        manifest = manifest_load()
+        updates = {}
+        for f in sorted(glob.glob(os.path.join(path, '%s_*.py' % self.prefix))):
+            module_name = None
+            try:
+                module_name = self._module_name(f)
+                key = file_key(f)
+                entry = manifest.get(f)
+                if entry is None or entry.get('key') != key or entry.get('info_func') != self.info_func:
+                    found, mode = source_info(f, self.info_func)
+                    if found and mode is None:
+                        # mode not determined from the source, import the module to get it
+                        try:
+                            m = self._import(module_name)
+                            mode = getattr(m, self.info_func)().get('mode')
+                        except Exception as e:
+                            self._skip(module_name, e)
+                            continue
+                        if mode is not None:
+                            self._modules[mode] = m
+                    entry = {'key': key, 'info_func': self.info_func, 'found': found, 'mode': mode}
+                    updates[f] = entry
+                mode = entry.get('mode')
+                if entry.get('found') and mode is not None and mode not in self._modules:
+                    self._modules[mode] = module_name
+                if mode is not None and mode not in self._files:
+                    self._files[mode] = f
+            except self.error:
+                raise
+            except Exception as e:
+                raise self.error('Error scanning module %s: %s' % (module_name, str(e)))
+        if updates:
+            manifest_update(updates)
+
+    def _skip(self, module_name, e):
+        self.errors[module_name] = str(e)
+
+    def module(self, mode):
+        m = self._modules[mode]
+        if isinstance(m, str):
+            m = self._import(m)
+            self._modules[mode] = m
+        return m
+
+    def get(self, mode, default=None):
+        if mode in self._modules:
+            return self.module(mode)
+        if mode is not None:
+            # the mode may belong to a module that failed before its mode was known
+            known = set(self.module_names().values())
+            failed = ['%s: %s' % (m, e) for m, e in self.errors.items() if m not in known]
+            if failed:
+                raise self.error('%s mode %s not found, modules that failed to load: %s' %
+                                 (self.prefix, mode, '; '.join(failed)))
+        return default
+
+    def imported(self, mode):
+        """
+        Return True if the module for mode has been imported.
+        """
+        return not isinstance(self._modules.get(mode), str)
+
+    def __getitem__(self, mode):
+        return self.module(mode)
+
+    def __setitem__(self, mode, module):
+        self._modules[mode] = module
+
+    def __delitem__(self, mode):
+        del self._modules[mode]
+
+    def __contains__(self, mode):
+        return mode in self._modules
+
+    def __iter__(self):
+        return iter(list(self._modules.keys()))
+
+    def __len__(self):
+        return len(self._modules)
+
+    def keys(self):
+        return list(self._modules.keys())
+
+    def values(self):
+        return [self.module(mode) for mode in self.keys()]
+
+    def items(self):
+        return [(mode, self.module(mode)) for mode in self.keys()]
+
+    def _schema(self, mode, manifest, updates):
+        """
+        Return the parameter schema for mode from the manifest, recording it if it is missing or out of date. Returns
+        None if the params() function of the module can not be recorded.
+        """
+        f = self._files.get(mode)
+        if f is None:
+            return None
+        entry = manifest.get(f)
+        key = file_key(f)
+        if entry is not None and entry.get('key') == key and 'params' in entry:
+            deps = entry.get('params_deps', {})
+            try:
+                if all(file_key(d) == k for d, k in deps.items()):
+                    return entry['params']
+            except (IOError, OSError):
+                pass
+        if entry is None or entry.get('key') != key:
+            return None
+        recorder = SchemaRecorder()
+        try:
+            self.module(mode).params(recorder, group_name=SCHEMA_GROUP_NAME)
+            schema = recorder.schema()
+        except SchemaError:
+            schema = None
+        deps = dict((d, file_key(d)) for d in source_imports(f))
+        entry = dict(entry)
+        entry['params'] = schema
+        entry['params_deps'] = deps
+        updates[f] = entry
+        return schema
+
+    def params(self, info, group_name=None):
+        """
+        Add the parameters of all the implementation modules to info, replaying the cached parameter schemas where
+        possible. Modules that fail to import are skipped and recorded in the registry errors dict.
+
+        :param info: script info object
+        :param group_name: group name of the abstraction layer parameters
+        """
+        manifest = manifest_load()
+        updates = {}
+        for mode in self.keys():
+            schema = self._schemas.get(mode)
+            try:
+                if schema is None and group_name is not None:
+                    schema = self._schema(mode, manifest, updates)
+                if schema is not None:
+                    self._schemas[mode] = schema
+                    schema_replay(schema, info, group_name)
+                else:
+                    self.module(mode).params(info, group_name=group_name)
+            except self.error as e:
+                self._skip(self.module_names()[mode], e)
+        if updates:
+            manifest_update(updates)
+
+    def module_names(self):
+        """
+        Return dict of mode: module name without importing the modules.
+        """
+        names = {}
+        for mode, m in self._modules.items():
+            if not isinstance(m, str):
+                m = m.__name__
+            names[mode] = m
+        return names
+
+
+if __name__ == "__main__":
+
+    # startup benchmark: scan all abstraction layer prefixes with an empty manifest, with the manifest and by
+    # importing every module as the original scan functions did
+    import time
+
+    prefixes = ['battsim', 'das', 'dcsim', 'der', 'der1547', 'genset', 'gridsim', 'hil', 'loadsim', 'pvsim',
+                'switch', 'wavegen']
+    path = os.path.dirname(os.path.realpath(__file__))
+    sys.path.insert(0, os.path.dirname(path))
+    package = os.path.basename(path)
+
+    if os.path.exists(manifest_path()):
+        os.remove(manifest_path())
+    for label in ('source scan (no manifest)', 'manifest'):
+        start = time.time()
+        count = 0
+        for prefix in prefixes:
+            r = ModuleRegistry(package + '.x', prefix)
+            r.scan()
+            count += len(r)
+        print('%-30s %4d modes %8.3f sec' % (label, count, time.time() - start))
+
+    start = time.time()
+    count = 0
+    failed = 0
+    for prefix in prefixes:
+        for f in glob.glob(os.path.join(path, '%s_*.py' % prefix)):
+            try:
+                m = importlib.import_module(package + '.' + os.path.splitext(os.path.basename(f))[0])
+                if hasattr(m, prefix + '_info'):
+                    count += 1
+            except Exception:
+                failed += 1
+    print('%-30s %4d modes %8.3f sec (%d modules failed to import)' % ('import all', count, time.time() - start,
+                                                                        failed))
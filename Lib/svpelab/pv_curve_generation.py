@@ -30,6 +30,7 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 Questions can be directed to support@sunspec.org
 """
 
+import functools
 import math
 import numpy as np
 
@@ -45,10 +46,98 @@ import numpy as np
 # beta: temperature coefficient of the voltage;
 # CR, CV, CG: technology depending correction factor
 
+G_STC = 1000.
+T_STC = 25.
+CURVE_CACHE_SIZE = 256
+
+TECHNOLOGIES = {
+    'cSi': {
+        'FFU': 0.8,
+        'FFI': 0.9,
+        'CG': 2.514E-03,  # W/m2
+        'CV': 8.593E-02,
+        'CR': 1.088E-04,  # m2/W
+        'vL2H': 0.95,  # ratio from VMPP at an irradiance of 200 W/m2 to VMPP at an irradiance of 1000 W/m2
+        'alpha': 0.0004,  # 1/K (converted from %/K)
+        'beta': -0.004  # 1/K (converted from %/K)
+    },
+    'thin film': {
+        'FFU': 0.72,
+        'FFI': 0.8,
+        'CG': 1.252E-03,  # W/m2
+        'CV': 8.419E-02,
+        'CR': 1.476E-04,  # m2/W
+        'vL2H': 0.98,  # ratio from VMPP at an irradiance of 200 W/m2 to VMPP at an irradiance of 1000 W/m2
+        'alpha': 0.0002,  # 1/K (converted from %/K)
+        'beta': -0.002  # 1/K (converted from %/K)
+    }
+}
+
+
 class PVCurveError(Exception):
     pass
 
 
+def _technology(tech):
+    try:
+        return TECHNOLOGIES[tech]
+    except KeyError:
+        raise PVCurveError('Incorrect PV Module Technology')
+
+
+def curve_family(tech='cSi', Pmpp=3000, Vmpp=460, G=G_STC, Tpv=T_STC, n_points=1000, v_max=600.):
+    """
+    Calculate the EN 50530 I-V curves for sequences of irradiance and PV temperature values, e.g. the operating
+    points of an irradiance/temperature profile, in one pass.
+
+    :param tech: type of module technology - crystalline silicon or thin film
+    :param Pmpp: power at the maximum power point (W), at STC
+    :param Vmpp: voltage at the maximum power point (V), at STC
+    :param G: irradiance (W/m2), scalar or sequence
+    :param Tpv: PV temperature (deg C), scalar or sequence broadcast with G
+    :param n_points: number of (I, V) points in each curve
+    :param v_max: maximum voltage of the I-V curve points
+    :return: dictionary with 'v' (n_points) array, 'i' and 'p' (curves, n_points) arrays and 'isc' and 'voc'
+             (curves) arrays, curves with no irradiance have zero current
+    """
+    t = _technology(tech)
+    G, Tpv = np.broadcast_arrays(np.atleast_1d(np.asarray(G, dtype=float)),
+                                 np.atleast_1d(np.asarray(Tpv, dtype=float)))
+    Voc_stc = Vmpp/t['FFU']
+    Isc_stc = (Pmpp/Vmpp)/t['FFI']
+    CAQ = (t['FFU']-1)/(math.log(1-t['FFI']))
+
+    v = np.linspace(0, v_max, n_points)
+    lit = G > 0
+    g = np.where(lit, G, 1.)
+    Io = Isc_stc*((1 - t['FFI'])**(1/(1-t['FFU'])))*(g/G_STC)  # Irradiance dependent current
+    Isc = Isc_stc*(g/G_STC)*(1 + t['alpha']*(Tpv-T_STC))
+    Voc = Voc_stc*(1 + t['beta']*(Tpv-T_STC))*(np.log((g/t['CG']) + 1.)*t['CV'] - t['CR']*g)
+
+    with np.errstate(over='ignore'):
+        i = Isc[:, np.newaxis] - Io[:, np.newaxis]*np.expm1(v/(Voc*CAQ)[:, np.newaxis])
+    i = np.maximum(i, 0.)  # disallow negative current points
+    i[~lit] = 0.
+    Isc = np.where(lit, Isc, 0.)
+    Voc = np.where(lit, Voc, 0.)
+    return {'v': v, 'i': i, 'p': v*i, 'isc': Isc, 'voc': Voc}
+
+
+@functools.lru_cache(maxsize=CURVE_CACHE_SIZE)
+def en50530_curve(tech='cSi', Pmpp=3000, Vmpp=460, G=G_STC, Tpv=T_STC, n_points=1000, v_max=600.):
+    """
+    Calculate the EN 50530 I-V curve for an operating point. Curves are cached, so repeated operating points are not
+    recalculated, and the returned arrays are read-only.
+
+    :return: (v, i, p, isc, voc) with read-only v, i and p arrays
+    """
+    family = curve_family(tech=tech, Pmpp=Pmpp, Vmpp=Vmpp, G=G, Tpv=Tpv, n_points=n_points, v_max=v_max)
+    v, i, p = family['v'], family['i'][0], family['p'][0]
+    for a in (v, i, p):
+        a.setflags(write=False)
+    return v, i, p, float(family['isc'][0]), float(family['voc'][0])
+
+
 class PVCurve(object):
 
     def __init__(self, tech='cSi', Pmpp=3000, Vmpp=460, Tpv=25, n_points=1000, v_max=600.):
@@ -60,40 +149,32 @@ class PVCurve(object):
         :param Tpv: PV temperature (deg C)
         :param n_points: number of (I, V) points in the curve
         :param v_max: maximum voltage of the I-V curve points
-        :return: dictionary with i and v lists
+        :return: dictionary with i and v arrays
         """
 
-        if tech == 'cSi':
-            self.FFU = 0.8
-            self.FFI = 0.9
-            self.CG = 2.514E-03  # W/m2
-            self.CV = 8.593E-02
-            self.CR = 1.088E-04  # m2/W
-            self.vL2H = 0.95  # ratio from VMPP at an irradiance of 200 W/m2 to VMPP at an irradiance of 1000 W/m2
-            self.alpha = 0.0004  # 1/K (converted from %/K)
-            self.beta = -0.004  # 1/K (converted from %/K)
-        elif tech == 'thin film':
-            self.FFU = 0.72
-            self.FFI = 0.8
-            self.CG = 1.252E-03  # W/m2
-            self.CV = 8.419E-02
-            self.CR = 1.476E-04  # m2/W
-            self.vL2H = 0.98  # ratio from VMPP at an irradiance of 200 W/m2 to VMPP at an irradiance of 1000 W/m2
-            self.alpha = 0.0002  # 1/K (converted from %/K)
-            self.beta = -0.002  # 1/K (converted from %/K)
-        else:
-            raise PVCurveError('Incorrect PV Module Technology')
-
-        self.G = 1000.  # initial irradiance.
-        self.Gstc = 1000.
+        t = _technology(tech)
+        self.tech = tech
+        self.FFU = t['FFU']
+        self.FFI = t['FFI']
+        self.CG = t['CG']
+        self.CV = t['CV']
+        self.CR = t['CR']
+        self.vL2H = t['vL2H']
+        self.alpha = t['alpha']
+        self.beta = t['beta']
+
+        self.G = G_STC  # initial irradiance.
+        self.Gstc = G_STC
 
         # Temperature of the PV (dynamic)
         # Tpv = Tamb + T0 + (k*G)/(1 + tau*s)
 
         self.Tpv = Tpv
-        self.Tstc = 25.
+        self.Tstc = T_STC
 
         # STC values
+        self.Pmpp = Pmpp
+        self.Vmpp = Vmpp
         self.Voc_stc = Vmpp/self.FFU
         self.Impp_stc = Pmpp/Vmpp
         self.Isc_stc = self.Impp_stc/self.FFI
@@ -101,9 +182,11 @@ class PVCurve(object):
         # Calculate CAQ constant
         self.CAQ = (self.FFU-1)/(math.log(1-self.FFI))
 
-        self.v_points = list(np.linspace(0, v_max, n_points))
-        self.i_points = []
-        self.p_points = []
+        self.n_points = n_points
+        self.v_max = v_max
+        self.v_points = np.linspace(0, v_max, n_points)
+        self.i_points = np.zeros(n_points)
+        self.p_points = np.zeros(n_points)
         self.Io = 0.
         self.Isc = 0.
         self.Voc = 0.
@@ -115,22 +198,27 @@ class PVCurve(object):
         calculates new I-V curve based on updates to self.G and self.Tpv
         """
         self.Io = self.Isc_stc*((1 - self.FFI)**(1/(1-self.FFU)))*(self.G/self.Gstc)  # Irradiance dependent current
-        self.Isc = self.Isc_stc*(self.G/self.Gstc)*(1 + self.alpha*(self.Tpv-self.Tstc))
-        self.Voc = self.Voc_stc*(1 + self.beta*(self.Tpv-self.Tstc)) * \
-                   (math.log((self.G/self.CG) + 1.)*self.CV - self.CR*self.G)
-
-        # Generate I-V curve points
-        self.i_points = []
-        self.p_points = []
-        for v in self.v_points:
-            current_pt = self.Isc - self.Io*(math.exp(v/(self.Voc*self.CAQ))-1.)
-            i_pt = max(current_pt, 0.)  # disallow negative current points
-            self.i_points.append(i_pt)
-            self.p_points.append(v*i_pt)
+        self.v_points, self.i_points, self.p_points, self.Isc, self.Voc = \
+            en50530_curve(self.tech, self.Pmpp, self.Vmpp, float(self.G), float(self.Tpv), self.n_points, self.v_max)
 
         # create curve dict
         self.curve = {'v': self.v_points, 'i': self.i_points, 'p': self.p_points}
 
+    def calc_curves(self, irradiance=None, temperature=None):
+        """
+        Calculate the I-V curves for an irradiance/temperature profile without changing the current curve.
+
+        :param irradiance: irradiance values (W/m2), defaults to the current irradiance
+        :param temperature: PV temperature values (deg C), defaults to the current temperature
+        :return: curve_family() dictionary
+        """
+        if irradiance is None:
+            irradiance = self.G
+        if temperature is None:
+            temperature = self.Tpv
+        return curve_family(tech=self.tech, Pmpp=self.Pmpp, Vmpp=self.Vmpp, G=irradiance, Tpv=temperature,
+                            n_points=self.n_points, v_max=self.v_max)
+
     def get_voc(self):
         return self.Voc
 
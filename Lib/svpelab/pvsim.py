@@ -32,10 +32,9 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
-pvsim_modules = {}
+pvsim_modules = plugins.ModuleRegistry(__name__, 'pvsim')
 
 def params(info, id=None, label='PV Simulator', group_name=None, active=None, active_value=None):
     if group_name is None:
@@ -47,8 +46,7 @@ def params(info, id=None, label='PV Simulator', group_name=None, active=None, ac
     name = lambda name: group_name + '.' + name
     info.param_group(group_name, label='%s Parameters' % label, active=active, active_value=active_value, glob=True)
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
-    for mode, m in pvsim_modules.items():
-        m.params(info, group_name=group_name)
+    pvsim_modules.params(info, group_name=group_name)
 
 PVSIM_DEFAULT_ID = 'pvsim'
 
@@ -162,29 +160,8 @@ class PVSim(object):
 
 def pvsim_scan():
     global pvsim_modules
-    # scan all files in current directory that match gridsim_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'pvsim_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'pvsim_info'):
-                info = m.pvsim_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    pvsim_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise PVSimError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match pvsim_*.py, modules are imported when first used
+    pvsim_modules.scan(PVSimError)
 
 # scan for gridsim modules on import
 pvsim_scan()
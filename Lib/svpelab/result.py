@@ -426,6 +426,24 @@ class ResultWorkbook(object):
 
         return index_row
 
+    def _chart_point_names(self, params):
+        try:
+            from . import envelope
+        except ImportError:
+            return []
+        return envelope.chart_point_names(params)
+
+    def add_chart_envelope(self, title, params, columns):
+        """
+        Add a hidden worksheet with the min/max envelope of the chart columns of a long capture, see
+        envelope.add_envelope_worksheet().
+        """
+        try:
+            from . import envelope
+        except ImportError:
+            return None
+        return envelope.add_envelope_worksheet(self.wb, title, params, columns)
+
     def add_csv_file(self, filename, title, relative_value_names=None, params=None, index_row=None):
         print('add_csv_file: %s' % (title))
         col_width = []
@@ -439,6 +457,7 @@ class ResultWorkbook(object):
         f = None
         relative_value_index = []
         relative_value_start = []
+        chart_columns = {}
         if relative_value_names is None:
             relative_value_names = []
         if params is None:
@@ -477,6 +496,9 @@ class ResultWorkbook(object):
                 # find fields to be treated as relative value
                 if line == 1:
                     params['plot.point_names'] = row
+                    if params.get('plot.title') is not None:
+                        chart_points = self._chart_point_names(params)
+                        chart_columns = dict((i, []) for i in range(len(row)) if row[i] in chart_points)
                     for i in range(len(row)):
                         width = len(row[i]) + 4
                         if width < XL_COL_WIDTH_DEFAULT:
@@ -497,6 +519,9 @@ class ResultWorkbook(object):
                 else:
                     for index in relative_value_index:
                         row[index] = row[index] - relative_value_start[index]
+                if line > 1:
+                    for i, values in chart_columns.items():
+                        values.append(row[i] if i < len(row) else '')
                 ws.write_row(line - 1, 0, row)
                 line += 1
             params['plot.point_value_count'] = line - 1
@@ -508,7 +533,15 @@ class ResultWorkbook(object):
 
             print('params - plot: %s - %s' % (params, params.get('plot.title')))
             if params is not None and params.get('plot.title') is not None:
-                index_row = self.add_chart(ws, params=params, index_row=index_row)
+                # long captures are charted from a hidden sheet holding their min/max envelope
+                ws_env = self.add_chart_envelope(title, params, chart_columns)
+                if ws_env is not None:
+                    ws_chart, count = ws_env
+                    chart_params = dict(params)
+                    chart_params['plot.point_value_count'] = count
+                    index_row = self.add_chart(ws_chart, params=chart_params, index_row=index_row)
+                else:
+                    index_row = self.add_chart(ws, params=params, index_row=index_row)
 
         except Exception as e:
             print('add_csv_file error: %s' % (str(e)))
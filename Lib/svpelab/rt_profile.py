@@ -63,6 +63,9 @@ Create voltage ride-through profile based on UL 1741 SA ride-through test step f
    t_r - rise time
    t_d - dwell time
    n - number of iterations
+
+The profiles are lists of (time offset, % nominal voltage, % nominal frequency) points that can be compiled to
+setpoint tables with grid_profiles.compile_profile().
 '''
 
 def voltage_rt_profile(v_n, v_t, t_f, t_h, t_r, t_d, n):
@@ -101,9 +104,6 @@ def freq_rt_profile(p_n, p_t, t_f, t_h, t_r, t_d, n):
 
     return profile
 
-print(voltage_rt_profile(100, 80, 2, 5, 2, 5, 1))
-print(freq_rt_profile(100, 80, 2, 5, 2, 5, 3))
-
 '''
 Each region shall have the applicable ride-through magnitudes and durations verified.
 In the case of Rule 21 L/HVRT, four ride-through magnitudes will be verified: the upper bound of HV1,
@@ -155,3 +155,14 @@ stop das
 save das
 
 '''
+
+if __name__ == "__main__":
+
+    try:
+        from svpelab import grid_profiles
+    except ImportError:
+        import grid_profiles
+
+    print(voltage_rt_profile(100, 80, 2, 5, 2, 5, 1))
+    print(freq_rt_profile(100, 80, 2, 5, 2, 5, 3))
+    print(grid_profiles.compile_profile(voltage_rt_profile(100, 80, 2, 5, 2, 5, 1), v_nom=240., f_nom=60.).segments())
@@ -0,0 +1,729 @@
+"""
+Copyright (c) 2017, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Questions can be directed to support@sunspec.org
+"""
+
+
+import queue
+import socket
+import threading
+import time
+
+'''
+SCPI transport
+
+Shared command/query transport for the SCPI instruments connected over TCP/IP or serial ports. The transport keeps the
+connection open between commands (it is opened on first use and reopened on the next command after an error), reads
+responses through a byte buffer split on the read terminator instead of building the response one character at a
+time, and can disable the Nagle algorithm so short commands are not held back waiting for the acknowledgement of the
+previous one.
+
+    conn = scpi.TcpTransport('192.168.1.10', 5025)
+    conn.write('inst:coup all;:volt 120.0')
+    idn = conn.query('*IDN?')
+
+Several queries can be pipelined in one round trip: query_many() joins them into one compound program message and
+splits the response message on the ';' separators (quoted strings are kept intact); query_lines() sends each query as
+its own program message in a single write and reads one response per query, for instruments that do not accept
+compound queries.
+
+    v1, v2, v3 = conn.query_many(['meas:volt? 1', 'meas:volt? 2', 'meas:volt? 3'])
+
+Commands that already end with the write terminator are sent as is, so driver command strings such as '*CLS\n' can be
+passed through unchanged. Responses are returned without the terminator.
+
+Commands are usually followed by a SYSTem:ERRor? query. A transaction defers the checks to the end of a block of
+commands:
+
+    with conn.transaction() as t:
+        t.write('volt 120.0')
+        t.write('freq 60.0')
+
+In the default CHECK_PIPELINE mode the error query is sent behind each command without waiting for the response and
+the responses are read at the end of the block (or when TRANSACTION_WINDOW checks are outstanding), so each error is
+attributed to the command that caused it at the cost of one round trip per block. In CHECK_ESR mode the commands are
+sent without checks and the block ends with an *ESR? query, the error queue is only read if the standard event status
+register reports an error, so the error cannot be attributed to a single command. Errors raise ScpiCommandError with
+the list of (command, error) pairs. Queries within the block read the outstanding checks first. CHECK_PIPELINE relies
+on the instrument queueing the responses of consecutive queries, as raw socket and serial ports do; use CHECK_ESR for
+instruments reporting Query INTERRUPTED when a new message arrives before the response is read.
+
+Running the module compares the buffered and pipelined queries with the per-character reader against a local
+FakeInstrument with a simulated instrument turnaround time.
+'''
+
+SCPI_TERMINATOR = '\n'
+SCPI_SEPARATOR = ';'
+SCPI_BUFFER_SIZE = 4096
+SCPI_ENCODING = 'latin-1'
+SCPI_TIMEOUT = 5
+SCPI_ERROR_QUERY = 'SYSTem:ERRor?'
+SCPI_ESR_ERRORS = 0x3C          # query, device dependent, execution and command error bits of *ESR?
+
+CHECK_PIPELINE = 'pipeline'
+CHECK_ESR = 'esr'
+TRANSACTION_WINDOW = 32         # maximum outstanding error checks in CHECK_PIPELINE mode
+
+
+class ScpiError(Exception):
+    """
+    Exception to wrap all SCPI transport generated exceptions.
+    """
+    pass
+
+
+class ScpiCommandError(ScpiError):
+    """
+    Instrument error queue entries reported for commands. errors is a list of (command, error), command is None if
+    the error could not be attributed to a command.
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        ScpiError.__init__(self, '; '.join(['%s (%s)' % (err, cmd.strip()) if cmd is not None else err
+                                            for cmd, err in errors]))
+
+
+def no_error(resp):
+    """
+    Return True if the error query response is the no error entry (0 or +0).
+    """
+    resp = resp.strip()
+    return len(resp) == 0 or resp[0] == '0' or resp.startswith('+0')
+
+
+def split_response(resp, separator=SCPI_SEPARATOR):
+    """
+    Split a response message into the responses of a compound query. Separators inside quoted strings are ignored.
+
+    :param resp: response message
+    :param separator: response message unit separator
+    :return: list of response strings
+    """
+    if '"' not in resp and "'" not in resp:
+        return [r.strip() for r in resp.split(separator)]
+    units = []
+    start = 0
+    quote = None
+    for i, c in enumerate(resp):
+        if quote is not None:
+            if c == quote:
+                quote = None
+        elif c == '"' or c == "'":
+            quote = c
+        elif c == separator:
+            units.append(resp[start:i].strip())
+            start = i + 1
+    units.append(resp[start:].strip())
+    return units
+
+
+class Transport(object):
+    """
+    Buffered SCPI transport base class. Implementations provide _open(), _close(), _send() and _recv().
+
+    :param write_term: terminator appended to commands that do not already end with it
+    :param read_term: response terminator
+    :param timeout: read timeout in seconds
+    :param encoding: character encoding of the commands and responses
+    :param buffer_size: receive size
+    """
+
+    def __init__(self, write_term=SCPI_TERMINATOR, read_term=SCPI_TERMINATOR, timeout=SCPI_TIMEOUT,
+                 encoding=SCPI_ENCODING, buffer_size=SCPI_BUFFER_SIZE):
+        self.write_term = write_term
+        self.read_term = read_term.encode(encoding)
+        self.timeout = timeout
+        self.encoding = encoding
+        self.buffer_size = buffer_size
+        self.conn = None
+        self._buf = bytearray()
+        self.replies_pending = 0    # replies to pipelined error checks not read yet, input is not flushed meanwhile
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open(self):
+        raise NotImplementedError()
+
+    def _close(self):
+        raise NotImplementedError()
+
+    def _send(self, data):
+        raise NotImplementedError()
+
+    def _recv(self):
+        """
+        Return the available received bytes, waiting up to the timeout for at least one.
+        """
+        raise NotImplementedError()
+
+    def is_open(self):
+        return self.conn is not None
+
+    def open(self):
+        """
+        Open the connection if it is not already open.
+        """
+        if self.conn is None:
+            try:
+                self._open()
+            except ScpiError:
+                self.conn = None
+                raise
+            except Exception as e:
+                self.conn = None
+                raise ScpiError('Unable to open connection: %s' % str(e))
+
+    def close(self):
+        """
+        Close the connection and discard any buffered response data.
+        """
+        self._buf = bytearray()
+        self.replies_pending = 0
+        if self.conn is not None:
+            try:
+                self._close()
+            except Exception:
+                pass
+            finally:
+                self.conn = None
+
+    def _encode(self, cmd_str):
+        if not isinstance(cmd_str, bytes):
+            if self.write_term and not cmd_str.endswith(self.write_term):
+                cmd_str += self.write_term
+            cmd_str = cmd_str.encode(self.encoding)
+        return cmd_str
+
+    def write_raw(self, data):
+        """
+        Send data as is, opening the connection if needed. The connection is closed on errors so the next command
+        reconnects.
+        """
+        self.open()
+        try:
+            self._send(data)
+        except Exception as e:
+            self.close()
+            raise ScpiError('Write error: %s' % str(e))
+
+    def write(self, cmd_str):
+        """
+        Send a program message.
+
+        :param cmd_str: command string, the write terminator is appended if missing
+        """
+        self.write_raw(self._encode(cmd_str))
+
+    def read_line(self):
+        """
+        Read one response message.
+
+        :return: response without the terminator
+        """
+        term = self.read_term
+        start = 0
+        while True:
+            index = self._buf.find(term, start)
+            if index >= 0:
+                line = bytes(self._buf[:index])
+                del self._buf[:index + len(term)]
+                return line.decode(self.encoding).rstrip('\r\n')
+            start = max(len(self._buf) - len(term) + 1, 0)
+            if self.conn is None:
+                raise ScpiError('Connection not open')
+            try:
+                data = self._recv()
+            except Exception as e:
+                self.close()
+                raise ScpiError('Timeout waiting for response: %s' % str(e))
+            if not data:
+                self.close()
+                raise ScpiError('Timeout waiting for response')
+            self._buf += data
+
+    def query(self, cmd_str):
+        """
+        Send a query and read the response.
+
+        :param cmd_str: query string
+        :return: response without the terminator
+        """
+        self.write(cmd_str)
+        return self.read_line()
+
+    def query_many(self, queries, separator=SCPI_SEPARATOR):
+        """
+        Send several queries as one compound program message and split the response message.
+
+        Each query starts from the root of the command tree (the queries are joined with ';:').
+
+        :param queries: list of query strings, each returning one response
+        :param separator: response message unit separator
+        :return: list of responses, one per query
+        """
+        queries = [q.strip().rstrip(self.write_term or SCPI_TERMINATOR).lstrip(':') for q in queries]
+        if not queries:
+            return []
+        resp = split_response(self.query(';:'.join(queries)), separator=separator)
+        if len(resp) != len(queries):
+            raise ScpiError('Expected %d responses, received %d: %s' % (len(queries), len(resp),
+                                                                        separator.join(resp)))
+        return resp
+
+    def transaction(self, mode=CHECK_PIPELINE, error_query=SCPI_ERROR_QUERY, window=TRANSACTION_WINDOW):
+        """
+        Create a transaction deferring the error checks of the commands written in a block to the end of the block.
+
+        :param mode: CHECK_PIPELINE (error query pipelined behind each command) or CHECK_ESR (*ESR? at the end)
+        :param error_query: error queue query
+        :param window: maximum outstanding error checks in CHECK_PIPELINE mode
+        :return: Transaction context manager
+        """
+        return Transaction(self, mode=mode, error_query=error_query, window=window)
+
+    def query_lines(self, queries):
+        """
+        Send several queries as separate program messages in one write and read one response message per query.
+
+        :param queries: list of query strings
+        :return: list of responses, one per query
+        """
+        if not queries:
+            return []
+        self.write_raw(b''.join([self._encode(q) for q in queries]))
+        return [self.read_line() for q in queries]
+
+
+class Transaction(object):
+    """
+    Deferred error checking for a block of commands, see Transport.transaction().
+    """
+
+    def __init__(self, transport, mode=CHECK_PIPELINE, error_query=SCPI_ERROR_QUERY, window=TRANSACTION_WINDOW):
+        if mode not in (CHECK_PIPELINE, CHECK_ESR):
+            raise ScpiError('Unknown error check mode: %s' % mode)
+        self.transport = transport
+        self.mode = mode
+        self.error_query = error_query
+        self.window = window
+        self.commands = []      # commands sent in the block
+        self.pending = []       # commands with outstanding error checks
+        self.errors = []        # (command, error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.check()
+        else:
+            # keep the responses aligned with the queries after a failure in the block
+            try:
+                self.collect()
+            except Exception:
+                self.transport.close()
+
+    def write(self, cmd_str):
+        """
+        Send a command, the error check is deferred.
+        """
+        t = self.transport
+        self.commands.append(cmd_str)
+        if self.mode == CHECK_PIPELINE:
+            t.write_raw(t._encode(cmd_str) + t._encode(self.error_query))
+            self.pending.append(cmd_str)
+            t.replies_pending += 1
+            if len(self.pending) >= self.window:
+                self.collect()
+        else:
+            t.write(cmd_str)
+
+    def collect(self):
+        """
+        Read the outstanding error checks.
+        """
+        pending = self.pending
+        self.pending = []
+        for cmd_str in pending:
+            resp = self.transport.read_line()
+            self.transport.replies_pending = max(self.transport.replies_pending - 1, 0)
+            if not no_error(resp):
+                self.errors.append((cmd_str, resp.strip()))
+
+    def query(self, cmd_str):
+        """
+        Send a query after reading the outstanding error checks.
+        """
+        self.collect()
+        return self.transport.query(cmd_str)
+
+    def query_many(self, queries, separator=SCPI_SEPARATOR):
+        """
+        Send several queries as one compound program message after reading the outstanding error checks, see
+        Transport.query_many().
+        """
+        self.collect()
+        return self.transport.query_many(queries, separator=separator)
+
+    def check(self):
+        """
+        Complete the error checks of the commands sent so far and raise ScpiCommandError if there were errors.
+        """
+        self.collect()
+        if self.mode == CHECK_ESR and self.commands:
+            esr = int(float(self.transport.query('*ESR?')))
+            if esr & SCPI_ESR_ERRORS:
+                block = ', '.join([c.strip() for c in self.commands])
+                # drain the error queue, bounded in case the instrument does not report the no error entry
+                for i in range(TRANSACTION_WINDOW):
+                    resp = self.transport.query(self.error_query)
+                    if no_error(resp):
+                        break
+                    self.errors.append((None, '%s (in %s)' % (resp.strip(), block)))
+                if not self.errors:
+                    self.errors.append((None, 'Standard event status %d (in %s)' % (esr, block)))
+        self.commands = []
+        if self.errors:
+            errors = self.errors
+            self.errors = []
+            raise ScpiCommandError(errors)
+
+
+class TcpTransport(Transport):
+    """
+    SCPI transport over a TCP/IP socket (raw socket/telnet style instrument ports).
+
+    :param ipaddr: instrument IP address
+    :param ipport: instrument port
+    :param nodelay: disable the Nagle algorithm
+    """
+
+    def __init__(self, ipaddr, ipport, nodelay=True, **kwargs):
+        Transport.__init__(self, **kwargs)
+        self.ipaddr = ipaddr
+        self.ipport = int(ipport)
+        self.nodelay = nodelay
+
+    def _open(self):
+        self.conn = socket.create_connection((self.ipaddr, self.ipport), timeout=self.timeout)
+        if self.nodelay:
+            self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _close(self):
+        self.conn.close()
+
+    def _send(self, data):
+        self.conn.sendall(data)
+
+    def _recv(self):
+        return self.conn.recv(self.buffer_size)
+
+
+class SerialTransport(Transport):
+    """
+    SCPI transport over a serial port (requires pyserial).
+
+    :param port: serial port name, e.g. 'com1' or '/dev/ttyUSB0', or pyserial URL, e.g. 'socket://host:port'
+    :param baudrate: baud rate
+    :param write_timeout: write timeout in seconds
+    :param flush_input: discard stale input before each program message, except while the replies to pipelined error
+                        checks of a transaction are pending
+    """
+
+    def __init__(self, port, baudrate=115200, write_timeout=2, flush_input=True, **kwargs):
+        Transport.__init__(self, **kwargs)
+        self.port = port
+        self.baudrate = baudrate
+        self.write_timeout = write_timeout
+        self.flush_input = flush_input
+
+    def _open(self):
+        import serial
+        self.conn = serial.serial_for_url(self.port, baudrate=self.baudrate, bytesize=8, stopbits=1, xonxoff=0,
+                                          timeout=self.timeout, write_timeout=self.write_timeout)
+
+    def _close(self):
+        self.conn.close()
+
+    def _send(self, data):
+        if self.flush_input and not self.replies_pending:
+            self._buf = bytearray()
+            self.conn.reset_input_buffer()
+        self.conn.write(data)
+
+    def _recv(self):
+        return self.conn.read(max(self.conn.in_waiting, 1))
+
+
+class FakeInstrument(object):
+    """
+    Local TCP SCPI instrument for driver development and benchmarking. Each program message is answered after the
+    turnaround time and the responses are delivered after the latency (simulated network round trip), queries return
+    the configured response (or '0'). Commands with a header in errors add the error
+    to the error queue read by SYSTem:ERRor? and set the execution error bit of *ESR?.
+
+    :param responses: dictionary of query header (upper case, without '?'): response
+    :param errors: dictionary of command header (upper case): error queue entry, e.g. '-222,"Data out of range"'
+    :param turnaround: simulated instrument processing time per program message in seconds
+    :param latency: simulated network round trip time in seconds
+    """
+
+    def __init__(self, responses=None, errors=None, turnaround=0.0005, latency=0.002, ipaddr='127.0.0.1', ipport=0,
+                 read_term=SCPI_TERMINATOR, write_term=SCPI_TERMINATOR):
+        self.responses = responses or {}
+        self.errors = errors or {}
+        self.error_queue = []
+        self.esr = 0
+        self.turnaround = turnaround
+        self.latency = latency
+        self.read_term = read_term
+        self.write_term = write_term
+        self.messages = 0
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((ipaddr, ipport))
+        self.server.listen(5)
+        self.ipaddr, self.ipport = self.server.getsockname()
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        try:
+            self.server.close()
+        except Exception:
+            pass
+
+    def response(self, unit):
+        """
+        Process a program message unit, return the response for queries and None for commands.
+        """
+        unit = unit.strip()
+        if not unit:
+            return None
+        header = unit.split(None, 1)[0].lstrip(':').upper()
+        if not header.endswith('?'):
+            if header in self.errors:
+                self.error_queue.append(self.errors[header])
+                self.esr |= 0x10
+            return None
+        if header in ('SYST:ERR?', 'SYSTEM:ERROR?'):
+            if self.error_queue:
+                return self.error_queue.pop(0)
+            return '0,"No error"'
+        if header == '*ESR?':
+            esr = self.esr
+            self.esr = 0
+            return str(esr)
+        return self.responses.get(header.rstrip('?'), '0')
+
+    def _serve(self):
+        while True:
+            try:
+                conn, addr = self.server.accept()
+            except Exception:
+                break
+            t = threading.Thread(target=self._client, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def _client(self, conn):
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        term = self.read_term.encode(SCPI_ENCODING)
+        buf = bytearray()
+        out = queue.Queue()
+        sender = threading.Thread(target=self._sender, args=(conn, out))
+        sender.daemon = True
+        sender.start()
+        try:
+            while True:
+                data = conn.recv(SCPI_BUFFER_SIZE)
+                if not data:
+                    break
+                buf += data
+                while term in buf:
+                    index = buf.find(term)
+                    msg = bytes(buf[:index]).decode(SCPI_ENCODING).strip()
+                    del buf[:index + len(term)]
+                    self.messages += 1
+                    if self.turnaround:
+                        time.sleep(self.turnaround)
+                    resp = [r for r in [self.response(u) for u in msg.split(';')] if r is not None]
+                    if resp:
+                        out.put((time.time() + self.latency,
+                                 (SCPI_SEPARATOR.join(resp) + self.write_term).encode(SCPI_ENCODING)))
+        except Exception:
+            pass
+        finally:
+            out.put(None)
+
+    def _sender(self, conn, out):
+        try:
+            while True:
+                item = out.get()
+                if item is None:
+                    break
+                due, data = item
+                delay = due - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                conn.sendall(data)
+        except Exception:
+            pass
+        finally:
+            conn.close()
+
+
+def _legacy_query(conn, cmd_str, buffer_size=1024):
+    """
+    Per-character response reader used by the drivers before the shared transport, for the benchmark.
+    """
+    conn.send(cmd_str.encode(SCPI_ENCODING))
+    resp = ''
+    more_data = True
+    while more_data:
+        data = conn.recv(buffer_size).decode(SCPI_ENCODING)
+        if len(data) > 0:
+            for d in data:
+                resp += d
+                if d == '\n':
+                    more_data = False
+                    break
+    return resp
+
+
+def benchmark(count=200, turnaround=0.0005, latency=0.002):
+    """
+    Compare reading a set of measurements and checking a command for errors with the legacy per-character reader
+    (new socket options as before: Nagle enabled) and the shared transport (single queries, query_lines() and
+    query_many()), and a configuration sequence with per-command and deferred error checks, against a local
+    FakeInstrument.
+
+    :param count: number of measurement sets
+    :param turnaround: simulated instrument processing time per program message in seconds
+    :param latency: simulated network round trip time in seconds
+    :return: list of (description, seconds per measurement set or configuration sequence)
+    """
+    commands = ['INST:NSEL %d;:LIST:VOLT %s' % (p, ','.join(['120.0'] * 50)) for p in (1, 2, 3)] + \
+        ['LIST:DWEL %s' % ','.join(['0.1'] * 50), 'LIST:FREQ %s' % ','.join(['60.0'] * 50)] + \
+        ['INST:NSEL %d;:PHAS %d' % (p, a) for p, a in ((1, 0), (2, 120), (3, 240))] + ['FREQ 60.0', 'VOLT 120.0']
+    queries = ['MEAS:VOLT? %d' % p for p in (1, 2, 3)] + ['MEAS:CURR? %d' % p for p in (1, 2, 3)] + ['MEAS:FREQ?']
+    results = []
+    with FakeInstrument(responses={'MEAS:VOLT': '120.01', 'MEAS:CURR': '10.2', 'MEAS:FREQ': '60.00'},
+                        turnaround=turnaround, latency=latency) as inst:
+        conn = socket.create_connection((inst.ipaddr, inst.ipport), timeout=SCPI_TIMEOUT)
+        start = time.time()
+        for i in range(count):
+            [_legacy_query(conn, q + '\n').strip() for q in queries]
+        results.append(('legacy reader, one query per round trip', (time.time() - start) / count))
+        start = time.time()
+        for i in range(count):
+            conn.send(b'VOLT 120.0\n')
+            _legacy_query(conn, 'SYST:ERR?\n')
+        results.append(('legacy reader, command + error check', (time.time() - start) / count))
+        conn.close()
+
+        with TcpTransport(inst.ipaddr, inst.ipport) as t:
+            start = time.time()
+            for i in range(count):
+                [t.query(q) for q in queries]
+            results.append(('transport, one query per round trip', (time.time() - start) / count))
+            start = time.time()
+            for i in range(count):
+                t.write('VOLT 120.0')
+                t.query('SYST:ERR?')
+            results.append(('transport, command + error check', (time.time() - start) / count))
+            start = time.time()
+            for i in range(count // 10):
+                for c in commands:
+                    t.write(c)
+                    if not no_error(t.query('SYST:ERR?')):
+                        raise ScpiError('Benchmark command error')
+            results.append(('transport, %d commands checked one by one' % len(commands),
+                            (time.time() - start) / (count // 10)))
+            for mode in (CHECK_PIPELINE, CHECK_ESR):
+                start = time.time()
+                for i in range(count // 10):
+                    with t.transaction(mode=mode) as tr:
+                        for c in commands:
+                            tr.write(c)
+                results.append(('transport, %d commands, %s transaction' % (len(commands), mode),
+                                (time.time() - start) / (count // 10)))
+            start = time.time()
+            for i in range(count):
+                t.query_lines(queries)
+            results.append(('transport, query_lines() in one write', (time.time() - start) / count))
+            start = time.time()
+            for i in range(count):
+                t.query_many(queries)
+            results.append(('transport, query_many() in one round trip', (time.time() - start) / count))
+    return results
+
+
+def check_serial_pipeline():
+    """
+    Run a CHECK_PIPELINE transaction through SerialTransport (input flushing enabled, connected to a FakeInstrument
+    with a pyserial socket:// URL) and check that the pipelined error checks are read and the failing command is
+    reported. Requires pyserial.
+    """
+    with FakeInstrument(errors={'PHAS': '-222,"Data out of range"'}, latency=0.) as inst:
+        with SerialTransport('socket://%s:%d' % (inst.ipaddr, inst.ipport), timeout=2) as t:
+            try:
+                with t.transaction(mode=CHECK_PIPELINE) as tr:
+                    for cmd in ('FREQ 60.0', 'PHAS 400', 'VOLT 120.0'):
+                        tr.write(cmd)
+                        time.sleep(.05)     # let the error check reply arrive before the next program message
+                    if tr.query('*IDN?') != '0':
+                        raise ScpiError('Unexpected query response in transaction')
+                    tr.write('VOLT 121.0')
+                raise ScpiError('Transaction error not reported')
+            except ScpiCommandError as e:
+                if [c.strip() for c, err in e.errors] != ['PHAS 400']:
+                    raise ScpiError('Transaction errors not attributed to the failing command: %s' % e)
+            if t.query('*IDN?') != '0':
+                raise ScpiError('Responses out of step after the transaction')
+
+
+if __name__ == "__main__":
+
+    check_serial_pipeline()
+    for desc, t in benchmark():
+        print('%-45s %8.3f ms' % (desc, t * 1000))
@@ -4,6 +4,7 @@ import wxmplot
 import numpy
 import openpyxl
 from . import result as rslt
+from . import envelope
 import csv
 import xlsxwriter
 
@@ -146,6 +147,7 @@ class ResultWorkbook(object):
         f = None
         relative_value_index = []
         relative_value_start = []
+        chart_columns = {}
         if relative_value_names is None:
             relative_value_names = []
         if params is None:
@@ -162,6 +164,9 @@ class ResultWorkbook(object):
                 # find fields to be treated as relative value
                 if line == 1:
                     params['plot.point_names'] = row
+                    if params.get('plot.title') is not None:
+                        chart_points = envelope.chart_point_names(params)
+                        chart_columns = dict((i, []) for i in range(len(row)) if row[i] in chart_points)
                     if relative_value_names is not None:
                         for name in relative_value_names:
                             try:
@@ -177,6 +182,9 @@ class ResultWorkbook(object):
                 else:
                     for index in relative_value_index:
                         row[index] = row[index] - relative_value_start[index]
+                if line > 1:
+                    for i, values in chart_columns.items():
+                        values.append(row[i] if i < len(row) else '')
                 line += 1
                 ws.write_row(line - 1, 0, row)
             params['plot.point_value_count'] = line - 1
@@ -188,7 +196,15 @@ class ResultWorkbook(object):
 
             print('params - plot: %s - %s' % (params, params.get('plot.title')))
             if params is not None and params.get('plot.title') is not None:
-                self.add_chart(ws, params=params)
+                # long captures are charted from a hidden sheet holding their min/max envelope
+                ws_env = envelope.add_envelope_worksheet(self.wb, title, params, chart_columns, first_row=1)
+                if ws_env is not None:
+                    ws_chart, count = ws_env
+                    chart_params = dict(params)
+                    chart_params['plot.point_value_count'] = count
+                    self.add_chart(ws_chart, params=chart_params)
+                else:
+                    self.add_chart(ws, params=params)
 
             '''
             self.add_chart(ws, params={'plot.title': chart_title,
@@ -461,35 +477,18 @@ class ResultMenu(object):
             print('saving')
             result_wb.save(filename=filename)
 
-    def plot_wxmplot(self, arg=None):
-        frame = wxmplot.PlotFrame()
+    def capture_envelope(self):
         filename = os.path.join(self.result_dir, self.result_name, self.result.filename)
-        f = open(filename, 'r')
-        names = f.readline().split(',')
-        columns = len(names)
-        value_arrays = []
-        for i in range(columns):
-            value_arrays.append([])
-
-        base_time = None
-        for line in f:
-            values = line.split(',')
-            if base_time is None:
-                base_time = float(values[0])
-            t = round(float(values[0]) - base_time, 2)
-            value_arrays[0].append(t)
-            for i in range(1, columns):
-                try:
-                    v = float(values[i])
-                    value_arrays[i].append(v)
-                except Exception as e:
-                    value_arrays[i].append(0)
-                    pass
+        return envelope.capture_envelope(filename)
 
-        time_array = numpy.array(value_arrays[0])
-        for i in range(1, columns):
-            value_array = numpy.array(value_arrays[i])
-            frame.oplot(time_array, value_array, label=names[i])
+    def plot_wxmplot(self, arg=None):
+        frame = wxmplot.PlotFrame()
+        # long captures are plotted from their min/max envelope
+        env = self.capture_envelope()
+        base_time = env.time_range()[0] or 0
+        time_array, value_arrays = env.lines(width=envelope.ENVELOPE_WIDTH)
+        for name in env.names:
+            frame.oplot(time_array - base_time, value_arrays[name], label=name)
 
         '''
         r = numpy.recfromcsv(filename, case_sensitive=True)
@@ -510,7 +509,29 @@ class ResultMenu(object):
         frame.Show()
 
     def plot_pyplot(self, arg=None):
-        print('plot_pyplot')
+        import matplotlib.pyplot as plt
+
+        env = self.capture_envelope()
+        base_time = env.time_range()[0] or 0
+        fig, ax = plt.subplots()
+        lines = {}
+        time_array, value_arrays = env.lines(width=envelope.ENVELOPE_WIDTH)
+        for name in env.names:
+            lines[name], = ax.plot(time_array - base_time, value_arrays[name], label=name, linewidth=1)
+
+        # re-query the envelope at the resolution of the visible span when zooming or panning
+        def xlim_changed(ax):
+            t0, t1 = ax.get_xlim()
+            width = int(ax.get_window_extent().width) or envelope.ENVELOPE_WIDTH
+            time_array, value_arrays = env.lines(t0 + base_time, t1 + base_time, width=width)
+            for name, line in lines.items():
+                line.set_data(time_array - base_time, value_arrays[name])
+            ax.figure.canvas.draw_idle()
+
+        ax.callbacks.connect('xlim_changed', xlim_changed)
+        ax.set_title(self.result.name)
+        ax.legend()
+        plt.show()
 
 
 if __name__ == "__main__":
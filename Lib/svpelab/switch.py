@@ -32,14 +32,13 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
 # switch controller
 SWITCH_CLOSED = True
 SWITCH_OPEN = False
 
-switch_modules = {}
+switch_modules = plugins.ModuleRegistry(__name__, 'switch')
 
 
 def params(info, id=None, label='Switch Controller', group_name=None, active=None, active_value=None):
@@ -54,8 +53,7 @@ def params(info, id=None, label='Switch Controller', group_name=None, active=Non
     info.param_group(group_name, label='%s Parameters' % label, active=active, active_value=active_value, glob=True)
     print('name = %s' % name('mode'))
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
-    for mode, m in switch_modules.items():
-        m.params(info, group_name=group_name)
+    switch_modules.params(info, group_name=group_name)
 
 SWITCH_DEFAULT_ID = 'switch'
 
@@ -158,29 +156,8 @@ class Switch(object):
 
 def switch_scan():
     global switch_modules
-    # scan all files in current directory that match switch_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'switch_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'switch_info'):
-                info = m.switch_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    switch_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise SwitchError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match switch_*.py, modules are imported when first used
+    switch_modules.scan(SwitchError)
 
 # scan for switch modules on import
 switch_scan()
@@ -0,0 +1,905 @@
+"""
+Copyright (c) 2017, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Questions can be directed to support@sunspec.org
+"""
+
+
+import asyncio
+import random
+import socket
+import struct
+import threading
+import time
+
+from . import vxi11_defs
+
+'''
+Asynchronous VXI-11 client
+
+asyncio implementation of the VXI-11 (ONC RPC over TCP) client with the same operations as vxi11.Instrument:
+
+    pool = vxi11_async.ConnectionPool()
+    scope = vxi11_async.AsyncInstrument('192.168.0.10', pool=pool)
+    meter = vxi11_async.AsyncInstrument('TCPIP::192.168.0.11::inst0::INSTR', pool=pool)
+    idn = await asyncio.gather(scope.ask('*IDN?'), meter.ask('*IDN?'))
+    await pool.close()
+
+The portmapper results are cached per host, the core and abort channels are kept open in the connection pool and
+shared by the links to the same server (calls on one channel are serialized, calls to different servers run
+concurrently), and device_read transfers are copied into a buffer preallocated for the expected size (read_raw_into()
+fills a caller supplied buffer). The RPC messages are packed with struct, without xdrlib.
+
+Instrument is a synchronous facade with the vxi11.Instrument interface, all facade instruments share a background event
+loop and connection pool:
+
+    inst = vxi11_async.Instrument('192.168.0.10')
+    print(inst.ask('*IDN?'))
+
+StubServer is a local VXI-11 server (portmapper, core and abort channels) answering queries from a dictionary, for
+testing drivers without the instrument. The portmapper listens on an unprivileged port, pass it to the clients with
+pmap_port. Running the module compares sequential and concurrent requests to several stub instruments and a large
+transfer.
+'''
+
+# ONC RPC and portmapper constants
+RPC_VERSION = 2
+RPC_CALL = 0
+RPC_REPLY = 1
+RPC_MSG_ACCEPTED = 0
+RPC_SUCCESS = 0
+RPC_PROC_UNAVAIL = 3
+RPC_LAST_FRAGMENT = 0x80000000
+
+PMAP_PROG = 100000
+PMAP_VERS = 2
+PMAP_PORT = 111
+PMAPPROC_GETPORT = 3
+IPPROTO_TCP = 6
+
+VXI11_TIMEOUT = 30              # I/O timeout in seconds
+VXI11_LOCK_TIMEOUT = 10         # lock timeout in seconds
+VXI11_MAX_RECV_SIZE = 1073741824
+VXI11_MAX_READ_LEN = 128 * 1024 * 1024
+READ_BUFFER_SIZE = 65536        # initial read buffer size when the transfer size is unknown
+
+_UINT = struct.Struct('>I')
+_CALL_HEADER = struct.Struct('>10I')
+_REPLY_HEADER = struct.Struct('>3I')
+_PAD = (b'', b'\0\0\0', b'\0\0', b'\0')
+
+_port_cache = {}
+
+
+def _opaque(data):
+    """
+    Return the XDR variable length opaque encoding of data as a list of chunks.
+    """
+    n = len(data)
+    return [_UINT.pack(n), data, _PAD[n % 4]]
+
+
+def _unpack_opaque(record, offset):
+    """
+    Return (memoryview, next offset) of the XDR variable length opaque at offset.
+    """
+    n = _UINT.unpack_from(record, offset)[0]
+    offset += 4
+    return memoryview(record)[offset:offset + n], offset + n + (-n % 4)
+
+
+async def _read_record(reader):
+    """
+    Read a record marked RPC message, the fragments are joined once.
+    """
+    fragments = []
+    while True:
+        header = _UINT.unpack(await reader.readexactly(4))[0]
+        fragments.append(await reader.readexactly(header & ~RPC_LAST_FRAGMENT))
+        if header & RPC_LAST_FRAGMENT:
+            break
+    if len(fragments) == 1:
+        return fragments[0]
+    return b''.join(fragments)
+
+
+def _write_record(writer, chunks):
+    writer.write(_UINT.pack(RPC_LAST_FRAGMENT | sum([len(c) for c in chunks])))
+    for c in chunks:
+        if len(c):
+            writer.write(c)
+
+
+def _nodelay(writer):
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class RpcChannel(object):
+    """
+    Persistent ONC RPC client connection to one program on a server. Calls are serialized on the channel, the
+    connection is opened on the first call and after errors. generation is incremented on each connection so the
+    links created on a previous connection can be detected.
+    """
+
+    def __init__(self, host, port, prog, vers, timeout=VXI11_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.prog = prog
+        self.vers = vers
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.generation = 0
+        self.xid = random.getrandbits(31)
+        self._lock = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                          self.timeout)
+        _nodelay(self.writer)
+        self.generation += 1
+
+    def close(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+        self.reader = None
+        self.writer = None
+
+    async def call(self, proc, args=(), timeout=None):
+        """
+        Call a procedure.
+
+        :param proc: procedure number
+        :param args: list of the encoded argument chunks
+        :param timeout: reply timeout in seconds, defaults to the channel timeout
+        :return: (reply record, offset of the procedure results)
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                if self.writer is None:
+                    await self.connect()
+                self.xid = (self.xid + 1) & 0xffffffff
+                header = _CALL_HEADER.pack(self.xid, RPC_CALL, RPC_VERSION, self.prog, self.vers, proc, 0, 0, 0, 0)
+                _write_record(self.writer, [header] + list(args))
+                await self.writer.drain()
+                while True:
+                    record = await asyncio.wait_for(_read_record(self.reader), timeout or self.timeout)
+                    xid, offset = self._reply_header(record)
+                    if xid == self.xid:
+                        return record, offset
+                    # reply to an earlier call, discard
+            except vxi11_defs.Vxi11Exception:
+                raise
+            except asyncio.TimeoutError:
+                self.close()
+                raise vxi11_defs.Vxi11Exception(vxi11_defs.ERR_IO_TIMEOUT, 'rpc')
+            except Exception as e:
+                self.close()
+                raise vxi11_defs.Vxi11Exception('RPC error: %s' % str(e), 'rpc')
+
+    def _reply_header(self, record):
+        xid, mtype, stat = _REPLY_HEADER.unpack_from(record, 0)
+        if mtype != RPC_REPLY:
+            raise vxi11_defs.Vxi11Exception('RPC error: no REPLY but %r' % mtype, 'rpc')
+        if stat != RPC_MSG_ACCEPTED:
+            raise vxi11_defs.Vxi11Exception('RPC error: MSG_DENIED', 'rpc')
+        verf, offset = _unpack_opaque(record, 16)
+        stat = _UINT.unpack_from(record, offset)[0]
+        if stat != RPC_SUCCESS:
+            raise vxi11_defs.Vxi11Exception('RPC error: call failed: %r' % stat, 'rpc')
+        return xid, offset + 4
+
+
+async def get_port(host, prog, vers, pmap_port=PMAP_PORT, timeout=VXI11_TIMEOUT):
+    """
+    Return the TCP port of an RPC program from the portmapper of the host, the results are cached.
+    """
+    key = (host, pmap_port, prog, vers)
+    port = _port_cache.get(key)
+    if port is None:
+        channel = RpcChannel(host, pmap_port, PMAP_PROG, PMAP_VERS, timeout=timeout)
+        try:
+            record, offset = await channel.call(PMAPPROC_GETPORT, [struct.pack('>4I', prog, vers, IPPROTO_TCP, 0)])
+        finally:
+            channel.close()
+        port = _UINT.unpack_from(record, offset)[0]
+        if port == 0:
+            raise vxi11_defs.Vxi11Exception('RPC program %d not registered on %s' % (prog, host), 'portmapper')
+        _port_cache[key] = port
+    return port
+
+
+def clear_port_cache(host=None):
+    """
+    Discard the cached portmapper results of a host, or of all hosts.
+    """
+    for key in list(_port_cache.keys()):
+        if host is None or key[0] == host:
+            del _port_cache[key]
+
+
+class ConnectionPool(object):
+    """
+    Persistent core and abort channels, one of each per server, shared by the instruments using the pool. A pool is
+    used from one event loop.
+
+    :param pmap_port: portmapper port
+    :param timeout: connection and RPC timeout in seconds
+    """
+
+    def __init__(self, pmap_port=PMAP_PORT, timeout=VXI11_TIMEOUT):
+        self.pmap_port = pmap_port
+        self.timeout = timeout
+        self.channels = {}
+
+    def _channel(self, host, port, prog, vers):
+        key = (host, port, prog)
+        channel = self.channels.get(key)
+        if channel is None:
+            channel = self.channels[key] = RpcChannel(host, port, prog, vers, timeout=self.timeout)
+        return channel
+
+    async def core(self, host):
+        """
+        Return the core channel of the host.
+        """
+        try:
+            port = await get_port(host, vxi11_defs.DEVICE_CORE_PROG, vxi11_defs.DEVICE_CORE_VERS,
+                                  pmap_port=self.pmap_port, timeout=self.timeout)
+        except vxi11_defs.Vxi11Exception:
+            clear_port_cache(host)
+            raise
+        return self._channel(host, port, vxi11_defs.DEVICE_CORE_PROG, vxi11_defs.DEVICE_CORE_VERS)
+
+    def abort(self, host, port):
+        """
+        Return the abort channel of the host.
+        """
+        return self._channel(host, port, vxi11_defs.DEVICE_ASYNC_PROG, vxi11_defs.DEVICE_ASYNC_VERS)
+
+    async def close(self):
+        for channel in self.channels.values():
+            channel.close()
+        self.channels = {}
+
+
+class AsyncInstrument(object):
+    """
+    VXI-11 instrument client for asyncio.
+
+    :param host: host name or address, or VISA resource string (TCPIP::host::name::INSTR)
+    :param name: device name, defaults to inst0
+    :param client_id: client id, defaults to a random id
+    :param term_char: read termination character
+    :param pool: connection pool, defaults to a pool used by this instrument only
+    :param pmap_port: portmapper port, used when the instrument creates its own pool
+    """
+
+    def __init__(self, host, name=None, client_id=None, term_char=None, pool=None, pmap_port=PMAP_PORT):
+        if host.upper().startswith('TCPIP') and '::' in host:
+            res = vxi11_defs.parse_visa_resource_string(host)
+            if res is None:
+                raise vxi11_defs.Vxi11Exception('Invalid resource string', 'init')
+            host = res['arg1']
+            name = res['arg2']
+        self.host = host
+        self.name = name or 'inst0'
+        self.client_id = client_id if client_id is not None else random.getrandbits(31)
+        self.term_char = term_char
+        self.own_pool = pool is None
+        self.pool = pool if pool is not None else ConnectionPool(pmap_port=pmap_port)
+        self.timeout = VXI11_TIMEOUT
+        self.lock_timeout = VXI11_LOCK_TIMEOUT
+        self.core = None
+        self.generation = None
+        self.link = None
+        self.abort_port = 0
+        self.max_recv_size = 0
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, val):
+        self._timeout = val
+        self._timeout_ms = int(val * 1000)
+
+    @property
+    def lock_timeout(self):
+        return self._lock_timeout
+
+    @lock_timeout.setter
+    def lock_timeout(self, val):
+        self._lock_timeout = val
+        self._lock_timeout_ms = int(val * 1000)
+
+    async def _link(self):
+        """
+        Return the link id, the link is (re)created if it is not open or was created on a closed connection.
+        """
+        if self.link is None or self.core.generation != self.generation or self.core.writer is None:
+            await self.open()
+        return self.link
+
+    async def _call(self, proc, args):
+        return await self.core.call(proc, args, timeout=self._timeout + 1)
+
+    async def _generic(self, proc, op, flags=0):
+        link = await self._link()
+        record, offset = await self._call(proc, [struct.pack('>iiII', link, flags, self._lock_timeout_ms,
+                                                             self._timeout_ms)])
+        error = struct.unpack_from('>i', record, offset)[0]
+        if error:
+            raise vxi11_defs.Vxi11Exception(error, op)
+
+    async def open(self):
+        "Open connection to VXI-11 instrument"
+        self.core = await self.pool.core(self.host)
+        name = self.name.encode('utf-8')
+        args = [struct.pack('>iII', self.client_id, 0, self._lock_timeout_ms)] + _opaque(name)
+        record, offset = await self.core.call(vxi11_defs.CREATE_LINK, args, timeout=self._timeout + 1)
+        error, link, abort_port, max_recv_size = struct.unpack_from('>iiII', record, offset)
+        if error:
+            raise vxi11_defs.Vxi11Exception(error, 'open')
+        self.generation = self.core.generation
+        self.link = link
+        self.abort_port = abort_port
+        self.max_recv_size = min(max_recv_size, VXI11_MAX_RECV_SIZE)
+
+    async def close(self):
+        "Close connection"
+        try:
+            if self.link is not None and self.core.generation == self.generation and self.core.writer is not None:
+                await self.core.call(vxi11_defs.DESTROY_LINK, [struct.pack('>i', self.link)], timeout=self._timeout + 1)
+        finally:
+            self.link = None
+            if self.own_pool:
+                await self.pool.close()
+
+    async def abort(self):
+        "Asynchronous abort"
+        link = await self._link()
+        channel = self.pool.abort(self.host, self.abort_port)
+        record, offset = await channel.call(vxi11_defs.DEVICE_ABORT, [struct.pack('>i', link)], timeout=1.0)
+        error = struct.unpack_from('>i', record, offset)[0]
+        if error:
+            raise vxi11_defs.Vxi11Exception(error, 'abort')
+
+    async def write_raw(self, data):
+        "Write binary data to instrument"
+        data = memoryview(data)
+        num = len(data)
+        offset = 0
+        while True:
+            link = await self._link()
+            block = data[offset:offset + self.max_recv_size]
+            flags = vxi11_defs.OP_FLAG_END if offset + len(block) >= num else 0
+            args = [struct.pack('>iIIi', link, self._timeout_ms, self._lock_timeout_ms, flags)] + _opaque(block)
+            record, roffset = await self._call(vxi11_defs.DEVICE_WRITE, args)
+            error, size = struct.unpack_from('>iI', record, roffset)
+            if error:
+                raise vxi11_defs.Vxi11Exception(error, 'write')
+            elif size < len(block):
+                raise vxi11_defs.Vxi11Exception('did not write complete block', 'write')
+            offset += size
+            if offset >= num:
+                break
+
+    async def read_raw_into(self, buf, grow=False):
+        """
+        Read binary data from the instrument into a preallocated buffer.
+
+        :param buf: bytearray (or writable buffer if grow is False) receiving the data
+        :param grow: extend buf if the response is larger, otherwise the read stops when buf is full
+        :return: number of bytes read
+        """
+        flags = 0
+        term_char = 0
+        if self.term_char is not None:
+            flags = vxi11_defs.OP_FLAG_TERMCHAR_SET
+            term_char = str(self.term_char).encode('utf-8')[0]
+        view = memoryview(buf)
+        pos = 0
+        reason = 0
+        while reason & (vxi11_defs.RX_END | vxi11_defs.RX_CHR) == 0:
+            link = await self._link()
+            space = len(buf) - pos
+            if space <= 0:
+                if not grow:
+                    break
+                view.release()
+                buf.extend(bytes(len(buf)))
+                view = memoryview(buf)
+                space = len(buf) - pos
+            request = min(space if not grow else VXI11_MAX_READ_LEN, VXI11_MAX_READ_LEN)
+            args = [struct.pack('>iIIIii', link, request, self._timeout_ms, self._lock_timeout_ms, flags, term_char)]
+            record, offset = await self._call(vxi11_defs.DEVICE_READ, args)
+            error, reason = struct.unpack_from('>ii', record, offset)
+            if error:
+                raise vxi11_defs.Vxi11Exception(error, 'read')
+            data, offset = _unpack_opaque(record, offset + 8)
+            n = len(data)
+            if pos + n > len(buf):
+                if not grow:
+                    n = len(buf) - pos
+                    data = data[:n]
+                else:
+                    view.release()
+                    buf.extend(bytes(max(pos + n - len(buf), len(buf))))
+                    view = memoryview(buf)
+            view[pos:pos + n] = data
+            pos += n
+        view.release()
+        return pos
+
+    async def read_raw(self, num=-1):
+        "Read binary data from instrument"
+        if num > 0:
+            buf = bytearray(num)
+            n = await self.read_raw_into(buf)
+        else:
+            buf = bytearray(READ_BUFFER_SIZE)
+            n = await self.read_raw_into(buf, grow=True)
+        if n == len(buf):
+            return bytes(buf)
+        return bytes(memoryview(buf)[:n])
+
+    async def ask_raw(self, data, num=-1):
+        "Write then read binary data"
+        await self.write_raw(data)
+        return await self.read_raw(num)
+
+    async def write(self, message, encoding='utf-8'):
+        "Write string to instrument"
+        if type(message) is tuple or type(message) is list:
+            for message_i in message:
+                await self.write(message_i, encoding)
+            return
+        await self.write_raw(str(message).encode(encoding))
+
+    async def read(self, num=-1, encoding='utf-8'):
+        "Read string from instrument"
+        return (await self.read_raw(num)).decode(encoding).rstrip('\r\n')
+
+    async def ask(self, message, num=-1, encoding='utf-8'):
+        "Write then read string"
+        if type(message) is tuple or type(message) is list:
+            val = list()
+            for message_i in message:
+                val.append(await self.ask(message_i, num, encoding))
+            return val
+        await self.write(message, encoding)
+        return await self.read(num, encoding)
+
+    async def read_stb(self):
+        "Read status byte"
+        link = await self._link()
+        args = [struct.pack('>iiII', link, 0, self._lock_timeout_ms, self._timeout_ms)]
+        record, offset = await self._call(vxi11_defs.DEVICE_READSTB, args)
+        error, stb = struct.unpack_from('>iI', record, offset)
+        if error:
+            raise vxi11_defs.Vxi11Exception(error, 'read_stb')
+        return stb
+
+    async def trigger(self):
+        "Send trigger command"
+        await self._generic(vxi11_defs.DEVICE_TRIGGER, 'trigger')
+
+    async def clear(self):
+        "Send clear command"
+        await self._generic(vxi11_defs.DEVICE_CLEAR, 'clear')
+
+    async def remote(self):
+        "Send remote command"
+        await self._generic(vxi11_defs.DEVICE_REMOTE, 'remote')
+
+    async def local(self):
+        "Send local command"
+        await self._generic(vxi11_defs.DEVICE_LOCAL, 'local')
+
+    async def lock(self):
+        "Send lock command"
+        link = await self._link()
+        args = [struct.pack('>iiI', link, 0, self._lock_timeout_ms)]
+        record, offset = await self._call(vxi11_defs.DEVICE_LOCK, args)
+        error = struct.unpack_from('>i', record, offset)[0]
+        if error:
+            raise vxi11_defs.Vxi11Exception(error, 'lock')
+
+    async def unlock(self):
+        "Send unlock command"
+        link = await self._link()
+        record, offset = await self._call(vxi11_defs.DEVICE_UNLOCK, [struct.pack('>i', link)])
+        error = struct.unpack_from('>i', record, offset)[0]
+        if error:
+            raise vxi11_defs.Vxi11Exception(error, 'unlock')
+
+
+class _LoopThread(object):
+    """
+    Background event loop shared by the synchronous facade instruments.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.pools = {}
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = _LoopThread()
+            return cls._instance
+
+    def pool(self, pmap_port):
+        pool = self.pools.get(pmap_port)
+        if pool is None:
+            pool = self.pools[pmap_port] = ConnectionPool(pmap_port=pmap_port)
+        return pool
+
+
+def run(*coros):
+    """
+    Run coroutines on the event loop of the synchronous facade instruments, several coroutines are run concurrently
+    and the list of their results returned, e.g. to query several instruments at once:
+
+        v1, v2 = vxi11_async.run(dmm1.inst.ask('READ?'), dmm2.inst.ask('READ?'))
+    """
+    async def gather():
+        return await asyncio.gather(*coros)
+    return asyncio.run_coroutine_threadsafe(gather() if len(coros) != 1 else coros[0],
+                                            _LoopThread.get().loop).result()
+
+
+class Instrument(object):
+    "Synchronous VXI-11 instrument client with the vxi11.Instrument interface on the shared background event loop"
+
+    def __init__(self, host, name=None, client_id=None, term_char=None, pmap_port=PMAP_PORT):
+        self.inst = AsyncInstrument(host, name=name, client_id=client_id, term_char=term_char,
+                                    pool=_LoopThread.get().pool(pmap_port))
+
+    def __getattr__(self, name):
+        if name in ('host', 'name', 'client_id', 'term_char', 'link', 'abort_port', 'max_recv_size'):
+            return getattr(self.inst, name)
+        raise AttributeError(name)
+
+    @property
+    def timeout(self):
+        return self.inst.timeout
+
+    @timeout.setter
+    def timeout(self, val):
+        self.inst.timeout = val
+
+    @property
+    def lock_timeout(self):
+        return self.inst.lock_timeout
+
+    @lock_timeout.setter
+    def lock_timeout(self, val):
+        self.inst.lock_timeout = val
+
+    def open(self):
+        run(self.inst.open())
+
+    def close(self):
+        run(self.inst.close())
+
+    def abort(self):
+        run(self.inst.abort())
+
+    def write_raw(self, data):
+        run(self.inst.write_raw(data))
+
+    def read_raw(self, num=-1):
+        return run(self.inst.read_raw(num))
+
+    def read_raw_into(self, buf, grow=False):
+        return run(self.inst.read_raw_into(buf, grow))
+
+    def ask_raw(self, data, num=-1):
+        return run(self.inst.ask_raw(data, num))
+
+    def write(self, message, encoding='utf-8'):
+        run(self.inst.write(message, encoding))
+
+    def read(self, num=-1, encoding='utf-8'):
+        return run(self.inst.read(num, encoding))
+
+    def ask(self, message, num=-1, encoding='utf-8'):
+        return run(self.inst.ask(message, num, encoding))
+
+    def read_stb(self):
+        return run(self.inst.read_stb())
+
+    def trigger(self):
+        run(self.inst.trigger())
+
+    def clear(self):
+        run(self.inst.clear())
+
+    def remote(self):
+        run(self.inst.remote())
+
+    def local(self):
+        run(self.inst.local())
+
+    def lock(self):
+        run(self.inst.lock())
+
+    def unlock(self):
+        run(self.inst.unlock())
+
+
+class _StubLink(object):
+    def __init__(self):
+        self.input = bytearray()
+        self.output = bytearray()
+
+
+class StubServer(object):
+    """
+    Local VXI-11 server with portmapper, core and abort channels. A program message written to a link is split on ';'
+    and each query gets the response of its header (upper case, without '?') from responses, the responses of a
+    message are joined with ';' and terminated with '\\n'. Responses are str, bytes (returned as is, e.g. binary
+    blocks) or callables called with the query.
+
+    :param responses: dictionary of query header: response
+    :param latency: delay of each RPC reply in seconds
+    :param max_recv_size: maximum device_write data size reported by create_link
+    """
+
+    def __init__(self, responses=None, latency=0., max_recv_size=65536, host='127.0.0.1'):
+        self.responses = {'*IDN': 'SVP,VXI-11 stub,0,1.0'}
+        self.responses.update(responses or {})
+        self.latency = latency
+        self.max_recv_size = max_recv_size
+        self.host = host
+        self.pmap_port = None
+        self.core_port = None
+        self.abort_port = None
+        self.links = {}
+        self.calls = 0
+        self._next_link = 1
+        self._servers = []
+        self._clients = {}
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        """
+        Start the servers on the running event loop.
+        """
+        for attr, handler in (('pmap_port', self._pmap), ('core_port', self._core), ('abort_port', self._abort)):
+            server = await asyncio.start_server(lambda r, w, h=handler: self._serve(r, w, h), self.host, 0)
+            self._servers.append(server)
+            setattr(self, attr, server.sockets[0].getsockname()[1])
+        return self
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+        for writer in list(self._clients.values()):
+            writer.close()
+        if self._clients:
+            await asyncio.gather(*list(self._clients.keys()), return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+    def __enter__(self):
+        """
+        Run the server on a background event loop.
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.start(), self._loop).result()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def _serve(self, reader, writer, handler):
+        _nodelay(writer)
+        task = asyncio.current_task()
+        self._clients[task] = writer
+        try:
+            while True:
+                record = await _read_record(reader)
+                xid, mtype, rpcvers, prog, vers, proc = struct.unpack_from('>6I', record, 0)
+                cred, offset = _unpack_opaque(record, 28)
+                verf, offset = _unpack_opaque(record, offset + 4)
+                self.calls += 1
+                result = handler(proc, record, offset)
+                header = struct.pack('>6I', xid, RPC_REPLY, RPC_MSG_ACCEPTED, 0, 0,
+                                     RPC_SUCCESS if result is not None else RPC_PROC_UNAVAIL)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                _write_record(writer, [header] + (result or []))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self._clients[task]
+            writer.close()
+
+    def _pmap(self, proc, record, offset):
+        if proc == 0:
+            return []
+        if proc != PMAPPROC_GETPORT:
+            return None
+        prog, vers, prot, port = struct.unpack_from('>4I', record, offset)
+        port = {vxi11_defs.DEVICE_CORE_PROG: self.core_port, vxi11_defs.DEVICE_ASYNC_PROG: self.abort_port}.get(prog, 0)
+        return [_UINT.pack(port)]
+
+    def _abort(self, proc, record, offset):
+        if proc == 0:
+            return []
+        if proc != vxi11_defs.DEVICE_ABORT:
+            return None
+        return [struct.pack('>i', vxi11_defs.ERR_NO_ERROR)]
+
+    def response(self, query):
+        header = query.split(None, 1)[0].lstrip(':').upper().rstrip('?')
+        resp = self.responses.get(header, '0')
+        if callable(resp):
+            resp = resp(query)
+        if not isinstance(resp, bytes):
+            resp = str(resp).encode('utf-8')
+        return resp
+
+    def _message(self, link):
+        msg = bytes(link.input).decode('latin-1').strip()
+        link.input = bytearray()
+        resp = [self.response(u.strip()) for u in msg.split(';') if u.strip().endswith('?') or '? ' in u]
+        if resp:
+            link.output += b';'.join(resp) + b'\n'
+
+    def _core(self, proc, record, offset):
+        error = struct.pack('>i', vxi11_defs.ERR_NO_ERROR)
+        if proc == 0:
+            return []
+        if proc == vxi11_defs.CREATE_LINK:
+            link_id = self._next_link
+            self._next_link += 1
+            self.links[link_id] = _StubLink()
+            return [struct.pack('>iiII', vxi11_defs.ERR_NO_ERROR, link_id, self.abort_port, self.max_recv_size)]
+        link_id = struct.unpack_from('>i', record, offset)[0]
+        link = self.links.get(link_id)
+        if link is None:
+            if proc in (vxi11_defs.DEVICE_WRITE, vxi11_defs.DEVICE_READSTB):
+                return [struct.pack('>iI', vxi11_defs.ERR_INVALID_LINK_IDENTIFIER, 0)]
+            if proc == vxi11_defs.DEVICE_READ:
+                return [struct.pack('>ii', vxi11_defs.ERR_INVALID_LINK_IDENTIFIER, 0)] + _opaque(b'')
+            return [struct.pack('>i', vxi11_defs.ERR_INVALID_LINK_IDENTIFIER)]
+        if proc == vxi11_defs.DEVICE_WRITE:
+            flags = struct.unpack_from('>i', record, offset + 12)[0]
+            data, end = _unpack_opaque(record, offset + 16)
+            link.input += data
+            if flags & vxi11_defs.OP_FLAG_END:
+                self._message(link)
+            return [struct.pack('>iI', vxi11_defs.ERR_NO_ERROR, len(data))]
+        if proc == vxi11_defs.DEVICE_READ:
+            request, timeout, lock_timeout, flags, term_char = struct.unpack_from('>IIIii', record, offset + 4)
+            if not link.output:
+                return [struct.pack('>ii', vxi11_defs.ERR_IO_TIMEOUT, 0)] + _opaque(b'')
+            n = min(request, len(link.output))
+            reason = vxi11_defs.RX_REQCNT
+            if flags & vxi11_defs.OP_FLAG_TERMCHAR_SET:
+                index = link.output.find(bytes([term_char & 0xff]), 0, n)
+                if index >= 0:
+                    n = index + 1
+                    reason = vxi11_defs.RX_CHR
+            data = bytes(link.output[:n])
+            del link.output[:n]
+            if not link.output:
+                reason |= vxi11_defs.RX_END
+            return [struct.pack('>ii', vxi11_defs.ERR_NO_ERROR, reason)] + _opaque(data)
+        if proc == vxi11_defs.DEVICE_READSTB:
+            return [struct.pack('>iI', vxi11_defs.ERR_NO_ERROR, 0x10 if link.output else 0)]
+        if proc == vxi11_defs.DEVICE_CLEAR:
+            link.input = bytearray()
+            link.output = bytearray()
+            return [error]
+        if proc == vxi11_defs.DESTROY_LINK:
+            del self.links[link_id]
+            return [error]
+        if proc in (vxi11_defs.DEVICE_TRIGGER, vxi11_defs.DEVICE_REMOTE, vxi11_defs.DEVICE_LOCAL,
+                    vxi11_defs.DEVICE_LOCK, vxi11_defs.DEVICE_UNLOCK):
+            return [error]
+        return None
+
+
+async def _benchmark(count=4, queries=20, latency=0.002, size=16 * 1024 * 1024):
+    results = []
+    servers = [StubServer(responses={'DATA': b'#' + b'x' * size}, latency=latency, max_recv_size=1048576)
+               for i in range(count)]
+    for s in servers:
+        await s.start()
+    pools = dict([(s.pmap_port, ConnectionPool(pmap_port=s.pmap_port)) for s in servers])
+    insts = [AsyncInstrument(s.host, pool=pools[s.pmap_port]) for s in servers]
+    for inst in insts:
+        await inst.open()
+    start = time.time()
+    for inst in insts:
+        for i in range(queries):
+            await inst.ask('MEAS:VOLT?')
+    results.append(('%d instruments x %d queries, sequential' % (count, queries), time.time() - start))
+    start = time.time()
+
+    async def run_queries(inst):
+        for i in range(queries):
+            await inst.ask('MEAS:VOLT?')
+    await asyncio.gather(*[run_queries(inst) for inst in insts])
+    results.append(('%d instruments x %d queries, concurrent' % (count, queries), time.time() - start))
+    start = time.time()
+    data = await insts[0].ask_raw(b'DATA?', num=size + 2)
+    results.append(('%d MB read' % (len(data) // (1024 * 1024)), time.time() - start))
+    for inst in insts:
+        await inst.close()
+    for pool in pools.values():
+        await pool.close()
+    for s in servers:
+        await s.stop()
+    return results
+
+
+if __name__ == "__main__":
+
+    for desc, t in asyncio.run(_benchmark()):
+        print('%-45s %8.1f ms' % (desc, t * 1000))
+
+    with StubServer() as server:
+        inst = Instrument(server.host, pmap_port=server.pmap_port)
+        print(inst.ask('*IDN?'))
+        inst.close()
@@ -0,0 +1,143 @@
+"""
+
+Python VXI-11 driver constants and exceptions
+
+Copyright (c) 2012-2014 Alex Forencich and Michael Walle
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+import re
+
+# VXI-11 RPC constants
+
+# Device async
+DEVICE_ASYNC_PROG = 0x0607b0
+DEVICE_ASYNC_VERS = 1
+DEVICE_ABORT      = 1
+
+# Device core
+DEVICE_CORE_PROG  = 0x0607af
+DEVICE_CORE_VERS  = 1
+CREATE_LINK       = 10
+DEVICE_WRITE      = 11
+DEVICE_READ       = 12
+DEVICE_READSTB    = 13
+DEVICE_TRIGGER    = 14
+DEVICE_CLEAR      = 15
+DEVICE_REMOTE     = 16
+DEVICE_LOCAL      = 17
+DEVICE_LOCK       = 18
+DEVICE_UNLOCK     = 19
+DEVICE_ENABLE_SRQ = 20
+DEVICE_DOCMD      = 22
+DESTROY_LINK      = 23
+CREATE_INTR_CHAN  = 25
+DESTROY_INTR_CHAN = 26
+
+# Device intr
+DEVICE_INTR_PROG  = 0x0607b1
+DEVICE_INTR_VERS  = 1
+DEVICE_INTR_SRQ   = 30
+
+# Error states
+ERR_NO_ERROR = 0
+ERR_SYNTAX_ERROR = 1
+ERR_DEVICE_NOT_ACCESSIBLE = 3
+ERR_INVALID_LINK_IDENTIFIER = 4
+ERR_PARAMETER_ERROR = 5
+ERR_CHANNEL_NOT_ESTABLISHED = 6
+ERR_OPERATION_NOT_SUPPORTED = 8
+ERR_OUT_OF_RESOURCES = 9
+ERR_DEVICE_LOCKED_BY_ANOTHER_LINK = 11
+ERR_NO_LOCK_HELD_BY_THIS_LINK = 12
+ERR_IO_TIMEOUT = 15
+ERR_IO_ERROR = 17
+ERR_INVALID_ADDRESS = 21
+ERR_ABORT = 23
+ERR_CHANNEL_ALREADY_ESTABLISHED = 29
+
+# Flags
+OP_FLAG_WAIT_BLOCK = 1
+OP_FLAG_END = 8
+OP_FLAG_TERMCHAR_SET = 128
+
+RX_REQCNT = 1
+RX_CHR = 2
+RX_END = 4
+
+def parse_visa_resource_string(resource_string):
+    # valid resource strings:
+    # TCPIP::10.0.0.1::INSTR
+    # TCPIP0::10.0.0.1::INSTR
+    # TCPIP::10.0.0.1::gpib,5::INSTR
+    # TCPIP0::10.0.0.1::gpib,5::INSTR
+    # TCPIP0::10.0.0.1::usb0::INSTR
+    # TCPIP0::10.0.0.1::usb0[1234::5678::MYSERIAL::0]::INSTR
+    m = re.match(r'^(?P<prefix>(?P<type>TCPIP)\d*)(::(?P<arg1>[^\s:]+))'
+            r'(::(?P<arg2>[^\s:]+(\[.+\])?))?(::(?P<suffix>INSTR))$',
+            resource_string, re.I)
+
+    if m is not None:
+        return dict(
+                type = m.group('type').upper(),
+                prefix = m.group('prefix'),
+                arg1 = m.group('arg1'),
+                arg2 = m.group('arg2'),
+                suffix = m.group('suffix'),
+        )
+
+# Exceptions
+class Vxi11Exception(Exception):
+    em = {0:  "No error",
+          1:  "Syntax error",
+          3:  "Device not accessible",
+          4:  "Invalid link identifier",
+          5:  "Parameter error",
+          6:  "Channel not established",
+          8:  "Operation not supported",
+          9:  "Out of resources",
+          11: "Device locked by another link",
+          12: "No lock held by this link",
+          15: "IO timeout",
+          17: "IO error",
+          21: "Invalid address",
+          23: "Abort",
+          29: "Channel already established"}
+
+    def __init__(self, err = None, note = None):
+        self.err = err
+        self.note = note
+        self.msg = ''
+
+        if err is None:
+            self.msg = note
+        else:
+            if type(err) is int:
+                if err in self.em:
+                    self.msg = "%d: %s" % (err, self.em[err])
+                else:
+                    self.msg = "%d: Unknown error" % err
+            else:
+                self.msg = err
+            if note is not None:
+                self.msg = "%s [%s]" % (self.msg, note)
+
+    def __str__(self):
+        return self.msg
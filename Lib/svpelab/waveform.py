@@ -32,6 +32,10 @@ Questions can be directed to support@sunspec.org
 
 import math
 
+import numpy as np
+
+from . import dataset
+
 class WaveformError(Exception):
     """
     Exception to wrap all waveform generated exceptions.
@@ -39,6 +43,99 @@ class WaveformError(Exception):
     pass
 
 
+'''
+Cycle RMS
+
+The cycle RMS values are calculated over windows bounded by the zero crossings of each channel. Crossings are found
+with vectorized comparisons of the sample signs and the window RMS values from the cumulative sums of the squared
+samples between crossings, so the cost is a few array passes per capture regardless of the number of cycles.
+
+    cycles = 1      RMS of each cycle, from positive-going crossing to positive-going crossing
+    cycles = 0.5    RMS of each half cycle, from zero crossing to zero crossing
+    cycles = 10/12  IEC 61000-4-30 style 10 cycle (50 Hz) or 12 cycle (60 Hz) aggregation windows
+
+Windows are contiguous by default, step sets the number of cycles (or half cycles) between window starts for
+overlapping windows, e.g. cycles=1, step=0.5 for a one cycle RMS refreshed every half cycle. The RMS time is the time
+of the sample ending the window.
+'''
+
+TIME_CHANNELS = ('Time', 'TIME')
+
+
+def _window_intervals(cycles, step):
+    """
+    Return (half, n, step) with half True if the windows are bounded by both crossing directions and the window length
+    and step in crossing intervals.
+    """
+    if step is None:
+        step = cycles
+    half = (cycles * 2) % 2 != 0 or (step * 2) % 2 != 0
+    scale = 2 if half else 1
+    n = cycles * scale
+    n_step = step * scale
+    if n < 1 or n_step < 1 or n != int(n) or n_step != int(n_step):
+        raise WaveformError('Invalid cycle RMS window: cycles = %s, step = %s' % (cycles, step))
+    return half, int(n), int(n_step)
+
+
+def _crossings(pos, half=False):
+    """
+    Return the (row, index) arrays of the crossings in the 2-D sign array pos, where index is the first sample after
+    the crossing. Only positive-going crossings are returned unless half is True.
+    """
+    if half:
+        edges = pos[:, 1:] != pos[:, :-1]
+    else:
+        edges = pos[:, 1:] & ~pos[:, :-1]
+    rows, index = np.nonzero(edges)
+    return rows, index + 1
+
+
+def cycle_rms(time, data, cycles=1, step=None):
+    """
+    Calculate the cycle RMS values of one or more channels.
+
+    :param time: time values, one per sample
+    :param data: channel values, a sequence of samples or a sequence of channels with the same length as time
+    :param cycles: window length in cycles, a multiple of 0.5
+    :param step: cycles between window starts, defaults to cycles
+    :return: (rms_time, rms_data) numpy arrays for a single channel, list of (rms_time, rms_data) for multiple
+             channels
+    """
+    half, n, step = _window_intervals(cycles, step)
+    time = np.asarray(time, dtype=float)
+    data = np.asarray(data, dtype=float)
+    single = data.ndim == 1
+    data = np.atleast_2d(data)
+    if data.shape[1] != len(time):
+        raise WaveformError('Channel length %d does not match time length %d' % (data.shape[1], len(time)))
+
+    rows, index = _crossings(data >= 0, half=half)
+    # sums of squares between consecutive crossings, the cumulative sums of the interval sums give the window sums
+    sq = (data * data).ravel()
+    seg = np.zeros(0)
+    if len(index) > 0:
+        seg = np.add.reduceat(sq, rows * data.shape[1] + index)
+    bounds = np.searchsorted(rows, np.arange(data.shape[0] + 1))
+
+    results = []
+    for r in range(data.shape[0]):
+        x = index[bounds[r]:bounds[r + 1]]
+        seg_r = seg[bounds[r]:max(bounds[r + 1] - 1, bounds[r])]
+        start = np.arange(0, len(x) - n, step)
+        end = start + n
+        if n == 1:
+            sums = seg_r[start]
+        else:
+            cs = np.zeros(len(x))
+            np.cumsum(seg_r, out=cs[1:])
+            sums = np.maximum(cs[end] - cs[start], 0)
+        results.append((time[x[end]], np.sqrt(sums / (x[end] - x[start]))))
+    if single:
+        return results[0]
+    return results
+
+
 class Waveform(object):
 
     def __init__(self, ts=None):
@@ -51,26 +148,12 @@ class Waveform(object):
         self.rms_data = {}           # rms data calculated from waveform data
         self.ts = ts
 
-    def from_csv(self, filename, sep=','):
-        f = open(filename, 'r')
-        ids = f.readline().split(sep)
-        chans = []
-        chan_count = len(ids)
-        for i in range(chan_count):
-            self.channels.append(ids[i].strip())
-            chans.append([])
-        # print self.channels
-        line = 1
-        for data in f:
-            line += 1
-            values = data.split(sep)
-            if len(values) != chan_count:
-                raise WaveformError('Channel data error: line %s' % (line))
-            for i in range(chan_count):
-                chans[i].append(float(values[i]))
-
-        for i in range(chan_count):
-            self.channel_data.append(chans[i])
+    def from_csv(self, filename, sep=',', channels=None, start=0, stop=None, memory_map=False):
+        try:
+            self.channels, self.channel_data = dataset.read_csv(filename, sep=sep, points=channels, start=start,
+                                                                stop=stop, memory_map=memory_map)
+        except dataset.DatasetError as e:
+            raise WaveformError('Channel data error: %s' % (str(e)))
 
     def from_dataset(self, ds=None):
         if ds is not None:
@@ -79,80 +162,71 @@ class Waveform(object):
             self.channels = ds.points
             self.channel_data = ds.data
 
-    def to_csv(self, filename):
-        f = open(filename, 'w')
-        chan_count = len(self.channels)
-        f.write('%s\n' % ','.join(self.channels))
-        for i in range(len(self.channel_data[0])):
-            data = []
-            for c in range(chan_count):
-                data.append(self.channel_data[c][i])
-            f.write('%s\n' % ','.join(str(v) for v in data))
+    def to_csv(self, filename, precision=None, none_token=dataset.CSV_NONE_TOKEN,
+               chunk_size=dataset.CSV_CHUNK_SIZE):
+        with dataset.CsvWriter(filename, self.channels, sep=',', precision=precision, none_token=none_token,
+                               chunk_size=chunk_size) as w:
+            w.write(self.channel_data)
 
     def compute_rms(self, data):
-        tmp = 0
-        size = len(data)
-        for i in range(size):
-            v = data[i]
-            tmp += v * v
-        tmp /= float(size)
-        return math.sqrt(tmp)
-
-    def compute_cycle_rms(self, chan_id):
-        c = None
+        data = np.asarray(data, dtype=float)
+        return math.sqrt(np.dot(data, data) / float(len(data)))
+
+    def _channel_index(self, chan_id):
         try:
-            c = 'Time'
-            time_index = self.channels.index(c)
-            c = chan_id
-            chan_index = self.channels.index(c)
-        except Exception:
-            try:
-                c = 'TIME'
-                time_index = self.channels.index(c)
-                c = chan_id
-                chan_index = self.channels.index(c)
-            except Exception:
-                raise WaveformError('Channel not found: %s' % (c))
-
-        time_chan = self.channel_data[time_index]
-        data_chan = self.channel_data[chan_index]
-        scanning = False
-        calculating = False
-        neg = False
-        start_index = 0
-        rms_time = []
-        rms_data = []
-
-        for i in range(len(data_chan)):
-            pos = data_chan[i] >= 0
-            if calculating:
-                if not pos:
-                    neg = True
-                elif neg:
-                    # calculate rms [start_index:i]
-                    rms_time.append(time_chan[i])
-                    rms = self.compute_rms(data_chan[start_index:i])
-                    rms_data.append(rms)
-                    start_index = i
-                    neg = False
-            elif scanning:
-                if pos:
-                    start_index = i
-                    calculating = True
-            else:
-                if not pos:
-                    scanning = True
-
-        return rms_time, rms_data
-
-    def compute_rms_data(self, phase):
+            return self.channels.index(chan_id)
+        except ValueError:
+            raise WaveformError('Channel not found: %s' % (chan_id))
+
+    def _time_index(self):
+        for c in TIME_CHANNELS:
+            if c in self.channels:
+                return self.channels.index(c)
+        raise WaveformError('Channel not found: %s' % (TIME_CHANNELS[-1]))
+
+    def compute_cycle_rms(self, chan_id, cycles=1, step=None):
+        """
+        Calculate the cycle RMS values of a channel.
+
+        :param chan_id: channel name
+        :param cycles: window length in cycles, a multiple of 0.5
+        :param step: cycles between window starts, defaults to cycles
+        :return: (rms_time, rms_data) lists
+        """
+        time_index = self._time_index()
+        chan_index = self._channel_index(chan_id)
+        rms_time, rms_data = cycle_rms(self.channel_data[time_index], self.channel_data[chan_index], cycles=cycles,
+                                       step=step)
+        return rms_time.tolist(), rms_data.tolist()
+
+    def compute_cycle_rms_all(self, channels=None, cycles=1, step=None):
+        """
+        Calculate the cycle RMS values of multiple channels in one pass.
+
+        :param channels: list of channel names, defaults to all channels except time
+        :param cycles: window length in cycles, a multiple of 0.5
+        :param step: cycles between window starts, defaults to cycles
+        :return: dict of channel name: (rms_time, rms_data) numpy arrays
+        """
+        time_index = self._time_index()
+        if channels is None:
+            channels = [c for c in self.channels if c not in TIME_CHANNELS]
+        if not channels:
+            return {}
+        data = [self.channel_data[self._channel_index(c)] for c in channels]
+        results = cycle_rms(self.channel_data[time_index], data, cycles=cycles, step=step)
+        return dict(zip(channels, results))
+
+    def compute_rms_data(self, phase, cycles=1, step=None):
         phase = str(phase)
         chan_v = 'AC_V_%s' % phase
         chan_i = 'AC_I_%s' % phase
-        rms_time_v, rms_data_v = self.compute_cycle_rms(chan_v)
-        rms_time_i, rms_data_i = self.compute_cycle_rms(chan_i)
+        rms = self.compute_cycle_rms_all([chan_v, chan_i], cycles=cycles, step=step)
+        rms_time_v, rms_data_v = rms[chan_v]
+        rms_time_i, rms_data_i = rms[chan_i]
         count = min(len(rms_time_v), len(rms_time_i))
-        self.rms_data[phase] = [rms_time_v[:count], rms_data_v[:count], rms_data_i[:count]]
+        self.rms_data[phase] = [rms_time_v[:count].tolist(), rms_data_v[:count].tolist(),
+                                rms_data_i[:count].tolist()]
 
 if __name__ == "__main__":
 
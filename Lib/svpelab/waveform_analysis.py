@@ -42,7 +42,6 @@ except Exception as e:
     print('Error: prettytable python package not found!')  # This will appear in the SVP log file.
 
 try:
-    from matplotlib.mlab import find
     import matplotlib.pyplot as plt
 except Exception as e:
     print('Error: matplotlib python package not found!')  # This will appear in the SVP log file.
@@ -57,7 +56,59 @@ try:
 except Exception as e:
     print('Error: math python package not found!')  # This will appear in the SVP log file.
 
-def calc_ride_through_duration(wfmtime, ac_current, ac_voltage=None, grid_trig=None, v_window=20., trip_thresh=3.):
+import functools
+
+FREQ_FILTER_CUTOFF = 60.
+FREQ_FILTER_ORDER = 4
+
+RT_WINDOW_CYCLES = 1.
+RT_V_NOM = 240.
+RT_VOLTAGE = 'voltage'
+RT_CURRENT = 'current'
+RT_TRIGGER = 'trigger'
+
+
+def ride_through_events(wfmtime, ac_current, ac_voltage=None, grid_trig=None, v_window=20., trip_thresh=3.,
+                        fs=None, v_nom=RT_V_NOM, f_grid=60.):
+    """ Returns the event index used by calc_ride_through_duration()
+
+    The index holds the RMS voltage band track (RT_VOLTAGE, True inside v_nom +/- v_window), the RMS current level
+    track (RT_CURRENT, False at or below trip_thresh) and the trigger track (RT_TRIGGER). It can be saved next to the
+    waveform file and passed to calc_ride_through_duration() to repeat the analysis without the raw samples.
+    """
+    from . import events
+
+    window_size = RT_WINDOW_CYCLES*(1./f_grid)*1000.  # in ms
+    if fs is None:
+        fs = sampling_frequency(wfmtime)
+
+    index = events.EventIndex(time=wfmtime)
+    if ac_voltage is not None:
+        time_RMS, ac_voltage_RMS = calculateRmsOfSignal(ac_voltage, windowSize=window_size,
+                                                        samplingFrequency=fs,
+                                                        overlap=int(window_size/3))
+        index.add_band(RT_VOLTAGE, ac_voltage_RMS, v_nom - v_window, v_nom + v_window, time=time_RMS)
+    if grid_trig is not None:
+        index.add_trigger(RT_TRIGGER, grid_trig)
+    if ac_current is not None:
+        time_RMS, ac_current_RMS = calculateRmsOfSignal(ac_current, windowSize=window_size,
+                                                        samplingFrequency=fs,
+                                                        overlap=int(window_size/3))
+        index.add_level(RT_CURRENT, ac_current_RMS, trip_thresh, inclusive=False, time=time_RMS)
+    return index
+
+
+def _script_fail(msg):
+    # the SVP script module is only available inside the SVP, import it when a script failure is raised
+    try:
+        import script
+    except ImportError:
+        return Exception(msg)
+    return script.ScriptFail(msg)
+
+
+def calc_ride_through_duration(wfmtime, ac_current, ac_voltage=None, grid_trig=None, v_window=20., trip_thresh=3.,
+                               fs=None, events=None):
     """ Returns the time between the voltage change and when the EUT tripped
 
     wfmtime is the time vector from the waveform
@@ -66,72 +117,36 @@ def calc_ride_through_duration(wfmtime, ac_current, ac_voltage=None, grid_trig=N
     grid_trig is the trigger measurement corresponding to wfmtime times
     v_window is the window around the nominal RMS voltage where the VRT test is started
     trip_thresh is the RMS current level where the EUT is believe to be tripped or ceasing to energize
+    fs is the sampling frequency in Hz, calculated from wfmtime if not provided
+    events is an event index from ride_through_events(), built from the waveform if not provided
 
     There are two options for determining the start of the VRT test (the latter is used when ac_voltage != None)
     1. Using the trigger channel from the grid simulator
     2. Using the RMS calculation of the ac voltage to determine when the voltage exits v_nominal +/- v_window
     """
 
-    f_grid = 60.
-    cycles_in_window = 1.
-    window_size = cycles_in_window*(1./f_grid)*1000.  # in ms
+    if events is None:
+        events = ride_through_events(wfmtime, ac_current, ac_voltage=ac_voltage, grid_trig=grid_trig,
+                                     v_window=v_window, trip_thresh=trip_thresh, fs=fs)
 
-    if ac_voltage is not None:  # use the ac voltage RMS values to determine when the vrt test starts
-        time_RMS, ac_voltage_RMS = calculateRmsOfSignal(ac_voltage, windowSize=window_size,
-                                                        samplingFrequency=24e3,
-                                                        overlap=int(window_size/3))
-        v_nom = 240.
-        volt_idx = [idx for idx, i in enumerate(ac_voltage_RMS) if (i <= (v_nom - v_window) or i >= (v_nom + v_window))]
-        if len(volt_idx) != 0:
-            try:
-                vrt_start = time_RMS[min(volt_idx)]
-            except:
-                raise script.ScriptFail('Error in Waveform File. Unable to get voltage time from wfmtime: %s' % str(e))
-        else:
-            raise script.ScriptFail('No voltage deviation in the waveform file.')
-
-        '''
-        # for comparison
-        trig_thresh = 3.
-        trig_idx = [idx for idx, i in enumerate(grid_trig) if i >= trig_thresh]
-        if len(trig_idx) != 0:
-            try:
-                vrt_start = wfmtime[min(trig_idx)]
-            except:
-                raise script.ScriptFail('Error in Waveform File. Unable to get trig time from wfmtime: %s' % str(e))
-        else:
-            raise script.ScriptFail('No daq trigger in the waveform file.')
-        '''
+    if RT_VOLTAGE in events:  # use the ac voltage RMS values to determine when the vrt test starts
+        vrt_start = events[RT_VOLTAGE].first(False)
+        if vrt_start is None:
+            raise _script_fail('No voltage deviation in the waveform file.')
 
     else:  # use the trigger to indicate when the grid simulator started the VRT test
-        trig_thresh = 3.
-        trig_idx = [idx for idx, i in enumerate(grid_trig) if i >= trig_thresh]
-        if len(trig_idx) != 0:
-            try:
-                vrt_start = wfmtime[min(trig_idx)]
-            except:
-                raise script.ScriptFail('Error in Waveform File. Unable to get trig time from wfmtime: %s' % str(e))
-        else:
-            raise script.ScriptFail('No daq trigger in the waveform file.')
-
-    ac_current_thresh = trip_thresh  # Amps
-    time_RMS, ac_current_RMS = calculateRmsOfSignal(ac_current, windowSize=window_size,
-                                                    samplingFrequency=24e3,
-                                                    overlap=int(window_size/3))
+        vrt_start = None
+        if RT_TRIGGER in events:
+            vrt_start = events[RT_TRIGGER].first(True)
+        if vrt_start is None:
+            raise _script_fail('No daq trigger in the waveform file.')
 
-    ac_current_idx = [idx for idx, i in enumerate(ac_current_RMS) if i <= ac_current_thresh]
-    if len(ac_current_idx) != 0:
-        try:
-            trip_time = time_RMS[min(ac_current_idx)]
-        except:
-            raise script.ScriptFail('Error in Waveform File. Unable to get trip time from wfmtime: %s' % str(e))
+    trip_time = events[RT_CURRENT].first(False)
+    if trip_time is not None:
 
         '''
         plt.plot(wfmtime, ac_current, color='blue', label='ac_current')
-        plt.plot(time_RMS, ac_current_RMS, color='black', label='ac_current_RMS')
-        plt.plot(wfmtime, grid_trig, color='g', label='grid_trig')
         plt.plot([vrt_start, vrt_start], [min(ac_current), max(ac_current)], color='red', label='VRT start-trig')
-        # plt.plot([vrt_start_RMS, vrt_start_RMS], [min(ac_current), max(ac_current)], 'r-.', label='VRT start-RMS')
         plt.plot([trip_time, trip_time], [min(ac_current), max(ac_current)], 'r--', label='EUT trip')
         plt.legend()
         plt.grid(which='both', axis='both')
@@ -145,22 +160,59 @@ def calc_ride_through_duration(wfmtime, ac_current, ac_voltage=None, grid_trig=N
         return trip_time
 
 
-def freq_from_crossings(wfmtime, sig, fs):
+def _scipy_signal():
+    try:
+        from scipy import signal
+    except Exception as e:
+        print('Error: scipy python package not found!')  # This will appear in the SVP log file.
+        raise
+    return signal
+
+
+@functools.lru_cache(maxsize=32)
+def lowpass_filter(fs, cutoff=FREQ_FILTER_CUTOFF, order=FREQ_FILTER_ORDER, output='ba'):
+    """
+    Return the coefficients of the lowpass Butterworth filter used for the frequency estimation. The coefficients are
+    cached per (fs, cutoff, order, output), treat the returned arrays as read only.
+
+    :param fs: sampling frequency [Hz]
+    :param cutoff: filter frequency [Hz]
+    :param order: filter order
+    :param output: 'ba' for (b, a) or 'sos' for second order sections
+    """
+    signal = _scipy_signal()
+    # todo: revisit the wn calculation to be sure it works for multiple sampling rates
+    wn = (2*math.pi*cutoff)/fs  #Wn is normalized from 0 to 1, where 1 is the Nyquist frequency, pi radians/sample
+    return signal.butter(order, wn, analog=False, output=output)
+
+
+def zero_crossings(sig_ff):
+    """
+    Return the (row, crossing) arrays of the positive-going zero crossings of the 2-D array sig_ff, crossing is the
+    fractional sample index from linear interpolation between the samples around the crossing.
+    """
+    rows, indices = np.nonzero(np.logical_and(sig_ff[:, 1:] >= 0., sig_ff[:, :-1] < 0.))
+    y0 = sig_ff[rows, indices]
+    y1 = sig_ff[rows, indices + 1]
+    return rows, indices - y0/(y1 - y0)  #interpolate
+
+
+def freq_from_crossings(wfmtime, sig, fs, cutoff=FREQ_FILTER_CUTOFF, order=FREQ_FILTER_ORDER):
     """Estimate frequency by counting zero crossings
 
     Doesn't work if there are multiple zero crossings per cycle.
 
+    sig may be a single signal or a 2-D array with one signal per row, in which case avg_freq is a numpy array and
+    freqs a list of numpy arrays with one entry per row.
+
     """
-    try:
-        from scipy import signal
-    except Exception as e:
-        print('Error: scipy python package not found!')  # This will appear in the SVP log file.
+    signal = _scipy_signal()
 
     # FILTER THE WAVEFORM WITH LOWPASS BUTTERWORTH FILTER
-    # todo: revisit the wn calculation to be sure it works for multiple sampling rates
-    wn = (2*math.pi*60)/fs  #Wn is normalized from 0 to 1, where 1 is the Nyquist frequency, pi radians/sample
-    b, a = signal.butter(4, wn, analog=False)
-    sig_ff = signal.filtfilt(b, a, sig)
+    b, a = lowpass_filter(float(fs), cutoff, order)
+    sig = np.asarray(sig, dtype=np.float64)
+    single = sig.ndim == 1
+    sig_ff = signal.filtfilt(b, a, np.atleast_2d(sig), axis=-1)
 
     #check the frequency response
     '''
@@ -177,35 +229,116 @@ def freq_from_crossings(wfmtime, sig, fs):
 
     # Find the zero crossings of the filtered data
     # Linear interpolation to find truer zero crossings
-
-    indices = find(np.logical_and(sig_ff[1:] >= 0., sig_ff[:-1] < 0.))
-    crossings = [i - sig_ff[i] / (sig_ff[i+1] - sig_ff[i]) for i in indices]  #interpolate
-    cross_times = wfmtime[0] + np.array(crossings)/fs
-
-    '''
-    plt.plot(wfmtime, sig, color='red', label='Original')
-    plt.plot(wfmtime, sig_ff, color='blue', label='filtered data')
-    plt.plot(cross_times, np.zeros(len(cross_times)), 'ro', label='Zero Crossings')
-    plt.legend()
-    plt.grid(which='both', axis='both')
-    plt.axis([0, 5/60, min(sig)/2, max(sig)/2])
-    plt.show()
-    '''
-
-    time_steps = np.diff(crossings)
-    avg_freq = fs / np.average(time_steps)
-    freqs = [fs/time_steps[i] for i in range(0, len(cross_times)-1)]  #interpolate
-    freq_times = [(cross_times[i]+cross_times[i+1])/2 for i in range(0, len(freqs)-1)]  #interpolate
-
+    rows, crossings = zero_crossings(sig_ff)
+    bounds = np.searchsorted(rows, np.arange(sig_ff.shape[0] + 1))
+
+    avg_freqs = np.full(sig_ff.shape[0], np.nan)
+    freqs = []
+    for r in range(sig_ff.shape[0]):
+        time_steps = np.diff(crossings[bounds[r]:bounds[r + 1]])
+        if len(time_steps) > 0:
+            avg_freqs[r] = fs / np.average(time_steps)
+        freqs.append(fs / time_steps)
+
+    # cross_times = wfmtime[0] + crossings/fs
+    # freq_times = (cross_times[:-1] + cross_times[1:])/2
     # plt.plot(wfmtime, sig, color='red', label='Original')
     # plt.plot(wfmtime, sig_ff, color='blue', label='Filtered data')
-    # plt.plot(freq_times, freqs[:-1], 'g', label='Frequency')
+    # plt.plot(freq_times, freqs, 'g', label='Frequency')
     # plt.legend(loc=4)
     # plt.grid(which='both', axis='both')
     # plt.axis([0, freq_times[-1], 50, 61])
     # plt.show()
 
-    return avg_freq, freqs
+    if single:
+        return avg_freqs[0], freqs[0].tolist()
+    return avg_freqs, freqs
+
+
+class FrequencyTracker(object):
+    """
+    Streaming frequency estimation for contiguous blocks of samples from a continuous acquisition.
+
+    Each block is filtered with the cached lowpass filter in second order sections carrying the filter state between
+    blocks, so the signal is filtered once instead of re-filtering the whole record, and crossings spanning block
+    boundaries are kept. Unlike freq_from_crossings() the filter is causal, the filter delay does not change the
+    crossing intervals.
+
+        tracker = FrequencyTracker(fs, channels=3)
+        for block in blocks:                       # block shape (3, n)
+            freqs = tracker.update(block)
+            freq = tracker.freq                    # last frequency of each channel
+    """
+
+    def __init__(self, fs, cutoff=FREQ_FILTER_CUTOFF, order=FREQ_FILTER_ORDER, channels=1):
+        self.fs = float(fs)
+        self.channels = channels
+        self.sos = lowpass_filter(self.fs, cutoff, order, output='sos')
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the filter state, the next block is treated as the start of a new acquisition.
+        """
+        self.zi = None                                      # filter state
+        self.samples = 0                                    # samples processed
+        self.freq = np.full(self.channels, np.nan)          # last frequency of each channel
+        self._last = None                                   # last filtered sample of each channel
+        self._crossing = np.full(self.channels, np.nan)     # last crossing of each channel (sample index)
+
+    def update(self, sig):
+        """
+        Process the next block of samples.
+
+        :param sig: 1-D array for a single channel or 2-D array with one row per channel
+        :return: list of numpy arrays with the frequencies of the cycles completed in the block for each channel
+        """
+        signal = _scipy_signal()
+        x = np.atleast_2d(np.asarray(sig, dtype=np.float64))
+        if x.shape[0] != self.channels:
+            raise Exception('Expected %d channels, got %d' % (self.channels, x.shape[0]))
+        if x.shape[1] == 0:
+            return [np.zeros(0) for r in range(self.channels)]
+        if self.zi is None:
+            # start the filter in steady state for the first sample
+            self.zi = signal.sosfilt_zi(self.sos)[:, np.newaxis, :] * x[np.newaxis, :, 0, np.newaxis]
+        y, self.zi = signal.sosfilt(self.sos, x, axis=-1, zi=self.zi)
+
+        offset = self.samples
+        if self._last is not None:
+            # include the last sample of the previous block to find crossings at the block boundary
+            y_ext = np.concatenate((self._last[:, np.newaxis], y), axis=1)
+            offset -= 1
+        else:
+            y_ext = y
+        rows, crossings = zero_crossings(y_ext)
+        crossings += offset
+        bounds = np.searchsorted(rows, np.arange(self.channels + 1))
+
+        freqs = []
+        for r in range(self.channels):
+            c = np.concatenate(([self._crossing[r]], crossings[bounds[r]:bounds[r + 1]]))
+            f = self.fs/np.diff(c)
+            f = f[np.isfinite(f)]
+            if len(f) > 0:
+                self.freq[r] = f[-1]
+            if bounds[r + 1] > bounds[r]:
+                self._crossing[r] = c[-1]
+            freqs.append(f)
+
+        self._last = y[:, -1].copy()
+        self.samples += x.shape[1]
+        return freqs
+
+
+def sampling_frequency(wfmtime):
+    """
+    Return the sampling frequency in Hz of the evenly sampled time vector wfmtime.
+    """
+    wfmtime = np.asarray(wfmtime, dtype=np.float64)
+    if len(wfmtime) < 2 or wfmtime[-1] == wfmtime[0]:
+        raise Exception("unable to determine the sampling frequency from the time vector")
+    return (len(wfmtime) - 1)/(wfmtime[-1] - wfmtime[0])
 
 
 def calculateRMS(data):
@@ -214,21 +347,63 @@ def calculateRMS(data):
     #   @param a list or a numpy array
     #   @return a scalar containing either an RMS value
     #   http://homepage.univie.ac.at/christian.herbst//python/dsp_util_8py_source.html
-    tmp = 0
-    size = len(data)
-    for i in range(size):
-        tmp += data[i]
-    mean = tmp / float(size)
-    #print "mean: ", mean
-    tmp = 0
-    for i in range(size):
-        tmp2 = data[i] - mean
-        tmp += tmp2 * tmp2
-    tmp /= float(size)
-    return math.sqrt(tmp)
-
-
-def calculateRmsOfSignal(data, windowSize, samplingFrequency, overlap=0):
+    return float(np.std(np.asarray(data, dtype=np.float64)))
+
+
+def window_rms(data, left, right, remove_mean=False, dtype=np.float64):
+    """
+    Calculate the RMS values of the windows data[left[k]:right[k]] in O(N) from the cumulative sums of the samples and
+    squared samples, the cumulative sums are accumulated in float64.
+
+    :param data: list or numpy array
+    :param left: numpy array of window start indices
+    :param right: numpy array of window end indices (exclusive)
+    :param remove_mean: if True, subtract the mean of each window (AC RMS)
+    :param dtype: numpy dtype of the returned values, np.float64 or np.float32
+    :return: numpy array of RMS values
+    """
+    x = np.asarray(data, dtype=dtype)
+    left = np.asarray(left, dtype=np.intp)
+    right = np.asarray(right, dtype=np.intp)
+    count = right - left
+    if np.any(count <= 0):
+        raise Exception("zero window size")
+    # subtracting the signal mean keeps the cumulative sums small for signals with an offset
+    offset = np.mean(x, dtype=np.float64) if len(x) > 0 else 0.
+    xc = x - offset
+    s1 = np.zeros(len(x) + 1)
+    s2 = np.zeros(len(x) + 1)
+    np.cumsum(xc, dtype=np.float64, out=s1[1:])
+    np.cumsum(np.square(xc, dtype=np.float64), out=s2[1:])
+    mean = (s1[right] - s1[left])/count
+    ms = (s2[right] - s2[left])/count
+    if remove_mean:
+        ms -= mean*mean
+    else:
+        ms += offset*(2*mean + offset)
+    return np.sqrt(np.maximum(ms, 0.)).astype(dtype)
+
+
+def sliding_rms(data, window, hop=None, remove_mean=False, dtype=np.float64):
+    """
+    Calculate the RMS values of a sliding window.
+
+    :param data: list or numpy array
+    :param window: window length in samples
+    :param hop: samples between window starts, defaults to window
+    :param remove_mean: if True, subtract the mean of each window (AC RMS)
+    :param dtype: numpy dtype of the returned values, np.float64 or np.float32
+    :return: tuple (start, rms) of numpy arrays with the window start indices and RMS values
+    """
+    window = int(window)
+    hop = window if hop is None else int(hop)
+    if window < 1 or hop < 1:
+        raise Exception("window and hop must be at least 1 sample")
+    left = np.arange(0, len(data) - window + 1, hop)
+    return left, window_rms(data, left, left + window, remove_mean=remove_mean, dtype=dtype)
+
+
+def calculateRmsOfSignal(data, windowSize, samplingFrequency, overlap=0, dtype=np.float64):
     ######################################################################
     #   calculate and return the time-varying RMS of a signal
     #   @param data a list or a numpy array containing the signal that should be
@@ -236,6 +411,7 @@ def calculateRmsOfSignal(data, windowSize, samplingFrequency, overlap=0):
     #   @param windowSize duration of the sliding analysis window in milli-seconds
     #   @param samplingFrequency sampling frequency [Hz]
     #   @param overlap overlap between individual windows, specified in milli-seconds
+    #   @param dtype numpy dtype of the returned RMS values, np.float64 or np.float32
     #   @return a tuple containing two numpy arrays for the temporal offset and the
     #       RMS value at the respective temporal offset.
     #   http://homepage.univie.ac.at/christian.herbst//python/dsp_util_8py_source.html
@@ -245,33 +421,123 @@ def calculateRmsOfSignal(data, windowSize, samplingFrequency, overlap=0):
     if overlap >= windowSize:
         raise Exception("overlap must not exceed window size")
 
+    samplingFrequency = float(samplingFrequency)
     numFrames = len(data)
-    duration = numFrames / float(samplingFrequency)
+    duration = numFrames / samplingFrequency
 
     readProgress = (windowSize - overlap) / 1000.0
     outputSize = int(duration / readProgress)
-    dataX = np.zeros(outputSize)
-    dataY = np.zeros(outputSize)
-    t = 0
     halfWindowSize = windowSize / 2000.0
-    for idx in range(outputSize):
-        left = int((t - halfWindowSize) * float(samplingFrequency))
-        right = left + int(windowSize * float(samplingFrequency) / 1000.0)
-        if right >= numFrames:
-            right = numFrames - 1
-        numFramesLocal = right - left
-        #print idx, t, left, right, readProgress
-        if numFramesLocal <= 0:
-            raise Exception("zero window size (t = " + str(t) + " sec.)")
-        dataTmp = np.zeros(numFramesLocal)
-        for i in range(numFramesLocal):
-            dataTmp[i] = data[i + left]
-        dataX[idx] = t
-        t += readProgress
-        rms = calculateRMS(dataTmp)
-        dataY[idx] = rms
-
-    return dataX[1:], dataY[1:]  # throw away awful first data point
+    # windows are centered on t, accumulated as t += readProgress, the first window (t = 0) is not returned
+    t = np.cumsum(np.full(max(outputSize - 1, 0), readProgress))
+    left = np.maximum(((t - halfWindowSize) * samplingFrequency).astype(np.intp), 0)
+    right = np.minimum(left + int(windowSize * samplingFrequency / 1000.0), numFrames - 1)
+    if np.any(right <= left):
+        raise Exception("zero window size (t = " + str(t[np.argmax(right <= left)]) + " sec.)")
+
+    return t, window_rms(data, left, right, remove_mean=True, dtype=dtype)
+
+
+IEEE1459_HARMONICS = 40  # IEEE Std 1547.1-2005
+IEEE1459_F_NOM = 60.
+
+
+@functools.lru_cache(maxsize=32)
+def harmonic_bins(n_samples, n_cycles, harmonics=IEEE1459_HARMONICS):
+    """
+    Return the FFT bin indices of the DC component and the harmonics 1..harmonics of a block of n_samples containing
+    n_cycles fundamental cycles. Harmonics above the Nyquist frequency are dropped. The arrays are cached per block
+    length, treat them as read only.
+    """
+    bins = np.arange(harmonics + 1)*n_cycles
+    return bins[bins <= (n_samples - 1)//2]
+
+
+def cycle_aligned(n_samples, sampling_rate, f_nom=IEEE1459_F_NOM):
+    """
+    Return (n_cycles, n) with the number of whole fundamental cycles in n_samples and the number of samples they span.
+    """
+    n_cycles = int(n_samples*f_nom/float(sampling_rate) + 1e-9)
+    if n_cycles < 1:
+        raise Exception('Waveform block of %d samples is shorter than one fundamental cycle' % n_samples)
+    return n_cycles, min(n_samples, int(round(n_cycles*sampling_rate/float(f_nom))))
+
+
+def power_analysis(V, I, sampling_rate, f_nom=IEEE1459_F_NOM, harmonics=IEEE1459_HARMONICS):
+    """
+    IEEE 1459 power decomposition of one or more phases.
+
+    The block is truncated to a whole number of fundamental cycles and the voltage and current spectra of all phases
+    are computed with one real FFT (rectangular window, the cycle-aligned block makes the harmonics fall on exact
+    bins). The DC component is treated as part of the nonfundamental (harmonic) quantities. Signs follow the
+    generator point of view used by harmonic_analysis().
+
+    :param V: voltage samples, 1-D array or 2-D array with one row per phase
+    :param I: current samples, same shape as V
+    :param sampling_rate: sampling rate (Hz)
+    :param f_nom: fundamental frequency (Hz)
+    :param harmonics: highest harmonic order included
+    :return: dict with P, P1, PH, N, Q1, DI, DV, DH, S, S1, SN, SH, PF1, PF, har_poll, THD_V, THD_I as scalars for 1-D
+             input or arrays with one entry per phase
+    """
+    V = np.asarray(V, dtype=np.float64)
+    I = np.asarray(I, dtype=np.float64)
+    if V.shape != I.shape:
+        raise Exception('Voltage and current shapes do not match: %s %s' % (V.shape, I.shape))
+    single = V.ndim == 1
+    V = np.atleast_2d(V)
+    I = np.atleast_2d(I)
+    phases = V.shape[0]
+    n_cycles, n = cycle_aligned(V.shape[1], sampling_rate, f_nom)
+    V = V[:, :n]
+    I = I[:, :n]
+
+    # spectra of all voltages and currents in one call, scaled to RMS phasors (DC as its value)
+    bins = harmonic_bins(n, n_cycles, harmonics)
+    X = np.fft.rfft(np.concatenate((V, I)), axis=-1)[:, bins]*(np.sqrt(2.)/n)
+    X[:, 0] = X[:, 0].real/np.sqrt(2.)
+    Vh = X[:phases]
+    Ih = X[phases:]
+
+    # complex power of each harmonic
+    VI = Vh*np.conj(Ih)
+    Ph = VI.real
+    V1sq = np.square(np.abs(Vh[:, 1]))
+    I1sq = np.square(np.abs(Ih[:, 1]))
+    VHsq = np.sum(np.square(np.abs(Vh)), axis=1) - V1sq
+    IHsq = np.sum(np.square(np.abs(Ih)), axis=1) - I1sq
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        THD_V = np.sqrt(VHsq/V1sq)
+        THD_I = np.sqrt(IHsq/I1sq)
+
+        P = np.mean(V*I, axis=1)  # includes all the harmonics (P1 is just the fundamental)
+        P1 = Ph[:, 1]
+        PH = np.sum(Ph, axis=1) - P1
+        Q1 = VI[:, 1].imag  # reactive power (fundamental), V1*I1*sin(angle V1 - angle I1) (generator POV)
+
+        S1 = np.sqrt(np.square(P1) + np.square(Q1))
+        DI = -S1*THD_I  # (negative value to be generator POV)
+        DV = -S1*THD_V  # (negative value to be generator POV)
+        SH = S1*THD_I*THD_V
+        DH = np.sqrt(np.maximum(np.square(SH) - np.square(PH), 0.))
+        SN = np.sqrt(np.square(DI) + np.square(DV) + np.square(SH))
+        S = np.sqrt(np.square(S1) + np.square(SN))
+        N = -np.sqrt(np.maximum(np.square(S) - np.square(P), 0.))  # (negative value to be generator POV)
+
+        PF1 = P1/S1
+        PF = P/S
+        # PF Convention
+        sign = np.where(Q1*P > 0, -1., 1.)
+        PF1 = PF1*sign
+        PF = PF*sign
+        har_poll = SN/S1
+
+    results = {'P': P, 'P1': P1, 'PH': PH, 'N': N, 'Q1': Q1, 'DI': DI, 'DV': DV, 'DH': DH, 'S': S, 'S1': S1,
+               'SN': SN, 'SH': SH, 'PF1': PF1, 'PF': PF, 'har_poll': har_poll, 'THD_V': THD_V, 'THD_I': THD_I}
+    if single:
+        results = dict((k, float(v[0])) for k, v in results.items())
+    return results
 
 
 def active_power_from_waveform(t, V, I, sampling_rate, ts):
@@ -285,7 +551,7 @@ def active_power_from_waveform(t, V, I, sampling_rate, ts):
     :return:
     : avg_P - Average active power
     """
-    pass
+    return power_analysis(V, I, sampling_rate)['P']
 
 
 def reactive_power_from_waveform(t, V, I, sampling_rate, ts):
@@ -299,7 +565,7 @@ def reactive_power_from_waveform(t, V, I, sampling_rate, ts):
     :return:
     : Q1 - Fundamental Reactive Power
     """
-    pass
+    return power_analysis(V, I, sampling_rate)['Q1']
 
 
 def pf_from_waveform(t, V, I, sampling_rate, ts):
@@ -313,215 +579,28 @@ def pf_from_waveform(t, V, I, sampling_rate, ts):
     :return:
     : PF - Power factor
     """
-    pass
+    return power_analysis(V, I, sampling_rate)['PF']
 
 
 def harmonic_analysis(t, V, I, sampling_rate, ts):
     """
     :param t: time vector (numpy)
-    :param V: voltage vector (numpy)
-    :param I: current vector (numpy)
+    :param V: voltage vector (numpy), or 2-D array with one row per phase
+    :param I: current vector (numpy), or 2-D array with one row per phase
     :param sampling_rate - sampling rate (int)
     :param ts - test script with logging capabilities
 
     :return:
     : avg_P - Average active power
-    : P1 - Fundamental active power
-    : PH - Nonfundamental active power
-
-    : N - Nonactive Power
-    : Q1 - Fundamental Reactive Power
-    : DI - Current distortion power
-    : DV - Voltage distortion power
-    : DH - Harmonic distortion power
-
     : S - Combined Apparent Power
-    : S1 - Fundamental Apparent Power
-    : SN - Nonfundamental Apparent Power
-    : SH - Harmonic Apparent power
-
+    : Q1 - Fundamental Reactive Power
+    : N - Nonactive Power
     : PF1 - Fundamental power factor
-    : PF - Power factor
-
-    : har_poll - Harmonic pollution
 
-    : THD_V - Voltage Total Harmonic Distortion
-    : THD_I - Current Total Harmonic Distortion
+    The complete IEEE 1459 decomposition is returned by power_analysis().
     """
-    # import time
-    # harmonic_start = time.time()
-
-    P = V*I
-    # w = 2*np.pi
-
-    Fs = sampling_rate
-    n_samples = len(t)
-
-    # full spectrum
-    ffI = np.fft.fft(I, n_samples)
-    ffV = np.fft.fft(V, n_samples)
-    # xfft = np.arange(0, len(ffI))*(Fs/len(ffI))  # x-axis of frequency for plotting
-
-    # only half of the fft coefficients
-    ffI2 = ffI[0:int(n_samples/2.)]
-    ffV2 = ffV[0:int(n_samples/2.)]
-    # xfft2 = xfft[0:int(n_samples/2.)]
-
-    harmonicsI = [[], [], [], []]  # [[harmonic index], [complex fft], [abs(complex fft)], [angle of complex fft]]
-    harmonicsV = [[], [], [], []]  # [[harmonic index], [complex fft], [abs(complex fft)], [angle of complex fft]]
-    powers = [[], [], []]  # [[harmonics], [P at that harmonic], [Q at that harmonic]]
-    # recoverI = []
-    # recoverV = []
-
-    # for i in range(len(ffI2)):
-    for i in range(41):  # IEEE Std 1547.1-2005
-        # ts.log_debug('Harmonic %d has mag %s' % (i, abs(ffI2[i])))
-
-        # if abs(ffI2[i]) >= 3.:  # threshold for removing nonsignificant harmonics
-        harmonicsI[0] += [i]
-        harmonicsI[1] += [ffI2[i]*2/len(ffI)]
-        harmonicsI[2] += [abs(ffI2[i])*2/len(ffI)]
-        harmonicsI[3] += [np.angle(ffI2[i])]
-
-        harmonicsV[0] += [i]
-        harmonicsV[1] += [ffV2[i]*2/len(ffV)]
-        harmonicsV[2] += [abs(ffV2[i])*2/len(ffV)]
-        harmonicsV[3] += [np.angle(ffV2[i])]
-
-    harmonicsI[1][0] = harmonicsI[1][0]/2
-    harmonicsI[2][0] = abs(np.real(harmonicsI[1][0]))
-    harmonicsV[1][0] = harmonicsV[1][0]/2
-    harmonicsV[2][0] = abs(np.real(harmonicsV[1][0]))
-
-    # Use to compare to other calculations
-    # for i in range(len(t)):
-    #     acumI = 0.0
-    #     acumV = 0.0
-    #     for k in range(1, len(harmonicsI[0])):
-    #         acumI += harmonicsI[2][k]*np.sin(w*harmonicsI[0][k]*(Fs/len(ffI))*t[i] + harmonicsI[3][k] + (np.pi)/2)
-    #         acumV += harmonicsV[2][k]*np.sin(w*harmonicsV[0][k]*(Fs/len(ffV))*t[i] + harmonicsV[3][k] + (np.pi)/2)
-    #     acumI += np.real(harmonicsI[1][0])
-    #     acumV += np.real(harmonicsV[1][0])
-    #     recoverI += [acumI]
-    #     recoverV += [acumV]
-
-    ###############################################################################
-    ################ CALCULATIONS ACCORDING TO IEEE 1459 ##########################
-    ###############################################################################
-
-    # THD = VH/V1
-    VHsq = 0.0
-    IHsq = 0.0
-    # V0sq = 0.0
-    # I0sq = 0.0
-    V1sq = 0.0
-    I1sq = 0.0
-
-    for i in range(len(harmonicsV[0])):
-        if harmonicsV[0][i] == 0:  # for DC
-            #THDs
-            V0sq = np.square(harmonicsV[2][i])
-            I0sq = np.square(harmonicsI[2][i])
-            VHsq += V0sq
-            IHsq += I0sq
-
-            #harmonics power
-            powers[0] += [harmonicsI[0][i]*(Fs/len(I))/60.0]  # Harmonics
-            powers[1] += [np.real(harmonicsI[1][i])*np.real(harmonicsV[1][i])]  # power associated with the harmonic
-            powers[2] += [0]  # Reactive powers associated with those harmonics
-
-        elif harmonicsV[0][i]*Fs/len(t) == 60:  # for fundamental
-            #THDs
-            V1sq = np.square(harmonicsV[2][i])/2
-            I1sq = np.square(harmonicsI[2][i])/2
-            VHsq += 0.0
-            IHsq += 0.0
-            #harmonics power
-            powers[0] += [harmonicsI[0][i]*(Fs/len(I))/60.0]
-            powers[1] += [harmonicsI[2][i]*harmonicsV[2][i]*np.cos(harmonicsI[3][i]-harmonicsV[3][i])/2]
-            powers[2] += [harmonicsI[2][i]*harmonicsV[2][i]*np.sin(harmonicsI[3][i]-harmonicsV[3][i])/2]
-
-        else:  # for the rest of the harmonics
-            #THDs
-            VHsq += np.square(harmonicsV[2][i])/2
-            IHsq += np.square(harmonicsI[2][i])/2
-            # harmonic power
-            powers[0] += [harmonicsI[0][i]*(Fs/len(I))/60.0]
-            powers[1] += [harmonicsI[2][i]*harmonicsV[2][i]*np.cos(harmonicsI[3][i]-harmonicsV[3][i])/2]
-            powers[2] += [0]
-
-    # Vsq = V1sq+VHsq
-    # Isq = I1sq+IHsq
-
-    THD_I = np.sqrt(IHsq/I1sq)
-    THD_V = np.sqrt(VHsq/V1sq)
-
-    # THD_I2 = np.sqrt((Isq/I1sq)-1)
-    # THD_V2 = np.sqrt((Vsq/V1sq)-1)
-
-    # instantaneous power
-    i_P = 0.0
-    for i in range(len(P)):
-        i_P += P[i]
-
-    avg_P = i_P/len(P)  # includes all the harmonics (P1 is just the fundamental)
-    # avg_P2 = np.mean(P)
-
-    PH = 0.0
-    P1 = 0.0
-
-    for i in range(len(powers[0])):
-        if powers[0][i] == 1:
-            P1 = powers[1][i]  # active power (fundamental)
-            Q1 = -powers[2][i]  # reactive power (fundamental) (negative value to be generator POV)
-        else:
-            PH += powers[1][i]  # real power from harmonics
-    if Q1 is None:
-        ts.log_warning('No fundamental frequency for given capture timing parameters. Will not calculate P1 or Q1.')
-
-    # Fundamental Apparent Power
-    S1 = np.sqrt(np.square(P1)+np.square(Q1))
-
-    # Current distortion power
-    DI = -S1*THD_I  # (negative value to be generator POV)
-    # DI_2 = np.sqrt(V1sq)*(np.sqrt(Isq-I1sq))
-
-    # Voltage distortion power
-    DV = -S1*THD_V # (negative value to be generator POV)
-    # DV_2 = np.sqrt(Vsq-V1sq)*np.sqrt(I1sq)
-
-    # Harmonic Apparent power
-    SH = S1*THD_I*THD_V
-    # SH_2 = (np.sqrt(Isq-I1sq))*np.sqrt(Vsq-V1sq)
-
-    # Harmonic distortion power
-    # DH = np.sqrt(np.square(SH)-np.square(PH))
-
-    # Nonfundamental Apparent Power (SN)
-    SN = np.sqrt(np.square(DI) + np.square(DV) + np.square(SH))
-    S = np.sqrt(np.square(S1)+np.square(SN))
-
-    # Nonactive Power
-    N = -np.sqrt(np.square(S)-np.square(avg_P))  # (negative value to be generator POV)
-
-    # Fundamental power factor
-    # ts.log_debug('PF1 = %0.3f, P1 = %0.3f, S1 = %0.3f' % (P1/S1, P1, S1))
-    PF1 = P1/S1
-    # Power factor
-    PF = avg_P/S
-
-    # PF Convention
-    if (Q1 > 0 and avg_P > 0) or (Q1 < 0 and avg_P < 0):
-        PF1 = -PF1
-        PF = -PF
-
-    # Harmonic pollution
-    # har_poll = SN/S1
-
-    # ts.log_debug('Time to complete harmonic analysis = %s' % (time.time() - harmonic_start))
-
-    # return avg_P, P1, PH, N, Q1, DI, DV, DH, S, S1, SN, SH, PF1, PF, har_poll, THD_V, THD_I
-    return avg_P, S, Q1, N, PF1
+    r = power_analysis(V, I, sampling_rate)
+    return r['P'], r['S'], r['Q1'], r['N'], r['PF1']
 
 
 if __name__ == "__main__":
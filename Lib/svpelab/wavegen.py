@@ -32,10 +32,9 @@ Questions can be directed to support@sunspec.org
 
 import sys
 import os
-import glob
-import importlib
+from . import plugins
 
-wavegen_modules = {}
+wavegen_modules = plugins.ModuleRegistry(__name__, 'wavegen')
 
 def params(info, id=None, label='Waveform Generator', group_name=None, active=None, active_value=None):
     if group_name is None:
@@ -49,8 +48,7 @@ def params(info, id=None, label='Waveform Generator', group_name=None, active=No
     info.param_group(group_name, label='%s Parameters' % label, active=active, active_value=active_value, glob=True)
     print('name = %s' % name('mode'))
     info.param(name('mode'), label='Mode', default='Disabled', values=['Disabled'])
-    for mode, m in wavegen_modules.items():
-        m.params(info, group_name=group_name)
+    wavegen_modules.params(info, group_name=group_name)
 
 WAVEGEN_DEFAULT_ID = 'wavegen'
 
@@ -183,29 +181,8 @@ class Wavegen(object):
 
 def wavegen_scan():
     global wavegen_modules
-    # scan all files in current directory that match wavegen_*.py
-    package_name = '.'.join(__name__.split('.')[:-1])
-    files = glob.glob(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'wavegen_*.py'))
-    for f in files:
-        module_name = None
-        try:
-            module_name = os.path.splitext(os.path.basename(f))[0]
-            if package_name:
-                module_name = package_name + '.' + module_name
-            m = importlib.import_module(module_name)
-            if hasattr(m, 'wavegen_info'):
-                info = m.wavegen_info()
-                mode = info.get('mode')
-                # place module in module dict
-                if mode is not None:
-                    wavegen_modules[mode] = m
-            else:
-                if module_name is not None and module_name in sys.modules:
-                    del sys.modules[module_name]
-        except Exception as e:
-            if module_name is not None and module_name in sys.modules:
-                del sys.modules[module_name]
-            raise WavegenError('Error scanning module %s: %s' % (module_name, str(e)))
+    # find all files in current directory that match wavegen_*.py, modules are imported when first used
+    wavegen_modules.scan(WavegenError)
 
 # scan for wavegen modules on import
 wavegen_scan()